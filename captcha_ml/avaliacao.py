@@ -0,0 +1,132 @@
+"""
+Avaliação dos backends do solver sobre o dataset_ouro.
+
+As imagens em `captcha_ml/data/dataset_ouro` foram confirmadas pelo servidor
+(ver `salvar_dataset_ouro`), então o label do nome do arquivo é a resposta
+certa. Usado pelos comandos de comparação de cada backend.
+
+    # Calibração do limiar de confiança (confianca_minima do scrapper)
+    python -m captcha_ml.avaliacao calibrar --backend numpy
+"""
+
+import glob
+import os
+import time
+
+import numpy as np
+
+PASTA_OURO = "captcha_ml/data/dataset_ouro"
+
+
+def imagens_ouro(pasta=PASTA_OURO, limite=None):
+    arquivos = sorted(glob.glob(os.path.join(pasta, "*.png")))
+    return arquivos[:limite] if limite else arquivos
+
+
+def label_do_arquivo(caminho):
+    """'abcd_1764411718586.png' -> 'abcd'"""
+    return os.path.basename(caminho).split('.')[0].split('_')[0]
+
+
+def avaliar(solver, arquivos):
+    """Acurácia (exata) e latências por imagem (ms) no lote de 1"""
+    acertos = 0
+    latencias = []
+    for arquivo in arquivos:
+        inicio = time.perf_counter()
+        resultado = solver.solve_captcha_from_file(arquivo)
+        latencias.append((time.perf_counter() - inicio) * 1000)
+        acertos += resultado == label_do_arquivo(arquivo)
+    return acertos / max(len(arquivos), 1), np.array(latencias)
+
+
+def comparar_backends(backends, arquivos):
+    """
+    Imprime acurácia, p50/p99, tempo de import+carga e pico de RSS de cada backend.
+
+    Args:
+        backends: Lista de (nome exibido, nome do backend, módulo, função que cria o solver)
+        arquivos: Imagens do dataset_ouro usadas na avaliação
+    """
+    from captcha_ml.backends import medir_inicializacao
+
+    print(f"\n{'backend':18s} {'acurácia':>9s} {'p50':>8s} {'p99':>8s} {'import+carga':>13s} {'RSS':>9s}")
+    for nome, backend, modulo, criar in backends:
+        solver = criar()
+        solver.solve_captcha_from_file(arquivos[0])  # aquecimento
+        acuracia, lat = avaliar(solver, arquivos)
+        segundos, rss = medir_inicializacao(modulo=modulo, backend=backend)
+        print(f"{nome:18s} {acuracia:9.2%} {np.percentile(lat, 50):6.2f}ms {np.percentile(lat, 99):6.2f}ms "
+              f"{segundos:12.2f}s {rss:6.0f} MB")
+    print(f"(n={len(arquivos)} imagens do dataset_ouro, lote de 1)")
+
+
+LIMIARES_PADRAO = (0.0, 0.5, 0.8, 0.9, 0.95, 0.99, 0.995, 0.999)
+
+
+def calibrar_confianca(solver, arquivos, limiares=LIMIARES_PADRAO):
+    """
+    Relaciona cada limiar de confiança com o custo esperado por sucesso.
+
+    Cada captcha custa um GET; os aceitos (probabilidade >= limiar) custam também
+    um POST, que passa com a precisão dos aceitos. Com aceitação `a` e precisão `p`:
+    captchas por sucesso = 1 / (a·p), POSTs por sucesso = 1 / p e idas e voltas
+    por sucesso = (1 + a) / (a·p).
+
+    Returns:
+        Lista de dicts por limiar (aceitacao, precisao, captchas, posts, idas_e_voltas por sucesso)
+    """
+    resultados = solver.solve_many_with_confidence(arquivos)
+    probabilidades = np.array([r['probabilidade'] if r else 0.0 for r in resultados])
+    corretos = np.array([bool(r) and r['codigo'] == label_do_arquivo(f) for r, f in zip(resultados, arquivos)])
+
+    relatorio = []
+    for limiar in limiares:
+        aceitos = probabilidades >= limiar if limiar > 0 else np.array([bool(r and r['codigo']) for r in resultados])
+        aceitacao = aceitos.mean() if len(aceitos) else 0.0
+        precisao = corretos[aceitos].mean() if aceitos.any() else 0.0
+        sucesso = aceitacao * precisao
+        relatorio.append({
+            'limiar': limiar,
+            'aceitacao': float(aceitacao),
+            'precisao': float(precisao),
+            'captchas_por_sucesso': float(1 / sucesso) if sucesso else float('inf'),
+            'posts_por_sucesso': float(1 / precisao) if precisao else float('inf'),
+            'idas_e_voltas_por_sucesso': float((1 + aceitacao) / sucesso) if sucesso else float('inf'),
+        })
+    return relatorio
+
+
+def imprimir_calibracao(relatorio, n):
+    print(f"\n{'limiar':>7s} {'aceitação':>10s} {'precisão':>9s} {'captchas':>9s} {'POSTs':>7s} {'idas+voltas':>12s}")
+    for linha in relatorio:
+        print(f"{linha['limiar']:7.3f} {linha['aceitacao']:10.2%} {linha['precisao']:9.2%} "
+              f"{linha['captchas_por_sucesso']:9.3f} {linha['posts_por_sucesso']:7.3f} "
+              f"{linha['idas_e_voltas_por_sucesso']:12.3f}")
+    print(f"(n={n} imagens; captchas/POSTs/idas+voltas por sucesso; limiar 0 = sem filtro de confiança)")
+    print("O dataset_ouro só tem captchas que o servidor aceitou, então a precisão aqui é um teto:")
+    print("a aceitação mostra quanto cada limiar descarta de captchas que teriam passado.")
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    from captcha_ml.backends import criar_solver
+
+    parser = argparse.ArgumentParser(description="Avaliação do solver no dataset_ouro")
+    parser.add_argument('comando', choices=['calibrar'])
+    parser.add_argument('--backend', default=None)
+    parser.add_argument('--model-dir', default="captcha_ml/models")
+    parser.add_argument('--pasta', default=PASTA_OURO, help="Imagens rotuladas ('<label>_<id>.png')")
+    parser.add_argument('--limite', type=int, default=None)
+    parser.add_argument('--limiares', type=float, nargs='+', default=list(LIMIARES_PADRAO))
+    parser.add_argument('--json', help="Grava o relatório neste arquivo")
+    args = parser.parse_args()
+
+    arquivos = imagens_ouro(args.pasta, args.limite)
+    relatorio = calibrar_confianca(criar_solver(args.backend, args.model_dir), arquivos, args.limiares)
+    imprimir_calibracao(relatorio, len(arquivos))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'n': len(arquivos), 'limiares': relatorio}, f, indent=2)
@@ -0,0 +1,285 @@
+"""
+Carregamento preguiçoso (lazy) do solver de captcha.
+
+O scrapper não importa mais `captcha_ml.captcha_solver` no topo do módulo:
+importar o solver Keras significa importar o TensorFlow, o que custa vários
+segundos e centenas de MB em toda execução, mesmo quando o captcha é passado
+manualmente. Aqui cada backend é registrado pelo nome do módulo/classe e pelos
+pacotes de que depende; o módulo só é importado na primeira resolução.
+
+O backend vem do parâmetro `backend` ou da variável CAPTCHA_BACKEND
+(default: 'keras').
+
+Os solvers ficam num registro do processo, um por (backend, model_dir).
+`preload_solver` carrega e aquece o solver na partida, para o primeiro atleta
+não pagar a carga. A cada CAPTCHA_RECARGA_INTERVALO segundos (default 5; 0
+desliga), `get_solver` confere meta.pkl e os pesos da pasta. Se mudaram (novo
+treino), um solver novo é carregado e aquecido em background e só então entra
+no lugar do antigo. Enquanto isso o antigo continua resolvendo.
+
+Os solvers do registro consultam o índice de captchas já confirmados
+(indice_ouro.py) antes da inferência; CAPTCHA_INDICE_OURO=0 desliga.
+
+Medir o custo de inicialização antes/depois:
+    python -m captcha_ml.backends --medir
+"""
+
+import importlib
+import importlib.util
+import os
+import threading
+import time
+
+MODEL_DIR_PADRAO = "captcha_ml/models"
+INTERVALO_RECARGA = float(os.environ.get('CAPTCHA_RECARGA_INTERVALO', 5))
+# Tempo sem mudanças nos arquivos antes de recarregar (o treino pode estar gravando)
+ESPERA_ARQUIVOS_ESTAVEIS = 1.0
+
+# nome -> (módulo, classe, pacotes necessários); uma tupla de pacotes = qualquer um deles
+BACKENDS = {
+    'keras': ('captcha_ml.captcha_solver', 'CaptchaSolver', ('tensorflow',)),
+    'tflite': ('captcha_ml.tflite_solver', 'TFLiteCaptchaSolver',
+               (('ai_edge_litert', 'tflite_runtime', 'tensorflow'),)),
+    'numpy': ('captcha_ml.numpy_solver', 'NumpyCaptchaSolver', ('h5py',)),
+    # Cliente do serviço compartilhado (ver servico.py); o modelo roda em outro processo
+    'servico': ('captcha_ml.servico', 'ServicoCaptchaSolver', ()),
+}
+
+_solvers = {}
+_assinaturas = {}  # chave -> assinatura dos arquivos do modelo carregado
+_verificado_em = {}  # chave -> time.monotonic() da última conferência dos arquivos
+_recarregando = set()
+_lock = threading.Lock()
+_lock_recarga = threading.Lock()
+
+
+def registrar_backend(nome, modulo, classe, dependencias=()):
+    """
+    Registra um backend; `classe(model_dir)` deve expor `solve_captcha_from_base64`
+    (e, opcionalmente, `solve_many` para inferência em lote).
+    """
+    BACKENDS[nome] = (modulo, classe, tuple(dependencias))
+
+
+def backend_padrao():
+    return os.environ.get('CAPTCHA_BACKEND', 'keras')
+
+
+def backend_disponivel(backend=None):
+    """
+    Indica se as dependências do backend estão instaladas, sem importá-las.
+    """
+    backend = backend or backend_padrao()
+    if backend not in BACKENDS:
+        return False
+    modulo, _, dependencias = BACKENDS[backend]
+    try:
+        return all(any(importlib.util.find_spec(nome) is not None for nome in _alternativas(dep))
+                   for dep in (*dependencias, modulo))
+    except (ImportError, ValueError):
+        return False
+
+
+def _alternativas(dependencia):
+    return dependencia if isinstance(dependencia, tuple) else (dependencia,)
+
+
+def criar_solver(backend=None, model_dir=MODEL_DIR_PADRAO):
+    """Importa o módulo do backend e instancia um solver novo"""
+    backend = backend or backend_padrao()
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend de captcha desconhecido: {backend!r} (disponíveis: {', '.join(BACKENDS)})")
+    modulo, classe, _ = BACKENDS[backend]
+    return getattr(importlib.import_module(modulo), classe)(model_dir)
+
+
+def assinatura_modelo(model_dir=MODEL_DIR_PADRAO):
+    """(nome, mtime, tamanho) do meta.pkl e dos pesos/modelos exportados da pasta"""
+    try:
+        entradas = list(os.scandir(model_dir))
+    except OSError:
+        return ()
+    assinatura = []
+    for entrada in entradas:
+        if entrada.name == 'meta.pkl' or entrada.name.endswith(('.weights.h5', '.tflite')):
+            try:
+                info = entrada.stat()
+            except OSError:
+                continue
+            assinatura.append((entrada.name, info.st_mtime_ns, info.st_size))
+    return tuple(sorted(assinatura))
+
+
+def aquecer_solver(solver):
+    """Uma inferência descartável, para a primeira de verdade não pagar a inicialização"""
+    if getattr(solver, 'is_loaded', False) and hasattr(solver, 'aquecer'):
+        solver.aquecer()
+    return solver
+
+
+def _carregar(chave):
+    # Afinidade de CPU do worker antes de o runtime criar os pools de threads
+    from captcha_ml.threads import aplicar_afinidade_do_processo
+    aplicar_afinidade_do_processo()
+    solver = criar_solver(*chave)
+    if hasattr(solver, 'indice_ouro'):
+        from captcha_ml.indice_ouro import get_indice_ouro, indice_ouro_ativo
+        if indice_ouro_ativo():
+            solver.indice_ouro = get_indice_ouro()
+    return aquecer_solver(solver)
+
+
+def get_solver(backend=None, model_dir=MODEL_DIR_PADRAO):
+    """Solver compartilhado do processo para (backend, model_dir), criado no primeiro uso"""
+    chave = (backend or backend_padrao(), model_dir)
+    solver = _solvers.get(chave)
+    if solver is None:
+        # Várias threads do scrapper podem chegar aqui ao mesmo tempo
+        with _lock:
+            solver = _solvers.get(chave)
+            if solver is None:
+                assinatura = assinatura_modelo(model_dir)
+                solver = _solvers[chave] = _carregar(chave)
+                _assinaturas[chave] = assinatura
+                _verificado_em[chave] = time.monotonic()
+        return solver
+    _verificar_recarga(chave)
+    return solver
+
+
+def preload_solver(backend=None, model_dir=MODEL_DIR_PADRAO):
+    """Carrega e aquece o solver agora (na partida do processo) em vez de no primeiro captcha"""
+    return get_solver(backend, model_dir)
+
+
+def _verificar_recarga(chave):
+    if INTERVALO_RECARGA <= 0:
+        return
+    agora = time.monotonic()
+    if agora - _verificado_em.get(chave, 0) < INTERVALO_RECARGA:
+        return
+    _verificado_em[chave] = agora
+    if assinatura_modelo(chave[1]) == _assinaturas.get(chave):
+        return
+    with _lock_recarga:
+        if chave in _recarregando:
+            return
+        _recarregando.add(chave)
+    threading.Thread(target=_recarregar, args=(chave,), name="captcha-recarga", daemon=True).start()
+
+
+def _recarregar(chave):
+    """Carrega o solver novo ao lado do atual e troca a referência quando ele estiver pronto"""
+    try:
+        assinatura = assinatura_modelo(chave[1])
+        while True:
+            time.sleep(ESPERA_ARQUIVOS_ESTAVEIS)
+            atual = assinatura_modelo(chave[1])
+            if atual == assinatura:
+                break
+            assinatura = atual
+
+        print(f"🔄 Modelo alterado em {chave[1]}. Recarregando o solver {chave[0]}...")
+        solver = _carregar(chave)
+        with _lock:
+            # Se a carga falhar (arquivo incompleto, meta inconsistente) o atual continua;
+            # a próxima mudança nos arquivos dispara outra tentativa
+            _assinaturas[chave] = assinatura
+            if solver.is_loaded:
+                _solvers[chave] = solver
+        if solver.is_loaded:
+            print(f"✅ Solver {chave[0]} recarregado")
+        else:
+            print(f"⚠️ Recarga do solver {chave[0]} falhou; mantendo o modelo anterior")
+    finally:
+        with _lock_recarga:
+            _recarregando.discard(chave)
+
+
+def _solver_ou_microlote(backend, model_dir):
+    """Com micro-lotes ligados (ver microlote.py), o pedido entra no lote da thread de fundo"""
+    from captcha_ml.microlote import get_microlote, microlote_ativo
+
+    # O serviço já agrupa os pedidos do lado dele
+    if microlote_ativo() and (backend or backend_padrao()) != 'servico':
+        return get_microlote(backend, model_dir)
+    return get_solver(backend, model_dir)
+
+
+def solve_captcha_auto(base64_string, model_dir=MODEL_DIR_PADRAO, backend=None):
+    return _solver_ou_microlote(backend, model_dir).solve_captcha_from_base64(base64_string)
+
+
+def solve_many_auto(imagens, model_dir=MODEL_DIR_PADRAO, backend=None):
+    """Resolve uma lista de captchas; usa `solve_many` quando o backend tem inferência em lote"""
+    solver = get_solver(backend, model_dir)
+    if hasattr(solver, 'solve_many'):
+        return solver.solve_many(imagens)
+    return [solver.solve_captcha_from_base64(imagem) for imagem in imagens]
+
+
+def solve_with_confidence_auto(base64_string, model_dir=MODEL_DIR_PADRAO, backend=None):
+    """{'codigo', 'probabilidade', 'alternativas'} do beam search restrito (ver ctc.py)"""
+    return _solver_ou_microlote(backend, model_dir).solve_with_confidence(base64_string)
+
+
+def solve_many_with_confidence_auto(imagens, model_dir=MODEL_DIR_PADRAO, backend=None):
+    return get_solver(backend, model_dir).solve_many_with_confidence(imagens)
+
+
+def pico_rss_mb():
+    """
+    Pico de memória residente deste processo (MB).
+    No Linux usa VmHWM: o ru_maxrss herda o pico do processo pai através do fork/exec.
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for linha in f:
+                if linha.startswith('VmHWM:'):
+                    return int(linha.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    import sys
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reporta em bytes, Linux em KB
+    return maxrss / (1024 * 1024) if sys.platform == 'darwin' else maxrss / 1024
+
+
+def medir_inicializacao(modulo='scrapper.scrapper', backend=None):
+    """
+    Importa `modulo` num processo novo e devolve (segundos, pico de RSS em MB).
+    Com `backend`, também carrega o solver (o custo que o primeiro captcha paga).
+    """
+    import subprocess
+    import sys
+
+    codigo = f"import time; inicio = time.perf_counter(); import {modulo}"
+    if backend:
+        codigo += f"; from captcha_ml.backends import get_solver; get_solver({backend!r})"
+    codigo += "; from captcha_ml.backends import pico_rss_mb; print(time.perf_counter() - inicio, pico_rss_mb())"
+    env = dict(os.environ, TF_CPP_MIN_LOG_LEVEL='3')
+    saida = subprocess.run([sys.executable, '-c', codigo], check=True, env=env,
+                           capture_output=True, text=True).stdout
+    segundos, rss = saida.split()[-2:]
+    return float(segundos), float(rss)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Backends do solver de captcha")
+    parser.add_argument('--medir', action='store_true', help="Mede import do scrapper e carga do solver")
+    parser.add_argument('--backend', default=None)
+    args = parser.parse_args()
+
+    backend = args.backend or backend_padrao()
+    for nome in BACKENDS:
+        print(f"{nome:10s} {'disponível' if backend_disponivel(nome) else 'indisponível'}")
+
+    if args.medir:
+        segundos, rss = medir_inicializacao()
+        print(f"\n{'import scrapper.scrapper':32s} {segundos:6.2f}s  {rss:7.1f} MB")
+        if backend_disponivel(backend):
+            segundos, rss = medir_inicializacao(backend=backend)
+            print(f"{'import + solver ' + backend:32s} {segundos:6.2f}s  {rss:7.1f} MB")
@@ -0,0 +1,267 @@
+"""
+Benchmark reprodutível dos backends do solver sobre o dataset_ouro.
+
+`test_model.py`, `verificar_captchas_salvos.py` e `inspect_production.py`
+imprimem resultados imagem a imagem; para comparar versões do modelo (ou
+backends) é preciso o mesmo conjunto de números sempre, num arquivo. Cada
+backend roda num processo novo, para a carga ser fria e o pico de RSS ser só
+dele:
+
+    - acurácia exata e por caractere (posição a posição) no dataset_ouro
+    - carga a frio: import + criação do solver, e a primeira inferência
+    - p50/p95/p99 por chamada e imagens/s em lotes de 1 a 256
+      (lote 1 = `solve_captcha_from_base64`; maiores = `solve_many`). Backends
+      com lote fixo no modelo (tflite: 1 e 16) dividem os lotes maiores em
+      vários invokes; essas linhas saem marcadas com o lote de verdade
+    - pico de RSS depois da carga e no fim
+
+As imagens do dataset_ouro estão no índice de captchas confirmados
+(indice_ouro.py), então o benchmark o desliga: todas acertariam sem inferência.
+O relatório (JSON) guarda também o hash dos arquivos do modelo, e `--comparar`
+mostra a diferença para um relatório anterior.
+
+    # Todos os backends disponíveis -> benchmark_solver.json
+    python -m captcha_ml.benchmark
+
+    # Só keras e numpy, 2000 imagens na acurácia, comparando com a versão anterior
+    python -m captcha_ml.benchmark --backends keras numpy --limite 2000 --comparar benchmark_anterior.json
+"""
+
+import hashlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from captcha_ml.avaliacao import PASTA_OURO, imagens_ouro, label_do_arquivo
+
+MODEL_DIR_PADRAO = "captcha_ml/models"
+TAMANHOS_LOTE = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+def amostrar(arquivos, limite, semente=0):
+    """Subconjunto fixo (mesma semente, mesmas imagens) espalhado pelo dataset inteiro"""
+    if not limite or limite >= len(arquivos):
+        return arquivos
+    escolhidos = np.random.default_rng(semente).choice(len(arquivos), limite, replace=False)
+    return [arquivos[i] for i in sorted(escolhidos)]
+
+
+def acuracia(previstos, arquivos, comprimento):
+    """(acurácia exata, acurácia por caractere); None e tamanho errado contam como erro"""
+    exatos = 0
+    caracteres = 0
+    for previsto, arquivo in zip(previstos, arquivos):
+        label = label_do_arquivo(arquivo)
+        previsto = previsto or ''
+        exatos += previsto == label
+        caracteres += sum(a == b for a, b in zip(previsto, label))
+    total = max(len(arquivos), 1)
+    return exatos / total, caracteres / (total * comprimento)
+
+
+def medir_lotes(solver, imagens, tamanhos=TAMANHOS_LOTE, imagens_por_tamanho=512, repeticoes_minimas=5):
+    """
+    Latência por chamada (ms) e vazão para cada tamanho de lote.
+
+    Args:
+        imagens: base64 das imagens (decodificação e pré-processamento entram no tempo)
+        imagens_por_tamanho: Imagens resolvidas por tamanho (repetições = isso / tamanho)
+    """
+    resultados = {}
+    for tamanho in tamanhos:
+        repeticoes = max(repeticoes_minimas, imagens_por_tamanho // tamanho)
+        lotes = [[imagens[(r * tamanho + i) % len(imagens)] for i in range(tamanho)] for r in range(repeticoes)]
+        if tamanho == 1:
+            resolver = lambda lote: solver.solve_captcha_from_base64(lote[0])
+        else:
+            resolver = lambda lote: solver.solve_many(lote, max_batch_size=tamanho)
+        resolver(lotes[0])  # aquecimento (grafo/buffers desse tamanho)
+        tempos = []
+        for lote in lotes:
+            inicio = time.perf_counter()
+            resolver(lote)
+            tempos.append((time.perf_counter() - inicio) * 1000)
+        tempos = np.array(tempos)
+        resultados[str(tamanho)] = {
+            'repeticoes': repeticoes,
+            'p50_ms': round(float(np.percentile(tempos, 50)), 3),
+            'p95_ms': round(float(np.percentile(tempos, 95)), 3),
+            'p99_ms': round(float(np.percentile(tempos, 99)), 3),
+            'imagens_por_s': round(float(tamanho * len(tempos) / tempos.sum() * 1000), 1),
+        }
+    return resultados
+
+
+def medir_backend(backend, model_dir, arquivos, tamanhos=TAMANHOS_LOTE, imagens_por_tamanho=512):
+    """Mede um backend neste processo (que deve ser novo, para a carga ser fria)"""
+    import base64
+    import importlib
+
+    from captcha_ml.backends import BACKENDS, pico_rss_mb
+
+    os.environ['CAPTCHA_INDICE_OURO'] = '0'
+    modulo, classe, _ = BACKENDS[backend]
+    inicio = time.perf_counter()
+    solver = getattr(importlib.import_module(modulo), classe)(model_dir)
+    carga = time.perf_counter() - inicio
+    if not solver.is_loaded:
+        return {'erro': 'solver não carregado (modelo do backend ausente?)'}
+
+    with open(arquivos[0], 'rb') as f:
+        primeira = base64.b64encode(f.read()).decode()
+    inicio = time.perf_counter()
+    solver.solve_captcha_from_base64(primeira)
+    primeira_inferencia = time.perf_counter() - inicio
+    rss_carga = pico_rss_mb()
+
+    previstos = []
+    for i in range(0, len(arquivos), solver.max_batch_size):
+        previstos.extend(solver.solve_many(arquivos[i:i + solver.max_batch_size]))
+    exata, por_caractere = acuracia(previstos, arquivos, solver.max_length)
+
+    imagens = []
+    for arquivo in arquivos[:max(tamanhos)]:
+        with open(arquivo, 'rb') as f:
+            imagens.append(base64.b64encode(f.read()).decode())
+    lotes = medir_lotes(solver, imagens, tamanhos, imagens_por_tamanho)
+
+    return {
+        'acuracia_exata': round(exata, 5),
+        'acuracia_caractere': round(por_caractere, 5),
+        'carga_s': round(carga, 3),
+        'primeira_inferencia_ms': round(primeira_inferencia * 1000, 2),
+        'rss_carga_mb': round(rss_carga, 1),
+        'rss_pico_mb': round(pico_rss_mb(), 1),
+        'lotes': lotes,
+        # Maior lote de um único forward pass (None = qualquer um)
+        'lote_inferencia': getattr(solver, 'lote_inferencia', None),
+    }
+
+
+def identificar_modelo(model_dir=MODEL_DIR_PADRAO):
+    """sha256 (16 primeiros hex) do meta.pkl e de cada arquivo de pesos/modelo da pasta"""
+    from captcha_ml.backends import assinatura_modelo
+
+    identificacao = {}
+    for nome, _, _ in assinatura_modelo(model_dir):
+        with open(os.path.join(model_dir, nome), 'rb') as f:
+            identificacao[nome] = hashlib.sha256(f.read()).hexdigest()[:16]
+    return identificacao
+
+
+def executar(backends, model_dir=MODEL_DIR_PADRAO, pasta=PASTA_OURO, limite=None, tamanhos=TAMANHOS_LOTE,
+             imagens_por_tamanho=512):
+    """Roda cada backend num processo novo e monta o relatório"""
+    from captcha_ml.backends import backend_disponivel
+
+    arquivos = amostrar(imagens_ouro(pasta), limite)
+    relatorio = {
+        'data': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'modelo': identificar_modelo(model_dir),
+        'imagens': len(arquivos),
+        'limite': limite,
+        'tamanhos_lote': list(tamanhos),
+        'ambiente': {'python': platform.python_version(), 'numpy': np.__version__,
+                     'cpus': os.cpu_count(), 'maquina': platform.machine()},
+        'backends': {},
+    }
+    for backend in backends:
+        if not backend_disponivel(backend):
+            relatorio['backends'][backend] = {'erro': 'dependências não instaladas'}
+            continue
+        print(f"⏱️ {backend}...", flush=True)
+        comando = [sys.executable, '-m', 'captcha_ml.benchmark', '--worker', backend, '--model-dir', model_dir,
+                   '--pasta', pasta, '--imagens-por-tamanho', str(imagens_por_tamanho),
+                   '--tamanhos', *map(str, tamanhos)]
+        if limite:
+            comando += ['--limite', str(limite)]
+        env = dict(os.environ, TF_CPP_MIN_LOG_LEVEL='3', CAPTCHA_INDICE_OURO='0')
+        processo = subprocess.run(comando, env=env, capture_output=True, text=True)
+        linhas = processo.stdout.strip().splitlines()
+        try:
+            relatorio['backends'][backend] = json.loads(linhas[-1])
+        except (IndexError, json.JSONDecodeError):
+            erro = (processo.stderr.strip().splitlines() or ['sem saída'])[-1]
+            relatorio['backends'][backend] = {'erro': f"processo terminou com {processo.returncode}: {erro}"}
+    return relatorio
+
+
+def imprimir(relatorio):
+    print(f"\n{'backend':9s} {'exata':>7s} {'caract.':>8s} {'carga':>7s} {'1ª inf.':>9s} {'RSS pico':>9s}")
+    for backend, r in relatorio['backends'].items():
+        if 'erro' in r:
+            print(f"{backend:9s} ({r['erro']})")
+            continue
+        print(f"{backend:9s} {r['acuracia_exata']:7.2%} {r['acuracia_caractere']:8.2%} {r['carga_s']:6.2f}s "
+              f"{r['primeira_inferencia_ms']:7.1f}ms {r['rss_pico_mb']:6.0f} MB")
+
+    medidos = {b: r for b, r in relatorio['backends'].items() if 'erro' not in r}
+    for backend, r in medidos.items():
+        print(f"\n{backend}: {'lote':>5s} {'p50':>10s} {'p95':>10s} {'p99':>10s} {'img/s':>8s}")
+        maximo = r.get('lote_inferencia')
+        for tamanho, lote in r['lotes'].items():
+            dividido = f"  (em invokes de {maximo})" if maximo and int(tamanho) > maximo else ''
+            print(f"{'':{len(backend) + 1}s} {tamanho:>5s} {lote['p50_ms']:8.2f}ms {lote['p95_ms']:8.2f}ms "
+                  f"{lote['p99_ms']:8.2f}ms {lote['imagens_por_s']:8.1f}{dividido}")
+    print(f"\n(n={relatorio['imagens']} imagens do dataset_ouro; modelo {relatorio['modelo']})")
+
+
+def comparar(atual, anterior):
+    """Diferenças de acurácia, carga, p50 no lote 1 e vazão no maior lote em comum"""
+    if atual['modelo'] != anterior['modelo']:
+        print(f"\nModelo mudou: {anterior['modelo']} -> {atual['modelo']}")
+    print(f"\n{'backend':9s} {'Δ exata':>9s} {'Δ caract.':>10s} {'Δ carga':>9s} {'p50 lote 1':>18s} {'img/s maior lote':>22s}")
+    for backend, r in atual['backends'].items():
+        antes = anterior.get('backends', {}).get(backend)
+        if 'erro' in r or not antes or 'erro' in antes:
+            continue
+        comuns = [t for t in r['lotes'] if t in antes['lotes']]
+        maior = max(comuns, key=int) if comuns else None
+        lote1 = (f"{antes['lotes']['1']['p50_ms']:.2f}->{r['lotes']['1']['p50_ms']:.2f}ms"
+                 if '1' in comuns else '-')
+        vazao = (f"{antes['lotes'][maior]['imagens_por_s']:.0f}->{r['lotes'][maior]['imagens_por_s']:.0f} ({maior})"
+                 if maior else '-')
+        print(f"{backend:9s} {(r['acuracia_exata'] - antes['acuracia_exata']) * 100:+8.2f}pp "
+              f"{(r['acuracia_caractere'] - antes['acuracia_caractere']) * 100:+9.2f}pp "
+              f"{r['carga_s'] - antes['carga_s']:+8.2f}s {lote1:>18s} {vazao:>22s}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from captcha_ml.backends import BACKENDS
+
+    parser = argparse.ArgumentParser(description="Benchmark dos backends do solver no dataset_ouro")
+    parser.add_argument('--backends', nargs='+', default=[b for b in BACKENDS if b != 'servico'],
+                        help="Default: todos os backends locais")
+    parser.add_argument('--model-dir', default=MODEL_DIR_PADRAO)
+    parser.add_argument('--pasta', default=PASTA_OURO)
+    parser.add_argument('--limite', type=int, default=None, help="Imagens na acurácia (amostra fixa; default: todas)")
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=list(TAMANHOS_LOTE))
+    parser.add_argument('--imagens-por-tamanho', type=int, default=512)
+    parser.add_argument('--saida', default='benchmark_solver.json')
+    parser.add_argument('--comparar', help="Relatório anterior para mostrar as diferenças")
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        # Processo filho de `executar`: a última linha da saída é o JSON do backend
+        resultado = medir_backend(args.worker, args.model_dir, amostrar(imagens_ouro(args.pasta), args.limite),
+                                  args.tamanhos, args.imagens_por_tamanho)
+        print(json.dumps(resultado))
+        sys.exit(0)
+
+    relatorio = executar(args.backends, args.model_dir, args.pasta, args.limite, args.tamanhos,
+                         args.imagens_por_tamanho)
+    imprimir(relatorio)
+    with open(args.saida, 'w') as f:
+        json.dump(relatorio, f, indent=2)
+    print(f"Relatório em {args.saida}")
+    if args.comparar:
+        with open(args.comparar) as f:
+            comparar(relatorio, json.load(f))
@@ -6,6 +6,12 @@ import os
 from sklearn.model_selection import train_test_split
 import pickle
 import matplotlib.pyplot as plt
+import sys
+
+# Permite rodar este arquivo direto (python captcha_ml/captcha_model.py)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from captcha_ml.ctc import decodificar_guloso
 
 # --- Callback Visual Simples ---
 class SimpleMonitor(keras.callbacks.Callback):
@@ -143,13 +149,7 @@ class CaptchaModel:
         self.model.compile(optimizer=opt)
 
     def decode_batch_predictions(self, pred):
-        input_len = np.ones(pred.shape[0]) * pred.shape[1]
-        results = keras.backend.ctc_decode(pred, input_length=input_len, greedy=True)[0][0][:, :self.max_length]
-        
-        output_text = []
-        for res in results:
-            output_text.append(self.num_to_label(res))
-        return output_text
+        return decodificar_guloso(np.asarray(pred), self.num_to_char, self.vocab_size, self.max_length)
 
     def prepare_data(self, data_path, batch_size=32):
         data = np.load(data_path, allow_pickle=True)
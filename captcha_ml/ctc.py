@@ -0,0 +1,240 @@
+"""
+Decodificação CTC das saídas do CRNN.
+
+A saída do modelo tem 45 passos x (vocab + 1) classes, com o blank na última
+classe. O decodificador guloso é argmax por passo, junta repetidos e remove o
+blank. `keras.backend.ctc_decode` faz o mesmo montando tensores esparsos, e a
+conversão para texto era um loop Python por caractere. `decodificar_guloso`
+faz tudo em NumPy para o lote inteiro.
+
+`decodificar_beam` é a opção com confiança: beam search CTC restrito a textos
+de exatamente `comprimento` caracteres do vocabulário. Devolve os k melhores
+textos com a probabilidade de cada sequência (soma de todos os alinhamentos).
+O guloso pode devolver 3 ou 5 caracteres, que só são descobertos depois de
+gastar o POST.
+
+    # Tempo de decodificação por lote: NumPy x keras.backend.ctc_decode
+    python -m captcha_ml.ctc
+
+    # Guloso x beam no dataset_ouro (acurácia, textos com tamanho errado, tempo)
+    python -m captcha_ml.ctc --beam
+"""
+
+import math
+
+import numpy as np
+
+_MENOS_INFINITO = float('-inf')
+
+
+def _tabela_caracteres(num_to_char, vocab_size):
+    return np.array([num_to_char[i] for i in range(vocab_size)] + [''], dtype='<U1')
+
+
+def decodificar_guloso(pred, num_to_char, vocab_size, max_length=None):
+    """
+    CTC guloso vetorizado.
+
+    Args:
+        pred: Probabilidades (N, T, vocab_size + 1)
+        num_to_char: Índice -> caractere (do meta.pkl)
+        vocab_size: Tamanho do vocabulário (o blank é o índice vocab_size)
+        max_length: Se dado, corta cada texto nesse tamanho
+
+    Returns:
+        Lista com N textos
+    """
+    indices = np.argmax(pred, axis=-1)
+    n, t = indices.shape
+    manter = np.ones((n, t), dtype=bool)
+    manter[:, 1:] = indices[:, 1:] != indices[:, :-1]
+    manter &= indices < vocab_size
+
+    if any(len(num_to_char[i]) != 1 for i in range(vocab_size)):
+        textos = [''.join(num_to_char[int(v)] for v in linha[m]) for linha, m in zip(indices, manter)]
+    else:
+        # Caracteres mantidos vão para o início da linha (ordem preservada) e cada
+        # linha de T caracteres 'U1' vira uma string 'U{T}'; o resto fica '\0' e some
+        caracteres = np.where(manter, _tabela_caracteres(num_to_char, vocab_size)[indices], '')
+        ordem = np.argsort(~manter, axis=1, kind='stable')
+        caracteres = np.ascontiguousarray(np.take_along_axis(caracteres, ordem, axis=1))
+        textos = caracteres.view(f'<U{t}').ravel().tolist()
+
+    if max_length is not None:
+        textos = [texto[:max_length] for texto in textos]
+    return textos
+
+
+def _somar_log(a, b):
+    """log(exp(a) + exp(b)) sem underflow"""
+    if a == _MENOS_INFINITO:
+        return b
+    if b == _MENOS_INFINITO:
+        return a
+    if a < b:
+        a, b = b, a
+    return a + math.log1p(math.exp(b - a))
+
+
+def _beam_uma(log_probs, vocab_size, comprimento, largura_feixe, log_prob_minima):
+    """
+    Prefix beam search de uma saída (T, vocab_size + 1) em log.
+    Cada prefixo guarda log P(terminar em blank) e log P(terminar no último caractere).
+    """
+    passos = log_probs.shape[0]
+    blank = vocab_size
+    feixe = {(): (0.0, _MENOS_INFINITO)}
+
+    for t in range(passos):
+        linha = log_probs[t].tolist()
+        candidatos = [c for c in range(vocab_size) if linha[c] >= log_prob_minima]
+        log_blank = linha[blank]
+        novos = {}
+
+        def acumular(prefixo, p_blank, p_char):
+            atual = novos.get(prefixo)
+            if atual is None:
+                novos[prefixo] = (p_blank, p_char)
+            else:
+                novos[prefixo] = (_somar_log(atual[0], p_blank), _somar_log(atual[1], p_char))
+
+        for prefixo, (p_blank, p_char) in feixe.items():
+            total = _somar_log(p_blank, p_char)
+            ultimo = prefixo[-1] if prefixo else None
+            # Blank, ou o último caractere repetido sem blank no meio: o prefixo não muda
+            acumular(prefixo, total + log_blank,
+                     p_char + linha[ultimo] if ultimo is not None else _MENOS_INFINITO)
+            if len(prefixo) == comprimento:
+                continue
+            for c in candidatos:
+                # Repetir o último caractere só vira um caractere novo depois de um blank
+                acumular(prefixo + (c,), _MENOS_INFINITO, (p_blank if c == ultimo else total) + linha[c])
+
+        # Poda por tamanho de prefixo, para hipóteses com o tamanho certo não serem
+        # expulsas por uma mais provável com caracteres faltando; descarta também
+        # prefixos que não cabem mais nos passos restantes
+        restantes = passos - t - 1
+        por_tamanho = {}
+        for prefixo, probs in novos.items():
+            if comprimento - len(prefixo) <= restantes:
+                por_tamanho.setdefault(len(prefixo), []).append((_somar_log(*probs), prefixo, probs))
+        feixe = {}
+        for hipoteses in por_tamanho.values():
+            hipoteses.sort(key=lambda h: h[0], reverse=True)
+            for _, prefixo, probs in hipoteses[:largura_feixe]:
+                feixe[prefixo] = probs
+
+    finais = [(_somar_log(*probs), prefixo) for prefixo, probs in feixe.items() if len(prefixo) == comprimento]
+    finais.sort(key=lambda h: h[0], reverse=True)
+    return finais
+
+
+def decodificar_beam(pred, num_to_char, vocab_size, comprimento, top_k=5, largura_feixe=10, prob_minima=1e-3):
+    """
+    Beam search CTC restrito a exatamente `comprimento` caracteres.
+
+    Args:
+        pred: Probabilidades (N, T, vocab_size + 1)
+        num_to_char: Índice -> caractere (do meta.pkl)
+        vocab_size: Tamanho do vocabulário (o blank é o índice vocab_size)
+        comprimento: Número de caracteres do captcha (max_length)
+        top_k: Alternativas devolvidas por imagem
+        largura_feixe: Prefixos mantidos por tamanho a cada passo
+        prob_minima: Caracteres abaixo dessa probabilidade num passo não abrem prefixo novo
+
+    Returns:
+        Lista com N listas de até `top_k` pares (texto, probabilidade), da mais
+        provável para a menos; lista vazia se nenhum texto do tamanho certo sobreviver
+    """
+    log_pred = np.log(np.maximum(np.asarray(pred, dtype=np.float64), 1e-30))
+    log_prob_minima = math.log(prob_minima)
+    saida = []
+    for log_probs in log_pred:
+        finais = _beam_uma(log_probs, vocab_size, comprimento, largura_feixe, log_prob_minima)
+        saida.append([(''.join(num_to_char[int(c)] for c in prefixo), math.exp(log_p))
+                      for log_p, prefixo in finais[:top_k]])
+    return saida
+
+
+def decodificar_keras(pred, num_to_char, vocab_size, max_length=None):
+    """Decodificação antiga (keras.backend.ctc_decode + loop Python), mantida para comparação"""
+    from tensorflow import keras
+
+    input_len = np.ones(pred.shape[0]) * pred.shape[1]
+    results = keras.backend.ctc_decode(pred, input_length=input_len, greedy=True)[0][0]
+    if max_length is not None:
+        results = results[:, :max_length]
+    output_text = []
+    for res in np.asarray(results):
+        res_str = ""
+        for val in res:
+            if val != -1 and val < vocab_size:
+                res_str += num_to_char[int(val)]
+        output_text.append(res_str)
+    return output_text
+
+
+def comparar_decodificadores(pred, num_to_char, vocab_size, tamanhos_lote=(1, 32, 256), repeticoes=20):
+    """Imprime o tempo médio por lote de cada decodificador e confere se concordam"""
+    import time
+
+    print(f"\n{'lote':>6s} {'keras':>10s} {'numpy':>10s} {'ganho':>7s}  iguais")
+    for tamanho in tamanhos_lote:
+        lote = pred[np.arange(tamanho) % len(pred)]
+        tempos = {}
+        saidas = {}
+        for nome, decodificador in (('keras', decodificar_keras), ('numpy', decodificar_guloso)):
+            saidas[nome] = decodificador(lote, num_to_char, vocab_size)  # aquecimento
+            inicio = time.perf_counter()
+            for _ in range(repeticoes):
+                decodificador(lote, num_to_char, vocab_size)
+            tempos[nome] = (time.perf_counter() - inicio) / repeticoes * 1000
+        print(f"{tamanho:6d} {tempos['keras']:8.3f}ms {tempos['numpy']:8.3f}ms "
+              f"{tempos['keras'] / tempos['numpy']:6.1f}x  {saidas['keras'] == saidas['numpy']}")
+
+
+def comparar_beam(pred, rotulos, num_to_char, vocab_size, comprimento):
+    """Acurácia, textos com tamanho errado e tempo por imagem do guloso x beam"""
+    import time
+
+    inicio = time.perf_counter()
+    gulosos = decodificar_guloso(pred, num_to_char, vocab_size)
+    tempo_guloso = (time.perf_counter() - inicio) / len(pred) * 1000
+    inicio = time.perf_counter()
+    feixes = decodificar_beam(pred, num_to_char, vocab_size, comprimento)
+    tempo_beam = (time.perf_counter() - inicio) / len(pred) * 1000
+    melhores = [alternativas[0][0] if alternativas else None for alternativas in feixes]
+
+    print(f"\n{'decodificador':14s} {'acerto':>7s} {'tam. errado':>12s} {'ms/img':>8s}")
+    for nome, textos, tempo in (('guloso', gulosos, tempo_guloso), ('beam', melhores, tempo_beam)):
+        acerto = np.mean([t == r for t, r in zip(textos, rotulos)]) * 100
+        errados = sum(t is None or len(t) != comprimento for t in textos)
+        print(f"{nome:14s} {acerto:6.1f}% {errados:12d} {tempo:8.3f}")
+    no_top_k = np.mean([any(t == r for t, _ in alts) for alts, r in zip(feixes, rotulos)]) * 100
+    print(f"rótulo entre as {len(max(feixes, key=len))} alternativas do beam: {no_top_k:.1f}%")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from captcha_ml.avaliacao import imagens_ouro, label_do_arquivo
+    from captcha_ml.numpy_solver import NumpyCaptchaSolver
+    from captcha_ml.preprocessamento import decodificar, para_entrada_modelo, preprocessar_lote
+
+    parser = argparse.ArgumentParser(description="Benchmark dos decodificadores CTC")
+    parser.add_argument('--model-dir', default="captcha_ml/models")
+    parser.add_argument('--imagens', type=int, default=256, help="Imagens do dataset_ouro usadas para gerar as saídas")
+    parser.add_argument('--beam', action='store_true', help="Compara guloso x beam restrito em vez do keras")
+    args = parser.parse_args()
+
+    # Saídas reais do modelo (o backend NumPy gera as mesmas probabilidades do Keras)
+    solver = NumpyCaptchaSolver(args.model_dir)
+    arquivos = imagens_ouro(limite=args.imagens)
+    lote = para_entrada_modelo(preprocessar_lote([decodificar(f) for f in arquivos]))
+    pred = np.concatenate([solver._inferir(lote[i:i + solver.max_batch_size])
+                           for i in range(0, len(lote), solver.max_batch_size)])
+    if args.beam:
+        comparar_beam(pred, [label_do_arquivo(f) for f in arquivos], solver.num_to_char,
+                      solver.vocab_size, solver.max_length)
+    else:
+        comparar_decodificadores(pred, solver.num_to_char, solver.vocab_size)
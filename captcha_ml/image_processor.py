@@ -1,14 +1,18 @@
 import numpy as np
-from PIL import Image
 import os
 import glob
 import sys
 
+# Permite rodar este arquivo direto de dentro de captcha_ml/
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from captcha_ml.preprocessamento import decodificar, preprocessar, preprocessar_lote
+
 class ImageProcessor:
     """
     Processador de Imagens Otimizado v2.
     - Suporta múltiplas fontes de dados (Raw + Ouro).
-    - Garante consistência exata com o CaptchaSolver (PIL + Padding).
+    - Garante consistência exata com o CaptchaSolver (mesmo preprocessamento.py).
     """
     
     def __init__(self, processed_data_dir="captcha_ml/data/processed"):
@@ -26,44 +30,11 @@ class ImageProcessor:
     def preprocess_image(self, image_path):
         """
         Lê e processa uma imagem.
-        IMPORTANTE: Esta lógica deve ser IDÊNTICA à do captcha_solver.py
+        A lógica fica em preprocessamento.py, a mesma usada pelo CaptchaSolver,
         para evitar 'Training-Serving Skew'.
         """
-        img = Image.open(image_path)
-            
-        # 1. Tratar Transparência (Igual ao Solver)
-        if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
-            bg = Image.new('RGB', img.size, (255, 255, 255))
-            if img.mode == 'P': img = img.convert('RGBA')
-            bg.paste(img, mask=img.split()[-1])
-            img = bg
-            
-        # 2. Converter para Cinza
-        img = img.convert('L')
-        
-        # 3. Threshold (Binarização - Texto Branco, Fundo Preto)
-        # Transforma tudo < 180 (Texto) em 255 (Branco)
-        img = img.point(lambda p: 255 if p < 180 else 0)
-        
-        # 4. Redimensionar com Padding (Manter proporção)
-        target_w, target_h = self.img_width, self.img_height
-        
-        # Calcula proporção
-        ratio = min(target_w / img.width, target_h / img.height)
-        new_w = int(img.width * ratio)
-        new_h = int(img.height * ratio)
-        
-        # Resize (Nearest para manter bordas duras)
-        img = img.resize((new_w, new_h), Image.Resampling.NEAREST)
-        
-        # Cola no centro de um fundo preto
-        final_img = Image.new('L', (target_w, target_h), 0)
-        offset_x = (target_w - new_w) // 2
-        offset_y = (target_h - new_h) // 2
-        final_img.paste(img, (offset_x, offset_y))
-        
         # Retorna array 0-255 (O pipeline de treino fará a normalização final 0-1)
-        return np.array(final_img)
+        return preprocessar(image_path, self.img_width, self.img_height)
 
     def process_dataset(self):
         """Lê imagens de TODAS as pastas fonte e salva em um único .npy"""
@@ -87,7 +58,8 @@ class ImageProcessor:
             files = glob.glob(os.path.join(source_dir, "*.png"))
             print(f"📂 Processando {len(files)} imagens de: {os.path.basename(source_dir)}")
             
-            local_count = 0
+            decodificadas = []
+            labels = []
             for file_path in files:
                 try:
                     filename = os.path.basename(file_path)
@@ -101,16 +73,18 @@ class ImageProcessor:
                     if len(label) != 4:
                         continue
                     
-                    # Processar
-                    img_array = self.preprocess_image(file_path)
-                    
-                    all_images.append(img_array)
-                    all_labels.append(label)
-                    local_count += 1
+                    decodificadas.append(decodificar(file_path))
+                    labels.append(label)
                     
                 except Exception as e:
                     print(f"❌ Erro em {filename}: {e}")
             
+            # Processar a pasta inteira numa chamada vetorizada
+            if decodificadas:
+                all_images.extend(preprocessar_lote(decodificadas, self.img_width, self.img_height))
+                all_labels.extend(labels)
+            local_count = len(decodificadas)
+            
             print(f"   -> {local_count} imagens válidas adicionadas.")
             total_count += local_count
 
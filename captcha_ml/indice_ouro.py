@@ -0,0 +1,360 @@
+"""
+Índice dos captchas já confirmados pelo servidor (dataset_ouro).
+
+Todo captcha aceito pelo BID vira `<label>_<timestamp>.png` em
+`captcha_ml/data/dataset_ouro` (ver `salvar_dataset_ouro`). Se o servidor
+reemitir uma imagem, a resposta certa já é conhecida e não precisa passar pelo
+CRNN. O índice tem duas chaves por imagem:
+
+    1. SHA-256 dos bytes do PNG: acerto exato, antes de decodificar
+    2. Hash perceptual: a imagem pré-processada (binarizada, 50x180) reduzida
+       em blocos 2x2 (2250 bits). Acerta os mesmos pixels em outro arquivo.
+       Entre captchas diferentes do dataset_ouro a menor distância é de 394
+       bits, e o mesmo captcha recomprimido em JPEG (q=85) fica a até ~31
+       bits. Com `distancia_maxima` (CAPTCHA_INDICE_DISTANCIA, ex: 64) a
+       consulta também procura o hash mais próximo, ao custo de uma varredura
+       do índice a cada imagem que não acertou (~2 ms com 13 mil imagens no
+       NumPy 2, ~17 ms no 1.x); o default 0 aceita só hash igual.
+
+O índice fica salvo em `captcha_ml/data/indice_ouro.npz`; na carga só os
+arquivos novos da pasta são processados. Depois disso a pasta é conferida a
+cada `intervalo_atualizacao` segundos (outros processos também gravam nela), e
+`salvar_dataset_ouro` registra o captcha novo direto no índice do processo.
+
+Os solvers do registro (`backends.get_solver`) consultam o índice antes da
+inferência; CAPTCHA_INDICE_OURO=0 desliga, e sem a variável ele fica desligado
+quando BID_BASE_URL não é o BID de produção (ver `indice_ouro_ativo`).
+
+    # Monta/atualiza o índice e mede taxa de acerto e latência da consulta
+    python -m captcha_ml.indice_ouro
+"""
+
+import glob
+import hashlib
+import os
+import threading
+import time
+
+import numpy as np
+
+from captcha_ml.avaliacao import label_do_arquivo
+from captcha_ml.preprocessamento import decodificar, preprocessar_lote
+
+PASTA_OURO = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'dataset_ouro')
+ARQUIVO_INDICE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'indice_ouro.npz')
+BLOCO = 2
+
+_BITS_POR_BYTE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint16)
+
+
+def hash_bytes(dados):
+    return hashlib.sha256(dados).digest()
+
+
+def hash_perceptual(preprocessadas):
+    """(N, H, W) uint8 0/255 de `preprocessar_lote` -> (N, bits/8) uint8"""
+    n, h, w = preprocessadas.shape
+    h, w = h // BLOCO, w // BLOCO
+    blocos = preprocessadas[:, :h * BLOCO, :w * BLOCO].reshape(n, h, BLOCO, w, BLOCO)
+    return np.packbits(blocos.mean(axis=(2, 4)).reshape(n, -1) > 127, axis=1)
+
+
+class IndiceOuro:
+    """
+    Consulta (bytes ou hash perceptual) -> label confirmado pelo servidor.
+
+    Args:
+        pasta: Pasta do dataset_ouro
+        arquivo: Onde o índice é salvo (None = não salva)
+        distancia_maxima: Bits diferentes aceitos no hash perceptual (0 = só igual)
+        intervalo_atualizacao: Segundos entre conferências da pasta por arquivos novos
+    """
+
+    def __init__(self, pasta=PASTA_OURO, arquivo=ARQUIVO_INDICE, distancia_maxima=0, intervalo_atualizacao=30):
+        self.pasta = pasta
+        self.arquivo = arquivo
+        self.distancia_maxima = distancia_maxima
+        self.intervalo_atualizacao = intervalo_atualizacao
+
+        self._por_bytes = {}
+        self._por_hash = {}
+        self._nomes = []
+        self._labels = []
+        self._shas = []
+        self._hashes = []
+        self._matriz = None  # hashes empilhados para a busca por distância
+        self._lock = threading.Lock()
+        self._lock_atualizacao = threading.Lock()
+        self._mtime_pasta = None
+        self._atualizado_em = 0.0
+        self.pronto = threading.Event()
+
+        self.consultas = {'bytes': 0, 'hash': 0}
+        self.acertos = {'bytes': 0, 'hash': 0}
+        self._tempos = {'bytes': [], 'hash': []}
+
+    def __len__(self):
+        return len(self._labels)
+
+    def _adicionar(self, nome, label, sha, hash_p):
+        self._nomes.append(nome)
+        self._labels.append(label)
+        self._shas.append(sha)
+        self._hashes.append(hash_p)
+        self._por_bytes.setdefault(sha, label)
+        self._por_hash.setdefault(hash_p.tobytes(), label)
+        self._matriz = None
+
+    def adicionar(self, dados, label, nome=None):
+        """Registra um captcha confirmado (bytes do PNG)"""
+        hash_p = hash_perceptual(preprocessar_lote([decodificar(dados)]))[0]
+        with self._lock:
+            self._adicionar(nome or '', label, hash_bytes(dados), hash_p)
+
+    def carregar(self):
+        """Lê o índice salvo e processa os arquivos da pasta que ainda não estão nele"""
+        if self.arquivo and os.path.exists(self.arquivo):
+            try:
+                salvo = np.load(self.arquivo)
+                with self._lock:
+                    for nome, label, sha, hash_p in zip(salvo['nomes'], salvo['labels'], salvo['shas'], salvo['hashes']):
+                        self._adicionar(str(nome), str(label), sha.tobytes(), hash_p)
+            except Exception as e:
+                print(f"⚠️ Índice do dataset_ouro ilegível ({e}); reconstruindo")
+        novos = self.atualizar(forcar=True)
+        if novos and self.arquivo:
+            self.salvar()
+        self.pronto.set()
+        return self
+
+    def carregar_em_background(self):
+        threading.Thread(target=self.carregar, name="indice-ouro", daemon=True).start()
+        return self
+
+    def atualizar(self, forcar=False, tamanho_lote=512):
+        """Indexa arquivos novos da pasta; devolve quantos entraram"""
+        agora = time.monotonic()
+        if not forcar and agora - self._atualizado_em < self.intervalo_atualizacao:
+            return 0
+        # Uma thread confere a pasta; as outras seguem com o índice que já existe
+        if not self._lock_atualizacao.acquire(blocking=forcar):
+            return 0
+        try:
+            self._atualizado_em = agora
+            return self._atualizar(forcar, tamanho_lote)
+        finally:
+            self._lock_atualizacao.release()
+
+    def _atualizar(self, forcar, tamanho_lote):
+        try:
+            mtime = os.stat(self.pasta).st_mtime_ns
+        except OSError:
+            return 0
+        if not forcar and mtime == self._mtime_pasta:
+            return 0
+        self._mtime_pasta = mtime
+
+        conhecidos = set(self._nomes)
+        novos = [f for f in sorted(glob.glob(os.path.join(self.pasta, '*.png')))
+                 if os.path.basename(f) not in conhecidos]
+        for inicio in range(0, len(novos), tamanho_lote):
+            nomes, shas, cinzas = [], [], []
+            for caminho in novos[inicio:inicio + tamanho_lote]:
+                try:
+                    with open(caminho, 'rb') as f:
+                        dados = f.read()
+                    cinzas.append(decodificar(dados))
+                except Exception:
+                    continue
+                nomes.append(os.path.basename(caminho))
+                shas.append(hash_bytes(dados))
+            if not nomes:
+                continue
+            hashes = hash_perceptual(preprocessar_lote(cinzas))
+            with self._lock:
+                for nome, sha, hash_p in zip(nomes, shas, hashes):
+                    self._adicionar(nome, label_do_arquivo(nome), sha, hash_p)
+        return len(novos)
+
+    def salvar(self):
+        with self._lock:
+            dados = {
+                'nomes': np.array(self._nomes),
+                'labels': np.array(self._labels),
+                'shas': np.array([np.frombuffer(s, dtype=np.uint8) for s in self._shas]).reshape(-1, 32),
+                'hashes': np.array(self._hashes, dtype=np.uint8),
+            }
+        temporario = self.arquivo + '.tmp.npz'
+        np.savez(temporario, **dados)
+        os.replace(temporario, self.arquivo)
+
+    def _mais_proximo(self, hash_p):
+        with self._lock:
+            if self._matriz is None:
+                # Linhas completadas até múltiplo de 8 bytes para contar bits em uint64
+                matriz = np.zeros((len(self._hashes), -(-hash_p.size // 8) * 8), dtype=np.uint8)
+                if self._hashes:
+                    matriz[:, :hash_p.size] = self._hashes
+                self._matriz = matriz
+            matriz = self._matriz
+            labels = self._labels
+        if not len(matriz):
+            return None
+        consulta = np.zeros(matriz.shape[1], dtype=np.uint8)
+        consulta[:hash_p.size] = hash_p
+        diferentes = np.bitwise_xor(matriz, consulta)
+        if hasattr(np, 'bitwise_count'):  # NumPy >= 2.0, ~10x mais rápido que a tabela
+            distancias = np.bitwise_count(diferentes.view(np.uint64)).sum(axis=1)
+        else:
+            distancias = _BITS_POR_BYTE[diferentes].sum(axis=1)
+        melhor = int(np.argmin(distancias))
+        return labels[melhor] if distancias[melhor] <= self.distancia_maxima else None
+
+    def _registrar(self, tipo, acerto, inicio):
+        tempos = self._tempos[tipo]
+        with self._lock:
+            self.consultas[tipo] += 1
+            self.acertos[tipo] += acerto
+            if len(tempos) >= 10000:
+                del tempos[:5000]
+            tempos.append(time.perf_counter() - inicio)
+
+    def buscar_bytes(self, dados):
+        """Label confirmado para os bytes exatos do PNG, ou None (não decodifica a imagem)"""
+        inicio = time.perf_counter()
+        label = None
+        if self.pronto.is_set():
+            self.atualizar()
+            label = self._por_bytes.get(hash_bytes(dados))
+        self._registrar('bytes', label is not None, inicio)
+        return label
+
+    def buscar_hash(self, preprocessada):
+        """Label confirmado pelo hash perceptual de uma imagem (H, W) de `preprocessar_lote`, ou None"""
+        inicio = time.perf_counter()
+        label = None
+        if self.pronto.is_set():
+            hash_p = hash_perceptual(preprocessada[np.newaxis])[0]
+            label = self._por_hash.get(hash_p.tobytes())
+            if label is None and self.distancia_maxima:
+                label = self._mais_proximo(hash_p)
+        self._registrar('hash', label is not None, inicio)
+        return label
+
+    def buscar(self, dados, preprocessada=None):
+        """Bytes exatos primeiro; se não acertar e houver `preprocessada`, o hash perceptual"""
+        label = self.buscar_bytes(dados)
+        if label is None and preprocessada is not None:
+            label = self.buscar_hash(preprocessada)
+        return label
+
+    def estatisticas(self):
+        """
+        Consultas e acertos de cada chave, taxa de acerto total (toda imagem passa
+        primeiro pelos bytes) e latência das consultas em µs
+        """
+        with self._lock:
+            saida = {'imagens': len(self._labels), 'pronto': self.pronto.is_set()}
+            for tipo in ('bytes', 'hash'):
+                tempos = np.array(self._tempos[tipo]) * 1e6
+                saida[f'consultas_{tipo}'] = self.consultas[tipo]
+                saida[f'acertos_{tipo}'] = self.acertos[tipo]
+                saida[f'p50_us_{tipo}'] = round(float(np.percentile(tempos, 50)), 1) if len(tempos) else None
+                saida[f'p99_us_{tipo}'] = round(float(np.percentile(tempos, 99)), 1) if len(tempos) else None
+            total = self.consultas['bytes']
+            saida['taxa_acerto'] = (self.acertos['bytes'] + self.acertos['hash']) / total if total else 0.0
+            return saida
+
+
+_indice = None
+_indice_lock = threading.Lock()
+
+
+def indice_ouro_ativo():
+    """
+    CAPTCHA_INDICE_OURO=1/0 liga/desliga. Sem a variável, o índice só vale contra o
+    BID de produção: um BID_BASE_URL de teste (local_server.py) serve imagens do
+    próprio dataset_ouro, e todas seriam respondidas pelo hash.
+    """
+    valor = os.environ.get('CAPTCHA_INDICE_OURO')
+    if valor is not None:
+        return valor == '1'
+    from scrapper.session_pool import BID_BASE_URL, BID_URL_PRODUCAO
+    return BID_BASE_URL == BID_URL_PRODUCAO
+
+
+def get_indice_ouro(criar=True):
+    """Índice compartilhado pelo processo; a primeira chamada começa a carga em background"""
+    global _indice
+    if _indice is None and criar:
+        with _indice_lock:
+            if _indice is None:
+                distancia = int(os.environ.get('CAPTCHA_INDICE_DISTANCIA', 0))
+                _indice = IndiceOuro(distancia_maxima=distancia).carregar_em_background()
+    return _indice
+
+
+def registrar_confirmado(dados, label, nome=None):
+    """Chamado por `salvar_dataset_ouro`: entra no índice do processo, se houver um"""
+    indice = get_indice_ouro(criar=False)
+    if indice is not None:
+        indice.adicionar(dados, label, nome)
+
+
+def _medir(indice, amostras, nome):
+    """Taxa de acerto e latência de `buscar` (bytes e, se preciso, hash perceptual)"""
+    tempos = []
+    acertos = 0
+    for dados, label in amostras:
+        preprocessada = preprocessar_lote([decodificar(dados)])[0]
+        inicio = time.perf_counter()
+        encontrado = indice.buscar(dados, preprocessada)
+        tempos.append((time.perf_counter() - inicio) * 1e6)
+        acertos += encontrado == label
+    tempos = np.array(tempos)
+    print(f"{nome:30s} {acertos / len(amostras):8.1%} {np.percentile(tempos, 50):9.1f}µs "
+          f"{np.percentile(tempos, 99):9.1f}µs")
+
+
+if __name__ == "__main__":
+    import argparse
+    import io
+
+    from PIL import Image
+
+    from captcha_ml.avaliacao import imagens_ouro
+
+    parser = argparse.ArgumentParser(description="Índice de captchas confirmados (dataset_ouro)")
+    parser.add_argument('--reconstruir', action='store_true', help="Ignora o índice salvo")
+    parser.add_argument('--amostras', type=int, default=500)
+    parser.add_argument('--distancia-maxima', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.reconstruir and os.path.exists(ARQUIVO_INDICE):
+        os.remove(ARQUIVO_INDICE)
+    inicio = time.perf_counter()
+    indice = IndiceOuro(distancia_maxima=args.distancia_maxima).carregar()
+    print(f"Índice: {len(indice)} imagens em {time.perf_counter() - inicio:.2f}s ({ARQUIVO_INDICE})")
+
+    arquivos = imagens_ouro(PASTA_OURO)
+    rng = np.random.default_rng(0)
+    escolhidos = [arquivos[i] for i in rng.choice(len(arquivos), min(args.amostras, len(arquivos)), replace=False)]
+    originais = []
+    for arquivo in escolhidos:
+        with open(arquivo, 'rb') as f:
+            originais.append((f.read(), label_do_arquivo(arquivo)))
+
+    def reencodar(dados, formato, deslocar=0, **opcoes):
+        imagem = Image.open(io.BytesIO(dados)).convert('RGB')
+        if deslocar:
+            imagem = imagem.transform(imagem.size, Image.AFFINE, (1, 0, deslocar, 0, 1, 0), fillcolor=(255, 255, 255))
+        saida = io.BytesIO()
+        imagem.save(saida, format=formato, **opcoes)
+        return saida.getvalue()
+
+    print(f"\n{'consulta':30s} {'acerto':>8s} {'p50':>11s} {'p99':>11s}")
+    _medir(indice, originais, "mesmos bytes")
+    _medir(indice, [(reencodar(d, 'PNG'), label) for d, label in originais], "mesmos pixels, outro arquivo")
+    _medir(indice, [(reencodar(d, 'JPEG', quality=85), label) for d, label in originais], "JPEG recomprimido (q=85)")
+    _medir(indice, [(reencodar(d, 'PNG', deslocar=3), label) for d, label in originais], "deslocada 3px (outra imagem)")
+    print(f"\n{indice.estatisticas()}")
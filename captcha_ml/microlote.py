@@ -0,0 +1,259 @@
+"""
+Micro-lotes de captchas para scrappers com várias threads.
+
+Com `buscar_historico_atleta` rodando num pool de threads, cada thread chamava
+o solver com uma imagem só, e as inferências de lote 1 disputavam o mesmo
+modelo. Aqui as threads só enfileiram a imagem e recebem um Future. Uma thread
+de fundo junta os pedidos que chegam em até `espera_ms` (ou até `max_lote`),
+faz um forward pass e resolve todos os Futures.
+
+A decodificação do PNG acontece na thread de quem pede. A thread de fundo só
+faz pré-processamento, inferência e decodificação CTC do lote. Captchas que
+estão no índice do dataset_ouro (indice_ouro.py) são respondidos sem entrar
+na fila (mesmos bytes) ou sem inferência (mesmo hash). O solver vem
+de `backends.get_solver` a cada lote, então a recarga de pesos continua valendo.
+
+Ligado por CAPTCHA_MICROLOTE=1 ou `configurar_microlote()`: a partir daí
+`solve_captcha_auto` e `solve_with_confidence_auto` passam por aqui.
+
+    # Vazão com 1, 2, 4 e 8 threads: direto x micro-lote
+    python -m captcha_ml.microlote --backend keras
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from captcha_ml.preprocessamento import decodificar, ler_bytes, para_entrada_modelo, preprocessar_lote
+
+MODEL_DIR_PADRAO = "captcha_ml/models"
+
+
+class MicroLoteSolver:
+    """
+    Frente de micro-lotes para um solver do registro de backends.
+
+    Args:
+        backend: Backend do solver (default: CAPTCHA_BACKEND)
+        model_dir: Pasta do modelo
+        espera_ms: Quanto o primeiro pedido de um lote espera por companhia
+        max_lote: Máximo de imagens por forward pass
+        solver: Solver a usar no lugar do registro (ex: um já carregado)
+    """
+
+    def __init__(self, backend=None, model_dir=MODEL_DIR_PADRAO, espera_ms=2.0, max_lote=32, solver=None):
+        self.backend = backend
+        self.model_dir = model_dir
+        self.espera = espera_ms / 1000
+        self.max_lote = max_lote
+        self.solver = solver
+        self.lotes = 0
+        self.imagens = 0
+        # Threads bloqueadas em solve_*: só vale esperar por companhia se houver outras
+        self._ativos = 0
+        self._ativos_lock = threading.Lock()
+
+        self._fila = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, name="captcha-microlote", daemon=True)
+        self._thread.start()
+
+    def _solver(self):
+        if self.solver is not None:
+            return self.solver
+        from captcha_ml.backends import get_solver
+        return get_solver(self.backend, self.model_dir)
+
+    def submit(self, imagem, com_confianca=False):
+        """
+        Enfileira um captcha (base64, bytes ou caminho) e devolve um Future com o
+        código (None se falhar), ou o dict de `solve_with_confidence` com `com_confianca`.
+        """
+        futuro = Future()
+        try:
+            solver = self._solver()
+            dados = ler_bytes(imagem)
+            # Captcha já confirmado pelos mesmos bytes: responde sem entrar na fila
+            codigo = solver._consultar_indice(dados) if solver.is_loaded else None
+            if codigo is not None:
+                futuro.set_result(solver._resultado_do_indice(codigo) if com_confianca else codigo)
+                return futuro
+            cinza = decodificar(dados)
+        except Exception:
+            futuro.set_result(None)
+            return futuro
+        self._fila.put((cinza, com_confianca, futuro))
+        return futuro
+
+    def resolver(self, imagens, com_confianca=False):
+        """Enfileira as imagens de um chamador e espera os resultados (mesma ordem)"""
+        with self._ativos_lock:
+            self._ativos += 1
+        try:
+            futuros = [self.submit(imagem, com_confianca) for imagem in imagens]
+            return [futuro.result() for futuro in futuros]
+        finally:
+            with self._ativos_lock:
+                self._ativos -= 1
+
+    def solve_captcha_from_base64(self, base64_string):
+        return self.resolver([base64_string])[0]
+
+    def solve_with_confidence(self, image):
+        return self.resolver([image], com_confianca=True)[0]
+
+    def _loop(self):
+        while True:
+            item = self._fila.get()
+            if item is None:
+                return
+            lote = [item]
+            limite = time.monotonic() + self.espera
+            while len(lote) < self.max_lote:
+                try:
+                    # O que já está na fila entra sempre; esperar só se outras threads
+                    # estiverem no meio de um pedido
+                    if len(lote) >= self._ativos:
+                        item = self._fila.get_nowait()
+                    else:
+                        restante = limite - time.monotonic()
+                        if restante <= 0:
+                            break
+                        item = self._fila.get(timeout=restante)
+                except queue.Empty:
+                    break
+                if item is None:
+                    # parar(): processa o que já chegou e encerra
+                    self._processar(lote)
+                    return
+                lote.append(item)
+            self._processar(lote)
+
+    def _processar(self, lote):
+        lote = [item for item in lote if item[2].set_running_or_notify_cancel()]
+        if not lote:
+            return
+        try:
+            solver = self._solver()
+            if not solver.is_loaded:
+                raise RuntimeError("solver não carregado")
+            preprocessadas = preprocessar_lote([cinza for cinza, _, _ in lote], solver.img_width, solver.img_height)
+            textos = [None] * len(lote)
+            novas = list(range(len(lote)))
+            if solver.indice_ouro is not None:
+                # Mesmos pixels de um captcha confirmado (hash perceptual): sem inferência
+                novas = []
+                for i, preprocessada in enumerate(preprocessadas):
+                    codigo = solver.indice_ouro.buscar_hash(preprocessada)
+                    if codigo is None:
+                        novas.append(i)
+                    else:
+                        textos[i] = solver._resultado_do_indice(codigo) if lote[i][1] else codigo
+            if novas:
+                entrada = para_entrada_modelo(preprocessadas[novas])
+                # Sozinho, o pedido usa o caminho de imagem única do solver (grafo fixo no Keras)
+                preds = solver._prever_um(entrada) if len(novas) == 1 else solver._inferir(entrada)
+                for i, texto in zip(novas, solver._decode_batch_predictions(preds)):
+                    textos[i] = texto
+                com_confianca = [j for j, i in enumerate(novas) if lote[i][1]]
+                if com_confianca:
+                    for j, resultado in zip(com_confianca, solver._decodificar_com_confianca(preds[com_confianca])):
+                        textos[novas[j]] = resultado
+        except Exception as e:
+            print(f"⚠️ Micro-lote de {len(lote)} captchas falhou: {e}")
+            textos = [None] * len(lote)
+        self.lotes += 1
+        self.imagens += len(lote)
+        for (_, _, futuro), texto in zip(lote, textos):
+            futuro.set_result(texto)
+
+    def parar(self):
+        self._fila.put(None)
+        self._thread.join(timeout=5)
+
+
+_microlotes = {}
+_ativo = os.environ.get('CAPTCHA_MICROLOTE', '0') == '1'
+_microlote_lock = threading.Lock()
+
+
+def microlote_ativo():
+    return _ativo
+
+
+def get_microlote(backend=None, model_dir=MODEL_DIR_PADRAO):
+    """Frente de micro-lotes compartilhada pelo processo para (backend, model_dir)"""
+    from captcha_ml.backends import backend_padrao
+
+    chave = (backend or backend_padrao(), model_dir)
+    microlote = _microlotes.get(chave)
+    if microlote is None:
+        with _microlote_lock:
+            microlote = _microlotes.get(chave)
+            if microlote is None:
+                microlote = _microlotes[chave] = MicroLoteSolver(*chave)
+    return microlote
+
+
+def configurar_microlote(ativo=True, backend=None, model_dir=MODEL_DIR_PADRAO, **kwargs):
+    """Liga/desliga os micro-lotes e troca os parâmetros (ex: configurar_microlote(espera_ms=5))"""
+    from captcha_ml.backends import backend_padrao
+
+    global _ativo
+    chave = (backend or backend_padrao(), model_dir)
+    with _microlote_lock:
+        anterior = _microlotes.pop(chave, None)
+        if ativo:
+            _microlotes[chave] = MicroLoteSolver(*chave, **kwargs)
+        _ativo = ativo
+    if anterior is not None:
+        anterior.parar()
+    return _microlotes.get(chave)
+
+
+def medir_vazao(resolver, imagens, threads, por_thread=50):
+    """Captchas/s com `threads` threads chamando `resolver(base64)` `por_thread` vezes cada"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    def trabalhar(indice):
+        for i in range(por_thread):
+            resolver(imagens[(indice * por_thread + i) % len(imagens)])
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(trabalhar, range(threads)))
+    return threads * por_thread / (time.perf_counter() - inicio)
+
+
+if __name__ == "__main__":
+    import argparse
+    import base64
+
+    from captcha_ml.avaliacao import imagens_ouro
+    from captcha_ml.backends import get_solver, preload_solver
+
+    parser = argparse.ArgumentParser(description="Vazão do solver com várias threads: direto x micro-lote")
+    parser.add_argument('--backend', default=None)
+    parser.add_argument('--model-dir', default=MODEL_DIR_PADRAO)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--por-thread', type=int, default=50)
+    parser.add_argument('--espera-ms', type=float, default=2.0)
+    parser.add_argument('--max-lote', type=int, default=32)
+    args = parser.parse_args()
+
+    # As imagens são do dataset_ouro: com o índice, todas acertariam sem inferência
+    os.environ['CAPTCHA_INDICE_OURO'] = '0'
+    imagens = [base64.b64encode(open(f, 'rb').read()).decode() for f in imagens_ouro(limite=200)]
+    solver = preload_solver(args.backend, args.model_dir)
+    microlote = MicroLoteSolver(args.backend, args.model_dir, args.espera_ms, args.max_lote)
+    microlote.solve_captcha_from_base64(imagens[0])
+
+    print(f"\n{'threads':>7s} {'direto':>12s} {'micro-lote':>12s} {'lote médio':>11s}")
+    for threads in args.threads:
+        direto = medir_vazao(get_solver(args.backend, args.model_dir).solve_captcha_from_base64,
+                             imagens, threads, args.por_thread)
+        microlote.lotes = microlote.imagens = 0
+        agrupado = medir_vazao(microlote.solve_captcha_from_base64, imagens, threads, args.por_thread)
+        print(f"{threads:7d} {direto:8.1f} img/s {agrupado:8.1f} img/s {microlote.imagens / max(microlote.lotes, 1):11.1f}")
+    microlote.parar()
@@ -0,0 +1,233 @@
+"""
+Inferência do CRNN só com NumPy (sem TensorFlow).
+
+A arquitetura implantada é pequena e fixa (ver `construir_modelo_inferencia` em captcha_solver.py):
+
+    Rescaling -> Conv2D(32) -> MaxPool -> Conv2D(64) -> MaxPool -> Conv2D(128)
+    -> Reshape(45, 1536) -> Dense(64) -> BiLSTM(128) -> BiLSTM(64) -> Dense(vocab+1, softmax)
+
+`CRNNNumpy` lê os pesos direto de `ctc_model.weights.h5` (com h5py) e faz o
+forward pass do lote inteiro: convoluções via im2col + uma multiplicação de
+matrizes, e LSTMs com a projeção da entrada pré-calculada para todos os passos
+e um passo recorrente por vez para o lote todo. Dropout não existe na
+inferência.
+
+    # Paridade com o Keras e comparação de latência/memória
+    python -m captcha_ml.numpy_solver paridade
+"""
+
+import os
+import re
+
+import numpy as np
+
+from captcha_ml.solver_base import BaseCaptchaSolver
+from captcha_ml.threads import aplicar_threads_blas
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def _conv2d_same_relu(x, kernel, bias):
+    """Conv 3x3 'same' + ReLU. x: (N, W, H, C), kernel: (3, 3, C, F)"""
+    kw, kh, c, f = kernel.shape
+    n, w, h, _ = x.shape
+    xp = np.pad(x, ((0, 0), (kw // 2, kw // 2), (kh // 2, kh // 2), (0, 0)))
+    # (N, W, H, C, kw, kh) -> linhas de C*kw*kh valores por posição
+    janelas = np.lib.stride_tricks.sliding_window_view(xp, (kw, kh), axis=(1, 2))
+    colunas = janelas.reshape(n * w * h, c * kw * kh)
+    pesos = kernel.transpose(2, 0, 1, 3).reshape(c * kw * kh, f)
+    saida = colunas @ pesos
+    saida += bias
+    np.maximum(saida, 0, out=saida)
+    return saida.reshape(n, w, h, f)
+
+
+def _maxpool2x2(x):
+    n, w, h, c = x.shape
+    w2, h2 = w // 2, h // 2
+    return x[:, :w2 * 2, :h2 * 2].reshape(n, w2, 2, h2, 2, c).max(axis=(2, 4))
+
+
+def _lstm(x, kernel, recurrent, bias, reverso=False):
+    """
+    LSTM do Keras (portas i, f, c, o; tanh/sigmoid) com return_sequences.
+    x: (N, T, D) -> (N, T, U)
+    """
+    n, t, _ = x.shape
+    u = recurrent.shape[0]
+    entrada = x @ kernel + bias  # projeção de todos os passos de uma vez
+    h = np.zeros((n, u), dtype=x.dtype)
+    c = np.zeros((n, u), dtype=x.dtype)
+    saida = np.empty((n, t, u), dtype=x.dtype)
+    passos = range(t - 1, -1, -1) if reverso else range(t)
+    for passo in passos:
+        z = entrada[:, passo] + h @ recurrent
+        i = _sigmoid(z[:, :u])
+        f = _sigmoid(z[:, u:2 * u])
+        g = np.tanh(z[:, 2 * u:3 * u])
+        o = _sigmoid(z[:, 3 * u:])
+        c = f * c + i * g
+        h = o * np.tanh(c)
+        saida[:, passo] = h
+    return saida
+
+
+def _bilstm(x, pesos):
+    # A saída do backward já volta na ordem original do tempo (como no Keras)
+    frente = _lstm(x, *pesos['forward'])
+    tras = _lstm(x, *pesos['backward'], reverso=True)
+    return np.concatenate([frente, tras], axis=-1)
+
+
+def _tipo_e_ordem(nome):
+    """'conv2d' -> ('conv2d', 0), 'conv2d_2' -> ('conv2d', 2)"""
+    sufixo = re.search(r'_(\d+)$', nome)
+    if sufixo is None:
+        return nome, 0
+    return nome[:sufixo.start()], int(sufixo.group(1))
+
+
+class CRNNNumpy:
+    """
+    Forward pass do CRNN com os pesos de um `.weights.h5` do Keras.
+
+    Args:
+        weights_path: Arquivo salvo por `prediction_model.save_weights`
+    """
+
+    def __init__(self, weights_path, dtype=np.float32):
+        self.dtype = dtype
+        self.convs = []
+        self.denses = []
+        self.bilstms = []
+        self._carregar(weights_path)
+
+    def _carregar(self, weights_path):
+        import h5py
+
+        with h5py.File(weights_path, 'r') as f:
+            if 'layers' not in f:
+                raise ValueError(f"Formato de pesos não suportado (esperado .weights.h5 do Keras): {weights_path}")
+            camadas = f['layers']
+
+            def variaveis(grupo):
+                vars_ = grupo['vars']
+                return [np.asarray(vars_[str(i)], dtype=self.dtype) for i in range(len(vars_))]
+
+            for nome in sorted(camadas.keys(), key=_tipo_e_ordem):
+                tipo, _ = _tipo_e_ordem(nome)
+                if tipo == 'conv2d':
+                    self.convs.append(variaveis(camadas[nome]))
+                elif tipo == 'dense':
+                    self.denses.append(variaveis(camadas[nome]))
+                elif tipo == 'bidirectional':
+                    grupo = camadas[nome]
+                    self.bilstms.append({
+                        'forward': variaveis(grupo['forward_layer']['cell']),
+                        'backward': variaveis(grupo['backward_layer']['cell']),
+                    })
+
+        if (len(self.convs), len(self.denses), len(self.bilstms)) != (3, 2, 2):
+            raise ValueError(f"Arquitetura inesperada em {weights_path}: {len(self.convs)} Conv2D, "
+                             f"{len(self.denses)} Dense, {len(self.bilstms)} BiLSTM (esperado 3, 2, 2)")
+
+    def __call__(self, batch):
+        """(N, W, H, 1) com valores 0-255 -> probabilidades (N, T, vocab+1)"""
+        x = np.asarray(batch, dtype=self.dtype) * self.dtype(1.0 / 255.0)
+
+        x = _maxpool2x2(_conv2d_same_relu(x, *self.convs[0]))
+        x = _maxpool2x2(_conv2d_same_relu(x, *self.convs[1]))
+        x = _conv2d_same_relu(x, *self.convs[2])
+
+        n, w, h, c = x.shape
+        x = x.reshape(n, w, h * c)
+        kernel, bias = self.denses[0]
+        x = np.maximum(x @ kernel + bias, 0)
+
+        for pesos in self.bilstms:
+            x = _bilstm(x, pesos)
+
+        kernel, bias = self.denses[1]
+        logits = x @ kernel + bias
+        logits -= logits.max(axis=-1, keepdims=True)
+        probs = np.exp(logits)
+        probs /= probs.sum(axis=-1, keepdims=True)
+        return probs
+
+
+class NumpyCaptchaSolver(BaseCaptchaSolver):
+    """Solver que roda o CRNN em NumPy puro (backend 'numpy')"""
+
+    def __init__(self, model_dir="captcha_ml/models", max_batch_size=64):
+        self.engine = None
+        super().__init__(model_dir, max_batch_size)
+
+    def load_model(self):
+        # As multiplicações de matrizes usam o BLAS do NumPy (CAPTCHA_THREADS_INTRA, ver threads.py)
+        aplicar_threads_blas(self.threads['intra'])
+        self._carregar_meta()
+
+        weights_path = os.path.join(self.model_dir, "ctc_model.weights.h5")
+        checkpoint_path = os.path.join(self.model_dir, "ctc_model_checkpoint.weights.h5")
+        if os.path.exists(weights_path):
+            self.engine = CRNNNumpy(weights_path)
+        elif os.path.exists(checkpoint_path):
+            print("⚠️ Usando arquivo de checkpoint.")
+            self.engine = CRNNNumpy(checkpoint_path)
+        else:
+            raise FileNotFoundError(f"Nenhum arquivo de pesos (.weights.h5) encontrado em {self.model_dir}")
+
+        self.is_loaded = True
+        print(f"✅ Modelo NumPy carregado! Vocabulário: {self.vocab_size} chars.")
+
+    def _inferir(self, batch):
+        return self.engine(batch)
+
+
+def paridade(model_dir="captcha_ml/models", limite=500, tamanho_lote=64):
+    """
+    Compara as probabilidades e os códigos do NumPy com os do Keras no dataset_ouro
+    e imprime a comparação de acurácia, latência e memória.
+    """
+    from captcha_ml.avaliacao import comparar_backends, imagens_ouro
+    from captcha_ml.captcha_solver import CaptchaSolver
+
+    arquivos = imagens_ouro(limite=limite)
+    keras_solver = CaptchaSolver(model_dir)
+    numpy_solver = NumpyCaptchaSolver(model_dir)
+
+    maior_diferenca = 0.0
+    divergencias = 0
+    for inicio in range(0, len(arquivos), tamanho_lote):
+        lote = np.concatenate([keras_solver._preprocess_image(keras_solver._abrir_imagem(f))
+                               for f in arquivos[inicio:inicio + tamanho_lote]])
+        p_keras = keras_solver._inferir(lote)
+        p_numpy = numpy_solver._inferir(lote)
+        maior_diferenca = max(maior_diferenca, float(np.abs(p_keras - p_numpy).max()))
+        divergencias += sum(a != b for a, b in zip(keras_solver._decode_batch_predictions(p_keras),
+                                                   numpy_solver._decode_batch_predictions(p_numpy)))
+
+    print(f"\nParidade em {len(arquivos)} imagens: maior |Δp| = {maior_diferenca:.2e}, "
+          f"códigos diferentes = {divergencias}")
+
+    comparar_backends([
+        ('keras', 'keras', 'captcha_ml.captcha_solver', lambda: keras_solver),
+        ('numpy', 'numpy', 'captcha_ml.numpy_solver', lambda: numpy_solver),
+    ], arquivos)
+    return maior_diferenca, divergencias
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Backend NumPy do solver de captcha")
+    parser.add_argument('comando', choices=['paridade'])
+    parser.add_argument('--model-dir', default="captcha_ml/models")
+    parser.add_argument('--limite', type=int, default=500, help="Imagens do dataset_ouro usadas")
+    args = parser.parse_args()
+
+    maior_diferenca, divergencias = paridade(args.model_dir, args.limite)
+    if divergencias or maior_diferenca > 1e-3:
+        raise SystemExit("❌ NumPy diverge do Keras")
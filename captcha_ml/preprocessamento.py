@@ -0,0 +1,144 @@
+"""
+Pré-processamento dos captchas em NumPy, único para treino e produção.
+
+Antes, o CaptchaSolver e o ImageProcessor repetiam a mesma cadeia PIL
+(fundo branco no alpha, `convert('L')`, `point(lambda ...)` chamando Python
+para cada nível de cinza, resize e padding), e os scripts de rotulagem usavam
+outra com cv2. Aqui a cadeia roda em arrays e processa uma pilha de N imagens
+de uma vez:
+
+    1. Alpha sobre fundo branco e conversão para cinza (mesmas contas
+       inteiras do PIL, resultado idêntico byte a byte; sem alpha, a
+       conversão acontece no próprio PIL durante a decodificação)
+    2. Binarização: texto (< 180) vira 255, fundo vira 0
+    3. Resize NEAREST mantendo a proporção (mesmos índices do PIL) e
+       padding preto centralizado até 180x50
+
+A decodificação do PNG continua no PIL.
+"""
+
+import base64
+import io
+import os
+
+import numpy as np
+from PIL import Image
+
+LARGURA = 180
+ALTURA = 50
+LIMIAR = 180
+
+
+def ler_bytes(imagem):
+    """Base64 (com ou sem prefixo data:image), bytes ou caminho de arquivo -> bytes da imagem"""
+    if isinstance(imagem, (bytes, bytearray)):
+        return bytes(imagem)
+    if isinstance(imagem, str) and (imagem.startswith('data:image') or not os.path.exists(imagem)):
+        if imagem.startswith('data:image'): imagem = imagem.split(',')[1]
+        return base64.b64decode(imagem)
+    with open(imagem, 'rb') as f:
+        return f.read()
+
+
+def abrir_imagem(imagem):
+    """Aceita base64 (com ou sem prefixo data:image), bytes, caminho de arquivo ou PIL.Image"""
+    if isinstance(imagem, Image.Image):
+        return imagem
+    return Image.open(io.BytesIO(ler_bytes(imagem)))
+
+
+def decodificar(imagem):
+    """
+    Imagem -> array uint8 (H, W) em cinza.
+    Sem alpha, a conversão para cinza é o próprio `convert('L')` do PIL (em C,
+    junto com a decodificação); com alpha, o fundo branco é aplicado em `para_cinza`.
+    """
+    pil_image = abrir_imagem(imagem)
+    if pil_image.mode in ('RGBA', 'LA') or (pil_image.mode == 'P' and 'transparency' in pil_image.info):
+        return para_cinza(np.asarray(pil_image.convert('RGBA'), dtype=np.uint8)[np.newaxis])[0]
+    return np.asarray(pil_image.convert('L'), dtype=np.uint8)
+
+
+def para_cinza(lote):
+    """
+    (N, H, W[, C]) uint8 -> (N, H, W) uint8.
+    Alpha é aplicado sobre fundo branco como no `paste(..., mask=alpha)` do PIL e
+    RGB vira cinza com os pesos inteiros de `convert('L')` (299/587/114).
+    """
+    if lote.ndim == 3:
+        return lote
+    rgb = lote[..., :3]
+    if lote.shape[-1] == 4:
+        alpha = lote[..., 3:4].astype(np.uint32)
+        tmp = np.multiply(rgb, alpha, dtype=np.uint32)
+        tmp += 255 * (255 - alpha) + 128
+        rgb = ((tmp >> 8) + tmp) >> 8
+    cinza = np.multiply(rgb[..., 0], 19595, dtype=np.uint32)
+    cinza += np.multiply(rgb[..., 1], 38470, dtype=np.uint32)
+    cinza += np.multiply(rgb[..., 2], 7471, dtype=np.uint32)
+    cinza += 0x8000
+    cinza >>= 16
+    return cinza.astype(np.uint8)
+
+
+def binarizar(cinza, limiar=LIMIAR):
+    """Texto (< limiar) vira BRANCO (255), fundo vira PRETO (0)"""
+    return np.less(cinza, limiar).view(np.uint8) * np.uint8(255)
+
+
+def _indices_nearest(tamanho_entrada, tamanho_saida):
+    # Mesma conta do ImagingScaleAffine do PIL: centro do pixel + passo acumulado em double
+    passo = tamanho_entrada / tamanho_saida
+    posicoes = np.cumsum(np.concatenate([[passo * 0.5], np.full(tamanho_saida - 1, passo)]))
+    return np.minimum(posicoes.astype(np.intp), tamanho_entrada - 1)
+
+
+def redimensionar_com_padding(lote, largura=LARGURA, altura=ALTURA):
+    """(N, H, W) -> (N, altura, largura): resize NEAREST mantendo a proporção + padding preto"""
+    n, h, w = lote.shape
+    ratio = min(largura / w, altura / h)
+    new_w = int(w * ratio)
+    new_h = int(h * ratio)
+
+    if (new_w, new_h) != (w, h):
+        lote = lote[:, _indices_nearest(h, new_h)][:, :, _indices_nearest(w, new_w)]
+
+    final = np.zeros((n, altura, largura), dtype=lote.dtype)  # Fundo Preto
+    offset_x = (largura - new_w) // 2
+    offset_y = (altura - new_h) // 2
+    final[:, offset_y:offset_y + new_h, offset_x:offset_x + new_w] = lote
+    return final
+
+
+def preprocessar_lote(imagens, largura=LARGURA, altura=ALTURA, limiar=LIMIAR):
+    """
+    Pré-processa várias imagens de uma vez.
+
+    Args:
+        imagens: Pilha (N, H, W[, C]) uint8 (C = 3 para RGB, 4 com alpha) ou
+            lista de arrays de `decodificar` (tamanhos diferentes são processados em grupos)
+
+    Returns:
+        Array (N, altura, largura) uint8 com valores 0/255 (formato do treino)
+    """
+    if isinstance(imagens, np.ndarray):
+        return redimensionar_com_padding(binarizar(para_cinza(imagens), limiar), largura, altura)
+
+    saida = np.empty((len(imagens), altura, largura), dtype=np.uint8)
+    grupos = {}
+    for i, img in enumerate(imagens):
+        grupos.setdefault(img.shape, []).append(i)
+    for indices in grupos.values():
+        pilha = np.stack([imagens[i] for i in indices])
+        saida[indices] = redimensionar_com_padding(binarizar(para_cinza(pilha), limiar), largura, altura)
+    return saida
+
+
+def preprocessar(imagem, largura=LARGURA, altura=ALTURA, limiar=LIMIAR):
+    """Uma imagem (base64, bytes, caminho ou PIL.Image) -> (altura, largura) uint8"""
+    return preprocessar_lote([decodificar(imagem)], largura, altura, limiar)[0]
+
+
+def para_entrada_modelo(lote):
+    """(N, H, W) uint8 -> (N, W, H, 1) float32 0-255 (o Rescaling fica no modelo)"""
+    return np.ascontiguousarray(lote.transpose(0, 2, 1)[..., np.newaxis], dtype=np.float32)
@@ -0,0 +1,346 @@
+"""
+Serviço local de resolução de captchas, compartilhado por vários processos.
+
+Cada processo do scrapper com o backend Keras carrega o próprio TensorFlow e
+o próprio CRNN (~700 MB cada). Aqui um processo de longa duração carrega o
+modelo uma vez e atende os scrappers por HTTP em localhost ou por um socket
+Unix. Os pedidos de todos os clientes entram no mesmo `MicroLoteSolver`, então
+imagens de processos diferentes dividem o mesmo forward pass.
+
+O cliente é o backend 'servico' (`ServicoCaptchaSolver`); o endereço vem de
+CAPTCHA_SERVICO (`http://127.0.0.1:8790` ou `unix:/caminho/do/socket`).
+
+    # Serviço (carrega o backend Keras uma vez)
+    python -m captcha_ml.servico servir --backend keras --socket /tmp/captcha.sock
+
+    # Scrappers usando o serviço
+    CAPTCHA_BACKEND=servico CAPTCHA_SERVICO=unix:/tmp/captcha.sock python production_runner.py
+
+    # Vazão e memória de N processos: serviço x backend local em cada processo
+    python -m captcha_ml.servico medir --clientes 4
+
+API:
+    POST /resolver  {"imagens": [base64, ...], "confianca": false}
+                    -> {"resultados": [código ou dict de solve_with_confidence, ...]}
+    GET  /saude     -> {"backend", "carregado", "lotes", "imagens"}
+"""
+
+import base64
+import http.client
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from captcha_ml.microlote import MicroLoteSolver
+
+MODEL_DIR_PADRAO = "captcha_ml/models"
+ENDERECO_PADRAO = "http://127.0.0.1:8790"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # Keep-alive: o cliente reaproveita a conexão entre captchas
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        if self.server.servico.verbose:
+            super().log_message(*args)
+
+    def address_string(self):
+        # Em socket Unix o client_address é vazio
+        return self.client_address[0] if self.client_address else 'unix'
+
+    def _responder(self, status, corpo):
+        corpo = json.dumps(corpo, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def do_GET(self):
+        if self.path != '/saude':
+            return self._responder(404, {'erro': 'não encontrado'})
+        self._responder(200, self.server.servico.saude())
+
+    def do_POST(self):
+        if self.path != '/resolver':
+            return self._responder(404, {'erro': 'não encontrado'})
+        try:
+            tamanho = int(self.headers.get('Content-Length') or 0)
+            pedido = json.loads(self.rfile.read(tamanho))
+            imagens = pedido['imagens']
+        except (ValueError, KeyError, TypeError) as e:
+            return self._responder(400, {'erro': f'pedido inválido: {e}'})
+
+        # As imagens entram no micro-lote compartilhado com os outros clientes
+        resultados = self.server.servico.microlote.resolver(imagens, bool(pedido.get('confianca')))
+        self._responder(200, {'resultados': resultados})
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class ServicoCaptcha:
+    """
+    Serviço de captchas com micro-lotes entre clientes.
+
+    Args:
+        backend: Backend que roda o modelo (default: CAPTCHA_BACKEND, ou 'keras' se for 'servico')
+        model_dir: Pasta do modelo
+        host, porta: Endereço HTTP (ignorados com `socket`)
+        socket: Caminho de um socket Unix
+        espera_ms, max_lote: Parâmetros do MicroLoteSolver
+    """
+
+    def __init__(self, backend=None, model_dir=MODEL_DIR_PADRAO, host='127.0.0.1', porta=8790, socket=None,
+                 espera_ms=5.0, max_lote=64, verbose=False):
+        from captcha_ml.backends import backend_padrao
+
+        backend = backend or backend_padrao()
+        self.backend = 'keras' if backend == 'servico' else backend
+        self.model_dir = model_dir
+        self.host = host
+        self.porta = porta
+        self.socket = socket
+        self.verbose = verbose
+        self.microlote = MicroLoteSolver(self.backend, model_dir, espera_ms, max_lote)
+        self._httpd = None
+        self._thread = None
+
+    @property
+    def endereco(self):
+        return f"unix:{self.socket}" if self.socket else f"http://{self.host}:{self.porta}"
+
+    def saude(self):
+        from captcha_ml.backends import get_solver
+
+        solver = get_solver(self.backend, self.model_dir)
+        saude = {'backend': self.backend, 'carregado': bool(solver.is_loaded),
+                 'lotes': self.microlote.lotes, 'imagens': self.microlote.imagens}
+        if solver.indice_ouro is not None:
+            saude['indice_ouro'] = solver.indice_ouro.estatisticas()
+        return saude
+
+    def iniciar(self):
+        from captcha_ml.backends import preload_solver
+
+        # Carrega e aquece antes de aceitar conexões
+        preload_solver(self.backend, self.model_dir)
+        if self.socket:
+            if os.path.exists(self.socket):
+                os.unlink(self.socket)
+            self._httpd = _UnixHTTPServer(self.socket, _Handler)
+        else:
+            self._httpd = ThreadingHTTPServer((self.host, self.porta), _Handler)
+            self._httpd.daemon_threads = True
+            self.porta = self._httpd.server_address[1]
+        self._httpd.servico = self
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="captcha-servico", daemon=True)
+        self._thread.start()
+        return self
+
+    def parar(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+            if self.socket and os.path.exists(self.socket):
+                os.unlink(self.socket)
+        self.microlote.parar()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.parar()
+
+
+class _ConexaoUnix(http.client.HTTPConnection):
+    def __init__(self, caminho, timeout):
+        super().__init__('localhost', timeout=timeout)
+        self.caminho = caminho
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.caminho)
+
+
+def _para_base64(imagem):
+    if isinstance(imagem, (bytes, bytearray)):
+        return base64.b64encode(imagem).decode()
+    if not imagem.startswith('data:image') and os.path.exists(imagem):
+        with open(imagem, 'rb') as f:
+            return base64.b64encode(f.read()).decode()
+    return imagem
+
+
+class ServicoCaptchaSolver:
+    """
+    Backend 'servico': mesma API dos solvers locais, resolvida pelo ServicoCaptcha.
+
+    Args:
+        model_dir: Ignorado (o modelo é o do serviço); mantido pela interface de `criar_solver`
+        endereco: `http://host:porta` ou `unix:/caminho` (default: CAPTCHA_SERVICO)
+        timeout: Timeout (s) de cada pedido
+    """
+
+    def __init__(self, model_dir=MODEL_DIR_PADRAO, endereco=None, timeout=30):
+        self.model_dir = model_dir
+        self.endereco = endereco or os.environ.get('CAPTCHA_SERVICO', ENDERECO_PADRAO)
+        self.timeout = timeout
+        self.is_loaded = False
+        # http.client não é thread-safe: uma conexão keep-alive por thread
+        self._local = threading.local()
+        try:
+            saude = self.saude()
+            self.is_loaded = saude['carregado']
+            print(f"✅ Serviço de captcha em {self.endereco} (backend {saude['backend']})")
+        except Exception as e:
+            print(f"⚠️ Aviso: Serviço de captcha indisponível em {self.endereco}: {e}")
+
+    def _nova_conexao(self):
+        if self.endereco.startswith('unix:'):
+            return _ConexaoUnix(self.endereco[len('unix:'):], self.timeout)
+        host_porta = self.endereco.split('://', 1)[-1].rstrip('/')
+        return http.client.HTTPConnection(host_porta, timeout=self.timeout)
+
+    def _pedir(self, metodo, caminho, dados=None):
+        corpo = json.dumps(dados).encode('utf-8') if dados is not None else None
+        headers = {'Content-Type': 'application/json'} if corpo is not None else {}
+        for tentativa in range(2):
+            conexao = getattr(self._local, 'conexao', None)
+            if conexao is None:
+                conexao = self._local.conexao = self._nova_conexao()
+            try:
+                conexao.request(metodo, caminho, body=corpo, headers=headers)
+                resposta = conexao.getresponse()
+                conteudo = resposta.read()
+                break
+            except (http.client.HTTPException, OSError):
+                # Conexão keep-alive fechada pelo serviço (reinício): reconecta uma vez
+                conexao.close()
+                self._local.conexao = None
+                if tentativa:
+                    raise
+        if resposta.status != 200:
+            raise RuntimeError(f"Serviço de captcha respondeu {resposta.status}: {conteudo[:200]!r}")
+        return json.loads(conteudo)
+
+    def saude(self):
+        return self._pedir('GET', '/saude')
+
+    def _resolver(self, images, confianca):
+        try:
+            return self._pedir('POST', '/resolver', {'imagens': [_para_base64(i) for i in images],
+                                                     'confianca': confianca})['resultados']
+        except Exception as e:
+            print(f"⚠️ Serviço de captcha falhou: {e}")
+            return [None] * len(images)
+
+    def solve_captcha_from_base64(self, base64_string):
+        return self._resolver([base64_string], False)[0]
+
+    def solve_captcha_from_file(self, image_path):
+        return self._resolver([image_path], False)[0]
+
+    def solve_many(self, images, max_batch_size=None):
+        return self._resolver(list(images), False) if images else []
+
+    def solve_many_with_confidence(self, images, top_k=5, max_batch_size=None):
+        resultados = self._resolver(list(images), True) if images else []
+        for resultado in resultados:
+            if resultado:
+                resultado['alternativas'] = [tuple(a) for a in resultado['alternativas'][:top_k]]
+        return resultados
+
+    def solve_with_confidence(self, image, top_k=5):
+        return self.solve_many_with_confidence([image], top_k)[0]
+
+
+def medir(clientes=4, por_cliente=100, backend_local='keras', endereco=None):
+    """
+    Roda `clientes` processos resolvendo `por_cliente` captchas cada, primeiro com o
+    backend local em cada processo e depois pelo serviço (que precisa estar no ar).
+    Imprime vazão total e soma dos picos de RSS dos clientes.
+    """
+    import subprocess
+    import sys
+
+    codigo = (
+        "import base64, time\n"
+        "from captcha_ml.avaliacao import imagens_ouro\n"
+        "from captcha_ml.backends import get_solver, pico_rss_mb\n"
+        f"imagens = [base64.b64encode(open(f, 'rb').read()).decode() for f in imagens_ouro(limite={por_cliente})]\n"
+        "solver = get_solver()\n"
+        "inicio = time.perf_counter()\n"
+        "for imagem in imagens: solver.solve_captcha_from_base64(imagem)\n"
+        "print(time.perf_counter() - inicio, pico_rss_mb())\n"
+    )
+    print(f"\n{'modo':10s} {'clientes':>8s} {'vazão':>12s} {'RSS clientes':>13s}")
+    for modo, backend in (('local', backend_local), ('servico', 'servico')):
+        # As imagens são do dataset_ouro: com o índice, todas acertariam sem inferência
+        env = dict(os.environ, CAPTCHA_BACKEND=backend, TF_CPP_MIN_LOG_LEVEL='3', CAPTCHA_INDICE_OURO='0')
+        if endereco:
+            env['CAPTCHA_SERVICO'] = endereco
+        processos = [subprocess.Popen([sys.executable, '-c', codigo], env=env, stdout=subprocess.PIPE, text=True)
+                     for _ in range(clientes)]
+        medidas = [p.communicate()[0].split()[-2:] for p in processos]
+        tempo = max(float(segundos) for segundos, _ in medidas)
+        rss = sum(float(mb) for _, mb in medidas)
+        print(f"{modo:10s} {clientes:8d} {clientes * por_cliente / tempo:8.1f} img/s {rss:10.0f} MB")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serviço local de resolução de captchas")
+    parser.add_argument('comando', choices=['servir', 'medir'])
+    parser.add_argument('--backend', default=None)
+    parser.add_argument('--model-dir', default=MODEL_DIR_PADRAO)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, default=8790)
+    parser.add_argument('--socket', default=None, help="Socket Unix no lugar de HTTP")
+    parser.add_argument('--espera-ms', type=float, default=5.0)
+    parser.add_argument('--max-lote', type=int, default=64)
+    parser.add_argument('--clientes', type=int, default=4, help="'medir': processos clientes")
+    parser.add_argument('--por-cliente', type=int, default=100, help="'medir': captchas por cliente")
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    if args.comando == 'medir':
+        # Sobe o serviço neste processo e mede os clientes contra ele (sem o índice do
+        # dataset_ouro, de onde vêm as imagens da medição)
+        os.environ['CAPTCHA_INDICE_OURO'] = '0'
+        # Sem afinidade: o serviço roda neste processo e os clientes a herdariam
+        os.environ.pop('CAPTCHA_CPUS', None)
+        servico = ServicoCaptcha(args.backend, args.model_dir, args.host, 0, args.socket,
+                                 args.espera_ms, args.max_lote).iniciar()
+        try:
+            medir(args.clientes, args.por_cliente, servico.backend, servico.endereco)
+            print(f"(serviço: {servico.saude()})")
+        finally:
+            servico.parar()
+        return
+
+    servico = ServicoCaptcha(args.backend, args.model_dir, args.host, args.porta, args.socket,
+                             args.espera_ms, args.max_lote, args.verbose).iniciar()
+    print(f"🧠 Serviço de captcha ({servico.backend}) em {servico.endereco}")
+    print(f"   Use: CAPTCHA_BACKEND=servico CAPTCHA_SERVICO={servico.endereco}")
+    try:
+        while True:
+            time.sleep(60)
+            print(f"📊 {servico.saude()}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servico.parar()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,243 @@
+"""
+Parte do solver de captcha que não depende do framework de inferência.
+
+Metadados (meta.pkl), pré-processamento, leitura das imagens e a API pública
+(`solve_captcha_from_base64`, `solve_captcha_from_file`, `solve_many`) ficam
+aqui. Cada backend (Keras, TFLite, ...) só implementa `load_model` e
+`_inferir(batch) -> probabilidades (N, T, vocab+1)`, então este módulo não
+importa TensorFlow.
+"""
+
+import os
+import pickle
+
+import numpy as np
+
+from captcha_ml.ctc import decodificar_beam, decodificar_guloso
+from captcha_ml.preprocessamento import abrir_imagem, decodificar, ler_bytes, para_entrada_modelo, preprocessar_lote
+from captcha_ml.threads import configuracao_threads
+
+
+class BaseCaptchaSolver:
+    """
+    Base dos solvers de captcha.
+
+    Args:
+        model_dir: Pasta com meta.pkl e os pesos/modelo do backend
+        max_batch_size: Máximo de imagens por forward pass em `solve_many`
+
+    A decodificação dos métodos `solve_*` vem de CAPTCHA_DECODER: 'guloso'
+    (default) ou 'beam' (só textos com exatamente max_length caracteres; devolve
+    None quando não há nenhum). `solve_with_confidence` e
+    `solve_many_with_confidence` sempre usam o beam.
+
+    Com `indice_ouro` (um `IndiceOuro`), imagens já confirmadas pelo servidor
+    são respondidas pelo índice, sem inferência.
+    """
+
+    def __init__(self, model_dir="captcha_ml/models", max_batch_size=64):
+        self.model_dir = model_dir
+        self.max_batch_size = max_batch_size
+        self.char_to_num = {}
+        self.num_to_char = {}
+        self.img_width = 180
+        self.img_height = 50
+        self.max_length = 4
+        self.vocab_size = 0
+        self.decodificador = os.environ.get('CAPTCHA_DECODER', 'guloso')
+        self.is_loaded = False
+        # Captchas já confirmados pelo servidor (ver indice_ouro.py); o registro de backends preenche
+        self.indice_ouro = None
+        # Threads dos runtimes, aplicadas na carga (ver threads.py); a afinidade de
+        # CPU é do processo e é aplicada uma vez em backends.get_solver
+        self.threads = configuracao_threads()
+
+        try:
+            self.load_model()
+        except Exception as e:
+            print(f"⚠️ Aviso: Modelo não carregado: {e}")
+
+    def load_model(self):
+        raise NotImplementedError
+
+    def _carregar_meta(self):
+        meta_path = os.path.join(self.model_dir, 'meta.pkl')
+        if not os.path.exists(meta_path):
+            raise FileNotFoundError(f"Meta arquivo não encontrado: {meta_path}")
+
+        with open(meta_path, 'rb') as f:
+            meta = pickle.load(f)
+            self.char_to_num = meta['char_to_num']
+            self.num_to_char = meta['num_to_char']
+            self.vocab_size = meta['vocab_size']
+            # Garante chaves inteiras para decodificação
+            self.num_to_char = {int(k): v for k, v in self.num_to_char.items()}
+        return meta
+
+    def _inferir(self, batch):
+        """Forward pass: (N, W, H, 1) float32 0-255 -> probabilidades (N, T, vocab+1)"""
+        raise NotImplementedError
+
+    def _prever_um(self, processed_img):
+        return self._inferir(processed_img)
+
+    def aquecer(self):
+        """Inferência com uma imagem vazia (lote de 1) para inicializar o backend"""
+        vazia = np.zeros((1, self.img_width, self.img_height, 1), dtype=np.float32)
+        return self._decode_batch_predictions(self._prever_um(vazia))
+
+    def _preprocess_image(self, pil_image):
+        """
+        Preprocessamento compatível com modelo treinado (valores 0-255), ver preprocessamento.py.
+        Retorna (1, W, H, 1).
+        """
+        return para_entrada_modelo(preprocessar_lote([decodificar(pil_image)], self.img_width, self.img_height))
+
+    def _decode_batch_predictions(self, pred):
+        """Textos de um lote de probabilidades com o decodificador configurado (ver ctc.py)"""
+        if self.decodificador == 'beam':
+            return [resultado['codigo'] for resultado in self._decodificar_com_confianca(pred, top_k=1)]
+        return decodificar_guloso(pred, self.num_to_char, self.vocab_size)
+
+    def _decodificar_com_confianca(self, pred, top_k=5):
+        resultados = []
+        for alternativas in decodificar_beam(pred, self.num_to_char, self.vocab_size, self.max_length, top_k=top_k):
+            codigo, probabilidade = alternativas[0] if alternativas else (None, 0.0)
+            resultados.append({'codigo': codigo, 'probabilidade': probabilidade, 'alternativas': alternativas})
+        return resultados
+
+    def _resultado_do_indice(self, codigo):
+        """Captcha já confirmado pelo servidor: mesma forma de `solve_with_confidence`"""
+        return {'codigo': codigo, 'probabilidade': 1.0, 'alternativas': [(codigo, 1.0)]}
+
+    def _consultar_indice(self, dados):
+        return self.indice_ouro.buscar_bytes(dados) if self.indice_ouro is not None else None
+
+    def _resolver_um(self, imagem, top_k=None):
+        """
+        Uma imagem -> código, ou o dict de `solve_with_confidence` se `top_k` for dado.
+        Com `indice_ouro`, os bytes e depois o hash perceptual são consultados antes da inferência.
+        """
+        dados = ler_bytes(imagem)
+        codigo = self._consultar_indice(dados)
+        if codigo is None:
+            preprocessada = preprocessar_lote([decodificar(dados)], self.img_width, self.img_height)
+            if self.indice_ouro is not None:
+                codigo = self.indice_ouro.buscar_hash(preprocessada[0])
+        if codigo is not None:
+            return codigo if top_k is None else self._resultado_do_indice(codigo)
+
+        preds = self._prever_um(para_entrada_modelo(preprocessada))
+        if top_k is None:
+            return self._decode_batch_predictions(preds)[0]
+        return self._decodificar_com_confianca(preds, top_k)[0]
+
+    def solve_captcha_from_base64(self, base64_string):
+        if not self.is_loaded: return None
+        try:
+            return self._resolver_um(base64_string)
+        except Exception as e:
+            # print(f"Erro ML: {e}")
+            return None
+
+    def solve_captcha_from_file(self, image_path):
+        if not self.is_loaded: return None
+        try:
+            return self._resolver_um(image_path)
+        except Exception as e:
+            # print(f"Erro ML: {e}")
+            return None
+
+    def _abrir_imagem(self, imagem):
+        """Aceita base64 (com ou sem prefixo data:image), bytes ou caminho de arquivo"""
+        return abrir_imagem(imagem)
+
+    def solve_with_confidence(self, image, top_k=5):
+        """
+        Resolve um captcha com beam search restrito a max_length caracteres.
+
+        Args:
+            image: base64, bytes ou caminho de arquivo
+            top_k: Alternativas devolvidas
+
+        Returns:
+            {'codigo', 'probabilidade', 'alternativas': [(texto, probabilidade), ...]}
+            ('codigo' None se nenhum texto do tamanho certo for possível; probabilidade
+            1.0 se o captcha estiver no índice do dataset_ouro), ou None se a imagem falhar
+        """
+        if not self.is_loaded: return None
+        try:
+            return self._resolver_um(image, top_k)
+        except Exception:
+            return None
+
+    def _prever_lotes(self, images, max_batch_size, conhecidos):
+        """
+        Gera (índices em `images`, probabilidades) por lote; imagens que falham são
+        puladas e as que estão no índice do dataset_ouro vão para `conhecidos` (índice -> código)
+        """
+        indices = []
+        decodificadas = []
+        for i, imagem in enumerate(images):
+            try:
+                dados = ler_bytes(imagem)
+                codigo = self._consultar_indice(dados)
+                if codigo is not None:
+                    conhecidos[i] = codigo
+                    continue
+                decodificadas.append(decodificar(dados))
+                indices.append(i)
+            except Exception:
+                continue
+        if not decodificadas: return
+
+        # Pré-processamento vetorizado da pilha inteira
+        preprocessadas = preprocessar_lote(decodificadas, self.img_width, self.img_height)
+        if self.indice_ouro is not None:
+            novas = []
+            for j, (i, preprocessada) in enumerate(zip(indices, preprocessadas)):
+                codigo = self.indice_ouro.buscar_hash(preprocessada)
+                if codigo is None:
+                    novas.append(j)
+                else:
+                    conhecidos[i] = codigo
+            indices = [indices[j] for j in novas]
+            preprocessadas = preprocessadas[novas]
+            if not indices: return
+        entrada = para_entrada_modelo(preprocessadas)
+
+        for inicio in range(0, len(indices), max_batch_size):
+            yield indices[inicio:inicio + max_batch_size], self._inferir(entrada[inicio:inicio + max_batch_size])
+
+    def solve_many(self, images, max_batch_size=None):
+        """
+        Resolve vários captchas com um forward pass por lote.
+
+        Args:
+            images: Lista de base64, bytes ou caminhos de arquivo
+            max_batch_size: Máximo de imagens por forward pass (default: self.max_batch_size)
+
+        Returns:
+            Lista de códigos na mesma ordem de `images` (None onde a imagem falhar)
+        """
+        resultados = [None] * len(images)
+        if not self.is_loaded: return resultados
+        conhecidos = {}
+        for indices, preds in self._prever_lotes(images, max_batch_size or self.max_batch_size, conhecidos):
+            for i, texto in zip(indices, self._decode_batch_predictions(preds)):
+                resultados[i] = texto
+        for i, codigo in conhecidos.items():
+            resultados[i] = codigo
+        return resultados
+
+    def solve_many_with_confidence(self, images, top_k=5, max_batch_size=None):
+        """`solve_with_confidence` em lote; mesma ordem de `images` (None onde a imagem falhar)"""
+        resultados = [None] * len(images)
+        if not self.is_loaded: return resultados
+        conhecidos = {}
+        for indices, preds in self._prever_lotes(images, max_batch_size or self.max_batch_size, conhecidos):
+            for i, resultado in zip(indices, self._decodificar_com_confianca(preds, top_k)):
+                resultados[i] = resultado
+        for i, codigo in conhecidos.items():
+            resultados[i] = self._resultado_do_indice(codigo)
+        return resultados
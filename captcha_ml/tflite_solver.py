@@ -0,0 +1,226 @@
+"""
+Backend TFLite do solver de captcha.
+
+Os workers de produção só precisam da metade de inferência do CaptchaModel.
+`exportar_tflite` converte `ctc_model.weights.h5` (+ meta.pkl) num modelo
+.tflite quantizado; `TFLiteCaptchaSolver` roda esse arquivo com um runtime
+leve (ai-edge-litert ou tflite-runtime), sem importar o TensorFlow. Se nenhum
+dos dois estiver instalado, usa `tf.lite` como último recurso.
+
+O vocabulário continua vindo do meta.pkl da mesma pasta.
+
+O conversor só gera LSTMs nativas com o lote fixo no grafo (com lote variável
+precisaria dos Select TF ops, que os runtimes leves não têm, e o interpreter
+não redimensiona o lote de um modelo exportado para 1). Por isso o export gera
+um arquivo por tamanho de lote: `ctc_model_<quant>.tflite` (lote 1, o do
+scrapper) e `ctc_model_<quant>_lote16.tflite`. O solver passa os pedaços
+completos de 16 imagens pelo segundo e o resto pelo primeiro.
+
+    # Exportar (precisa do TensorFlow)
+    python -m captcha_ml.tflite_solver exportar --quantizacao float16
+
+    # Comparar com o backend Keras no dataset_ouro
+    python -m captcha_ml.tflite_solver comparar --quantizacao float16
+
+Exportar via ONNX (tf2onnx + onnxruntime) não foi incluído: o TFLite já cobre
+int8/float16 e o runtime leve, sem adicionar dependências de conversão.
+"""
+
+import os
+import threading
+
+import numpy as np
+
+from captcha_ml.solver_base import BaseCaptchaSolver
+
+QUANTIZACOES = ('float32', 'dinamica', 'float16', 'int8')
+# Lotes exportados por padrão; o 1 é obrigatório (resolve o resto de cada lote)
+LOTES_EXPORT = (1, 16)
+
+
+def nome_arquivo_tflite(quantizacao, lote=1):
+    if lote == 1:
+        return f"ctc_model_{quantizacao}.tflite"
+    return f"ctc_model_{quantizacao}_lote{lote}.tflite"
+
+
+def _carregar_interpreter():
+    """Classe Interpreter do runtime mais leve que estiver instalado"""
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+    except ImportError:
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+
+class TFLiteCaptchaSolver(BaseCaptchaSolver):
+    """
+    Solver que roda o modelo exportado por `exportar_tflite`.
+
+    Args:
+        model_dir: Pasta com meta.pkl e o .tflite
+        quantizacao: Qual export usar (default: CAPTCHA_TFLITE_QUANT ou 'float16')
+        num_threads: Threads do interpreter (default: CAPTCHA_THREADS_INTRA ou o do runtime)
+    """
+
+    def __init__(self, model_dir="captcha_ml/models", max_batch_size=64, quantizacao=None, num_threads=None):
+        self.quantizacao = quantizacao or os.environ.get('CAPTCHA_TFLITE_QUANT', 'float16')
+        self.num_threads = num_threads
+        self.interpreter = None
+        # lote -> (interpreter, índice da entrada, índice da saída), um por arquivo exportado
+        self._interpreters = {}
+        # Maior lote de um único invoke (o benchmark marca lotes maiores como divididos)
+        self.lote_inferencia = 1
+        # O interpreter não é thread-safe
+        self._lock = threading.Lock()
+        super().__init__(model_dir, max_batch_size)
+
+    def load_model(self):
+        self._carregar_meta()
+
+        model_path = os.path.join(self.model_dir, nome_arquivo_tflite(self.quantizacao))
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"Modelo TFLite não encontrado: {model_path} "
+                                    f"(rode: python -m captcha_ml.tflite_solver exportar --quantizacao {self.quantizacao})")
+
+        Interpreter = _carregar_interpreter()
+        self._interpreters = {}
+        for lote in LOTES_EXPORT:
+            caminho = os.path.join(self.model_dir, nome_arquivo_tflite(self.quantizacao, lote))
+            if lote != 1 and not os.path.exists(caminho):
+                continue  # export antigo, só com lote 1
+            interpreter = Interpreter(model_path=caminho, num_threads=self.num_threads or self.threads['intra'])
+            interpreter.allocate_tensors()
+            self._interpreters[lote] = (interpreter, interpreter.get_input_details()[0]['index'],
+                                        interpreter.get_output_details()[0]['index'])
+        self.interpreter = self._interpreters[1][0]
+        self.lote_inferencia = max(self._interpreters)
+        self.is_loaded = True
+        print(f"✅ Modelo TFLite ({self.quantizacao}, lotes {sorted(self._interpreters)}) carregado! "
+              f"Vocabulário: {self.vocab_size} chars.")
+
+    def _inferir(self, batch):
+        # Pedaços completos vão pelo maior lote exportado; o resto, pelos menores
+        batch = np.asarray(batch, dtype=np.float32)
+        saidas = []
+        inicio = 0
+        with self._lock:
+            for lote in sorted(self._interpreters, reverse=True):
+                interpreter, entrada, saida = self._interpreters[lote]
+                while len(batch) - inicio >= lote:
+                    interpreter.set_tensor(entrada, batch[inicio:inicio + lote])
+                    interpreter.invoke()
+                    saidas.append(interpreter.get_tensor(saida).copy())
+                    inicio += lote
+        return np.concatenate(saidas)
+
+
+def exportar_tflite(model_dir="captcha_ml/models", quantizacao='float16', amostras_calibracao=200,
+                    lotes=LOTES_EXPORT):
+    """
+    Converte os pesos Keras em `<model_dir>/ctc_model_<quantizacao>.tflite` e,
+    para cada lote maior que 1, `ctc_model_<quantizacao>_lote<N>.tflite`.
+
+    Args:
+        quantizacao: 'float32', 'dinamica' (pesos int8), 'float16' ou 'int8'
+            (pesos e ativações int8, calibrado com imagens do dataset_ouro)
+        amostras_calibracao: Imagens usadas na calibração do int8
+        lotes: Tamanhos de lote exportados (cada um num arquivo, lote fixo no grafo)
+
+    Returns:
+        Lista com os caminhos dos arquivos gerados
+    """
+    import inspect
+    import shutil
+    import tempfile
+
+    import tensorflow as tf
+
+    from captcha_ml.avaliacao import imagens_ouro
+    from captcha_ml.captcha_solver import CaptchaSolver
+
+    if quantizacao not in QUANTIZACOES:
+        raise ValueError(f"Quantização inválida: {quantizacao!r} (opções: {', '.join(QUANTIZACOES)})")
+
+    solver = CaptchaSolver(model_dir)
+    if not solver.is_loaded:
+        raise RuntimeError(f"Não foi possível carregar o modelo Keras de {model_dir}")
+
+    calibracao = []
+    if quantizacao == 'int8':
+        calibracao = [solver._preprocess_image(solver._abrir_imagem(f))
+                      for f in imagens_ouro(limite=amostras_calibracao)]
+        if not calibracao:
+            raise RuntimeError("dataset_ouro vazio: int8 precisa de imagens para calibração")
+
+    destinos = []
+    modelo = solver.prediction_model
+    for lote in sorted(set(lotes) | {1}):
+        # SavedModel com lote fixo: com lote variável as LSTMs não viram ops nativas do TFLite
+        forma = (lote, solver.img_width, solver.img_height, 1)
+        pasta_temp = tempfile.mkdtemp(prefix="captcha_savedmodel_")
+        try:
+            if 'input_signature' in inspect.signature(modelo.export).parameters:
+                modelo.export(pasta_temp, input_signature=[tf.TensorSpec(forma, tf.float32)])
+            else:
+                # Keras 2 (TF 2.13): export() usa a assinatura do próprio modelo
+                @tf.function(input_signature=[tf.TensorSpec(forma, tf.float32)])
+                def serve(imagem):
+                    return modelo(imagem, training=False)
+                tf.saved_model.save(modelo, pasta_temp, signatures=serve)
+
+            converter = tf.lite.TFLiteConverter.from_saved_model(pasta_temp)
+            if quantizacao != 'float32':
+                converter.optimizations = [tf.lite.Optimize.DEFAULT]
+            if quantizacao == 'float16':
+                converter.target_spec.supported_types = [tf.float16]
+            elif quantizacao == 'int8':
+                # Amostras no formato da entrada: `lote` imagens por exemplo
+                amostras = [np.concatenate([calibracao[(i + j) % len(calibracao)] for j in range(lote)])
+                            for i in range(0, len(calibracao), lote)]
+                converter.representative_dataset = lambda amostras=amostras: ([a] for a in amostras)
+            modelo_tflite = converter.convert()
+        finally:
+            shutil.rmtree(pasta_temp, ignore_errors=True)
+
+        destino = os.path.join(model_dir, nome_arquivo_tflite(quantizacao, lote))
+        with open(destino, 'wb') as f:
+            f.write(modelo_tflite)
+        print(f"✅ Exportado: {destino} ({len(modelo_tflite) / 1024:.0f} KB)")
+        destinos.append(destino)
+    return destinos
+
+
+def comparar(model_dir="captcha_ml/models", quantizacao='float16', limite=500):
+    """Imprime acurácia, latência, RSS e tempo de import do TFLite contra o Keras"""
+    from captcha_ml.avaliacao import comparar_backends, imagens_ouro
+    from captcha_ml.captcha_solver import CaptchaSolver
+
+    # medir_inicializacao roda num processo novo, que lê a quantização do ambiente
+    os.environ['CAPTCHA_TFLITE_QUANT'] = quantizacao
+    comparar_backends([
+        ('keras', 'keras', 'captcha_ml.captcha_solver', lambda: CaptchaSolver(model_dir)),
+        (f'tflite-{quantizacao}', 'tflite', 'captcha_ml.tflite_solver',
+         lambda: TFLiteCaptchaSolver(model_dir, quantizacao=quantizacao)),
+    ], imagens_ouro(limite=limite))
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export e backend TFLite do solver de captcha")
+    parser.add_argument('comando', choices=['exportar', 'comparar'])
+    parser.add_argument('--model-dir', default="captcha_ml/models")
+    parser.add_argument('--quantizacao', choices=QUANTIZACOES, default='float16')
+    parser.add_argument('--limite', type=int, default=500, help="Imagens do dataset_ouro usadas em 'comparar'")
+    parser.add_argument('--lotes', type=int, nargs='+', default=LOTES_EXPORT,
+                        help="Tamanhos de lote exportados, um arquivo cada (o 1 sempre entra)")
+    args = parser.parse_args()
+
+    if args.comando == 'exportar':
+        exportar_tflite(args.model_dir, args.quantizacao, lotes=args.lotes)
+    else:
+        comparar(args.model_dir, args.quantizacao, args.limite)
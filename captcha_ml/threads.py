@@ -0,0 +1,280 @@
+"""
+Threads e afinidade de CPU do solver, para vários workers na mesma máquina.
+
+Cada processo de scrapper com um solver Keras abre os pools do TensorFlow com
+o tamanho padrão: intra-op = núcleos da máquina e inter-op idem. Com N
+processos são N vezes mais threads que núcleos disputando a CPU, e a cauda de
+latência fica pior do que com menos workers. Aqui a configuração vem do
+ambiente (ou de `configurar_threads`); as threads são aplicadas por cada solver
+na carga do modelo:
+
+    CAPTCHA_THREADS_INTRA   threads de um op (TF intra-op, threads do
+                            interpreter TFLite, BLAS do backend NumPy)
+    CAPTCHA_THREADS_INTER   ops em paralelo (TF inter-op)
+    CAPTCHA_CPUS            afinidade do processo, ex: "0-3" ou "0,2,4,6"
+
+A afinidade vale para o processo inteiro (e é herdada pelos filhos), então é
+aplicada uma vez por processo, antes do primeiro solver ser criado
+(`aplicar_afinidade_do_processo`, chamada por `backends.get_solver`/
+`preload_solver` e pelo worker de `varrer`), e não a cada solver ou recarga.
+
+O TensorFlow só aceita mudar os pools antes de rodar o primeiro op: um segundo
+solver Keras no mesmo processo (recarga de pesos) herda os do primeiro. O limite
+de BLAS do backend NumPy usa o threadpoolctl, se estiver instalado.
+
+`varrer` procura a melhor divisão workers x threads para um número de núcleos:
+sobe os workers como processos separados, cada um com a sua fatia de CPUs, e
+mede vazão total e latência por captcha (lote de 1, como no scrapper).
+
+    # Todas as combinações para 4 núcleos, com afinidade
+    python -m captcha_ml.threads varrer --backend keras --nucleos 4 --afinidade
+
+    # Serviço de captcha com 2 threads, preso aos núcleos 2 e 3
+    CAPTCHA_THREADS_INTRA=2 CAPTCHA_THREADS_INTER=1 CAPTCHA_CPUS=2-3 python -m captcha_ml.servico servir --backend keras
+
+    # Um scrapper (entre vários) com 2 threads nos núcleos 4 e 5
+    CAPTCHA_THREADS_INTRA=2 CAPTCHA_THREADS_INTER=1 CAPTCHA_CPUS=4,5 python production_runner.py
+"""
+
+import os
+import sys
+import time
+
+_configuracao = {}
+_limites_blas = None
+_afinidade_aplicada = False
+
+
+def interpretar_cpus(texto):
+    """'0-3,6' -> [0, 1, 2, 3, 6]"""
+    cpus = []
+    for parte in str(texto).split(','):
+        parte = parte.strip()
+        if not parte:
+            continue
+        if '-' in parte:
+            inicio, fim = parte.split('-')
+            cpus.extend(range(int(inicio), int(fim) + 1))
+        else:
+            cpus.append(int(parte))
+    return sorted(set(cpus))
+
+
+def formatar_cpus(cpus):
+    return ','.join(str(cpu) for cpu in cpus)
+
+
+def configurar_threads(intra=None, inter=None, cpus=None):
+    """Sobrepõe o ambiente para os solvers criados daqui em diante (None = não mexe)"""
+    _configuracao.update({'intra': intra, 'inter': inter,
+                          'cpus': interpretar_cpus(cpus) if isinstance(cpus, str) else cpus})
+
+
+def configuracao_threads():
+    """{'intra', 'inter', 'cpus'} de `configurar_threads` ou do ambiente; None onde não configurado"""
+    def inteiro(nome):
+        valor = os.environ.get(nome)
+        return int(valor) if valor else None
+
+    cpus = os.environ.get('CAPTCHA_CPUS')
+    return {
+        'intra': _configuracao.get('intra') or inteiro('CAPTCHA_THREADS_INTRA'),
+        'inter': _configuracao.get('inter') or inteiro('CAPTCHA_THREADS_INTER'),
+        'cpus': _configuracao.get('cpus') or (interpretar_cpus(cpus) if cpus else None),
+    }
+
+
+def aplicar_afinidade(cpus):
+    """
+    Prende o processo às `cpus`. No Linux a afinidade é por thread: vale para as
+    threads que já existem e é herdada pelas que o runtime criar depois.
+    """
+    if not cpus:
+        return False
+    if not hasattr(os, 'sched_setaffinity'):
+        print("⚠️ Afinidade de CPU não suportada neste sistema; CAPTCHA_CPUS ignorado")
+        return False
+    try:
+        tarefas = [int(tid) for tid in os.listdir('/proc/self/task')]
+    except OSError:
+        tarefas = [0]
+    for tid in tarefas:
+        try:
+            os.sched_setaffinity(tid, cpus)
+        except OSError:
+            continue  # thread que terminou no meio do caminho
+    return True
+
+
+def aplicar_afinidade_do_processo():
+    """Aplica a afinidade configurada (CAPTCHA_CPUS) uma vez no processo, antes da carga do solver"""
+    global _afinidade_aplicada
+    if _afinidade_aplicada:
+        return False
+    _afinidade_aplicada = True
+    return aplicar_afinidade(configuracao_threads()['cpus'])
+
+
+def aplicar_threads_tensorflow(intra=None, inter=None):
+    """Tamanho dos pools do TF; só funciona antes do primeiro op do processo"""
+    import tensorflow as tf
+
+    for valor, atual, definir, nome in (
+            (intra, tf.config.threading.get_intra_op_parallelism_threads,
+             tf.config.threading.set_intra_op_parallelism_threads, 'intra-op'),
+            (inter, tf.config.threading.get_inter_op_parallelism_threads,
+             tf.config.threading.set_inter_op_parallelism_threads, 'inter-op')):
+        if valor is None or atual() == valor:
+            continue
+        try:
+            definir(valor)
+        except RuntimeError:
+            print(f"⚠️ TensorFlow já inicializado: pool {nome} fica com {atual() or 'o padrão'} (pedido: {valor})")
+
+
+def aplicar_threads_blas(threads):
+    """Limita as threads de BLAS/OpenMP já carregadas (threadpoolctl, opcional)"""
+    global _limites_blas
+    if not threads:
+        return False
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        return False
+    # Sem `with`: o limite vale até o fim do processo
+    _limites_blas = threadpool_limits(limits=threads)
+    return True
+
+
+def cpus_do_worker(indice, threads, cpus_disponiveis=None):
+    """Fatia de `threads` CPUs do worker `indice` (workers lado a lado, sem sobreposição)"""
+    if cpus_disponiveis is None:
+        cpus_disponiveis = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') \
+            else list(range(os.cpu_count() or 1))
+    inicio = indice * threads
+    return [cpus_disponiveis[(inicio + i) % len(cpus_disponiveis)] for i in range(threads)]
+
+
+def _worker(backend, model_dir, imagens):
+    """Processo filho de `varrer`: carrega, avisa que está pronto, espera a largada e mede"""
+    import base64
+
+    from captcha_ml.avaliacao import imagens_ouro
+    from captcha_ml.backends import criar_solver
+
+    aplicar_afinidade_do_processo()
+    solver = criar_solver(backend, model_dir)
+    lote = []
+    for arquivo in imagens_ouro(limite=imagens):
+        with open(arquivo, 'rb') as f:
+            lote.append(base64.b64encode(f.read()).decode())
+    solver.solve_captcha_from_base64(lote[0])
+    print("pronto", flush=True)
+    sys.stdin.readline()
+
+    tempos = []
+    inicio = time.perf_counter()
+    for imagem in lote:
+        comeco = time.perf_counter()
+        solver.solve_captcha_from_base64(imagem)
+        tempos.append((time.perf_counter() - comeco) * 1000)
+    print(time.perf_counter() - inicio, ' '.join(f"{t:.3f}" for t in tempos), flush=True)
+
+
+def medir_combinacao(workers, threads, backend='keras', model_dir="captcha_ml/models", imagens=200,
+                     afinidade=False, cpus_disponiveis=None):
+    """
+    Sobe `workers` processos com `threads` threads intra-op cada (0 = padrão do runtime)
+    e devolve {'vazao', 'p50_ms', 'p95_ms', 'p99_ms'} dos captchas resolvidos ao mesmo tempo.
+    """
+    import subprocess
+
+    import numpy as np
+
+    processos = []
+    for indice in range(workers):
+        env = dict(os.environ, TF_CPP_MIN_LOG_LEVEL='3', CAPTCHA_INDICE_OURO='0')
+        for nome in ('CAPTCHA_THREADS_INTRA', 'CAPTCHA_THREADS_INTER', 'CAPTCHA_CPUS'):
+            env.pop(nome, None)
+        if threads:
+            env['CAPTCHA_THREADS_INTRA'] = str(threads)
+            env['CAPTCHA_THREADS_INTER'] = '1'
+            if afinidade:
+                env['CAPTCHA_CPUS'] = formatar_cpus(cpus_do_worker(indice, threads, cpus_disponiveis))
+        comando = [sys.executable, '-m', 'captcha_ml.threads', 'worker', '--backend', backend,
+                   '--model-dir', model_dir, '--imagens', str(imagens)]
+        processos.append(subprocess.Popen(comando, env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                          text=True))
+
+    # Todos carregados antes da largada, para a carga de um não atrapalhar a medição de outro
+    for processo in processos:
+        while True:
+            linha = processo.stdout.readline()
+            if not linha or linha.strip() == 'pronto':
+                break
+    for processo in processos:
+        processo.stdin.write('\n')
+        processo.stdin.flush()
+
+    segundos = []
+    tempos = []
+    for processo in processos:
+        saida = processo.communicate()[0].strip().splitlines()
+        if not saida:
+            raise RuntimeError(f"worker terminou com {processo.returncode} sem resultado")
+        campos = saida[-1].split()
+        segundos.append(float(campos[0]))
+        tempos.extend(float(t) for t in campos[1:])
+    tempos = np.array(tempos)
+    return {
+        'vazao': workers * imagens / max(segundos),
+        'p50_ms': float(np.percentile(tempos, 50)),
+        'p95_ms': float(np.percentile(tempos, 95)),
+        'p99_ms': float(np.percentile(tempos, 99)),
+    }
+
+
+def varrer(nucleos=None, backend='keras', model_dir="captcha_ml/models", imagens=200, afinidade=False):
+    """
+    Mede todas as divisões workers x threads com workers x threads <= `nucleos`,
+    e cada número de workers também com os pools padrão (sem limite, o que
+    acontece hoje), e imprime a tabela com a melhor vazão e a menor p99.
+    """
+    if not nucleos:
+        nucleos = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+    combinacoes = []
+    for workers in range(1, nucleos + 1):
+        combinacoes.append((workers, 0))
+        combinacoes.extend((workers, threads) for threads in range(1, nucleos // workers + 1))
+
+    print(f"\n{'workers':>7s} {'threads':>8s} {'vazão':>12s} {'p50':>9s} {'p95':>9s} {'p99':>9s}")
+    resultados = []
+    for workers, threads in combinacoes:
+        medida = medir_combinacao(workers, threads, backend, model_dir, imagens, afinidade)
+        resultados.append(((workers, threads), medida))
+        print(f"{workers:7d} {threads or 'padrão':>8} {medida['vazao']:8.1f} img/s {medida['p50_ms']:7.2f}ms "
+              f"{medida['p95_ms']:7.2f}ms {medida['p99_ms']:7.2f}ms", flush=True)
+
+    (workers, threads), melhor = max(resultados, key=lambda r: r[1]['vazao'])
+    print(f"\nMaior vazão: {workers} workers x {threads or 'padrão'} threads ({melhor['vazao']:.1f} img/s)")
+    (workers, threads), melhor = min(resultados, key=lambda r: r[1]['p99_ms'])
+    print(f"Menor p99:   {workers} workers x {threads or 'padrão'} threads ({melhor['p99_ms']:.2f} ms)")
+    return resultados
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Threads e afinidade do solver com vários workers")
+    parser.add_argument('comando', choices=['varrer', 'worker'])
+    parser.add_argument('--backend', default='keras')
+    parser.add_argument('--model-dir', default="captcha_ml/models")
+    parser.add_argument('--nucleos', type=int, default=None, help="Núcleos a dividir (default: os deste processo)")
+    parser.add_argument('--imagens', type=int, default=200, help="Captchas por worker")
+    parser.add_argument('--afinidade', action='store_true', help="Prende cada worker à sua fatia de CPUs")
+    args = parser.parse_args()
+
+    if args.comando == 'worker':
+        _worker(args.backend, args.model_dir, args.imagens)
+    else:
+        varrer(args.nucleos, args.backend, args.model_dir, args.imagens, args.afinidade)
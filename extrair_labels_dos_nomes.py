@@ -11,9 +11,10 @@ Este script extrai os labels dos nomes dos arquivos e cria o dataset corretament
 
 import os
 import numpy as np
-import cv2
 from datetime import datetime
 
+from captcha_ml.preprocessamento import preprocessar
+
 def extract_label_from_filename(filename):
     """Extrai o label do nome do arquivo"""
     # Formato: {label}_captcha_{timestamp}_{id}.png
@@ -23,21 +24,9 @@ def extract_label_from_filename(filename):
 
 def load_and_preprocess_image(image_path):
     """Carrega e preprocessa imagem para o formato esperado pelo modelo"""
+    # Mesmo pré-processamento do treino e do solver (binarizada, 50x180, 0-255)
     try:
-        # Carregar imagem
-        img = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
-        if img is None:
-            print(f"❌ Erro ao carregar imagem: {image_path}")
-            return None
-        
-        # Normalizar para 0-1
-        img = img.astype(np.float32) / 255.0
-        
-        # Redimensionar para (50, 180) - height x width
-        img = cv2.resize(img, (180, 50))
-        
-        return img
-        
+        return preprocessar(image_path)
     except Exception as e:
         print(f"❌ Erro ao processar {image_path}: {e}")
         return None
@@ -1,8 +1,7 @@
 import pandas as pd
 import sys
 import os
-import time
-import random
+import asyncio
 import json
 from datetime import datetime
 
@@ -11,7 +10,11 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 # Tentar importar o scrapper
 try:
-    from scrapper.scrapper import buscar_historico_atleta
+    from captcha_ml.backends import backend_disponivel, preload_solver
+    from scrapper.async_scrapper import iter_historicos
+    from scrapper.rate_controller import configurar_rate_controller
+    from scrapper.tombstones import get_default_tombstones
+    from scrapper.errors import AthleteNotFoundError, AthleteSkippedError, BidError, RETRY_BACKOFF
 except ImportError:
     print("❌ Erro: Não foi possível importar 'scrapper.scrapper'.")
     print("Verifique se você está executando o script da raiz do projeto.")
@@ -22,11 +25,91 @@ INPUT_CSV = "s_cadastro_jogadores_rows.csv"
 OUTPUT_CSV = "jogadores_historico_completo.csv"
 COLUNA_ID = "registro_canonico_bid"
 SAVE_INTERVAL = 10  # Salvar o CSV a cada X atletas processados
+CONCURRENCIA = 4  # Número de atletas buscados em paralelo
+MAX_RPS = 2.0  # Teto de requisições/s ao BID (o controlador AIMD ajusta abaixo disso)
+PREFETCH_CAPTCHAS = True  # Resolver captchas em background enquanto os POSTs acontecem
+PRELOAD_SOLVER = True  # Carregar e aquecer o solver antes do primeiro atleta
 
 def log(msg):
     timestamp = datetime.now().strftime("%H:%M:%S")
     print(f"[{timestamp}] {msg}")
 
+def adicionar_linha(df, nova_linha):
+    # Adicionar outras colunas como vazias se existirem
+    for col in df.columns:
+        if col not in nova_linha:
+            nova_linha[col] = None
+
+    # Adicionar linha ao DataFrame
+    new_df = pd.DataFrame([nova_linha])
+    return pd.concat([df, new_df], ignore_index=True)
+
+async def processar_registros(df, registros_faltantes):
+    """Busca os registros em paralelo e vai anexando os resultados ao DataFrame"""
+    processados_sessao = 0
+    sucessos_sessao = 0
+    total = len(registros_faltantes)
+
+    log(f"⚡ Buscando {CONCURRENCIA} atletas em paralelo (teto de {MAX_RPS} req/s)")
+    configurar_rate_controller(max_rps=MAX_RPS)
+
+    if PRELOAD_SOLVER and backend_disponivel():
+        log("🧠 Carregando o solver de captcha...")
+        preload_solver()
+
+    historicos = iter_historicos(registros_faltantes,
+                                 concurrency=CONCURRENCIA,
+                                 auto_solve=True,
+                                 max_retries=15,
+                                 prefetch=PREFETCH_CAPTCHAS)
+
+    async for registro, dados, erro in historicos:
+        if erro is None:
+            df = adicionar_linha(df, {
+                COLUNA_ID: registro,
+                'scrapper_status': 'sucesso',
+                'scrapper_data': json.dumps(dados, ensure_ascii=False),
+                'scrapper_msg': 'OK'
+            })
+            sucessos_sessao += 1
+            log(f"✅ Sucesso para registro {registro} ({processados_sessao + 1}/{total})")
+        else:
+            # Erro - adicionar linha com erro (status conforme o tipo da falha, ver scrapper/errors.py)
+            error_msg = str(erro)
+            if isinstance(erro, AthleteNotFoundError):
+                status = 'nao_encontrado'
+            elif isinstance(erro, AthleteSkippedError):
+                status = 'ignorado'
+            else:
+                status = 'erro'
+            classe = erro.classe if isinstance(erro, BidError) else type(erro).__name__
+            df = adicionar_linha(df, {
+                COLUNA_ID: registro,
+                'scrapper_status': status,
+                'scrapper_data': None,
+                'scrapper_msg': error_msg,
+                'scrapper_erro': classe
+            })
+            if isinstance(erro, BidError) and erro.politica == RETRY_BACKOFF:
+                # Falha transitória (timeout, 429, 5xx isolado): vale tentar de novo numa próxima execução
+                log(f"⏳ Falha transitória para registro {registro} ({processados_sessao + 1}/{total}): [{classe}] {error_msg}")
+            else:
+                log(f"❌ Erro para registro {registro} ({processados_sessao + 1}/{total}): [{classe}] {error_msg}")
+
+        processados_sessao += 1
+
+        # 11. Checkpoint (Salvar periodicamente)
+        if processados_sessao % SAVE_INTERVAL == 0:
+            log(f"💾 Salvando checkpoint em {OUTPUT_CSV}...")
+            df.to_csv(OUTPUT_CSV, index=False)
+
+    from captcha_ml.indice_ouro import get_indice_ouro
+    indice = get_indice_ouro(criar=False)
+    if indice is not None:
+        log(f"🗂️ Índice do dataset_ouro: {indice.estatisticas()}")
+
+    return df, processados_sessao, sucessos_sessao
+
 def run_production_scraping():
     # 1. LÓGICA DE CARREGAMENTO
     if os.path.exists(OUTPUT_CSV):
@@ -51,6 +134,8 @@ def run_production_scraping():
         df['scrapper_data'] = None   
     if 'scrapper_msg' not in df.columns:
         df['scrapper_msg'] = None    
+    if 'scrapper_erro' not in df.columns:
+        df['scrapper_erro'] = None
 
     print("="*80)
     print("🔍 ANALISANDO RANGE DE REGISTROS")
@@ -129,79 +214,31 @@ def run_production_scraping():
     
     log(f"📊 REGISTROS FALTANTES NO RANGE: {len(registros_faltantes):,}")
     
+    # IDs que o servidor já recusou repetidamente (5xx) ou que não existem ficam de fora até a re-verificação
+    tombstones = get_default_tombstones()
+    registros_mortos = [r for r in registros_faltantes if tombstones.deve_pular(r)]
+    if registros_mortos:
+        mortos = set(registros_mortos)
+        registros_faltantes = [r for r in registros_faltantes if r not in mortos]
+        log(f"🪦 REGISTROS PULADOS (falha 5xx recente ou atleta inexistente): {len(registros_mortos):,}")
+    
     # 9. ESTATÍSTICAS DETALHADAS
     if 'scrapper_status' in df.columns:
         sucessos_anteriores = len(df[df['scrapper_status'] == 'sucesso'])
         erros_anteriores = len(df[df['scrapper_status'] == 'erro'])
+        nao_encontrados_anteriores = len(df[df['scrapper_status'] == 'nao_encontrado'])
         log(f"✅ SUCESSOS ANTERIORES: {sucessos_anteriores:,}")
         log(f"❌ ERROS ANTERIORES: {erros_anteriores:,}")
+        log(f"👻 NÃO ENCONTRADOS ANTERIORES: {nao_encontrados_anteriores:,}")
     
     print("="*80)
     print("🚀 INICIANDO PROCESSAMENTO DOS REGISTROS FALTANTES")
     print("="*80)
     
     # 10. PROCESSAR REGISTROS FALTANTES
-    processados_sessao = 0
-    sucessos_sessao = 0
-    
-    for i, registro in enumerate(registros_faltantes):
-        log(f"🔄 Processando registro {registro} ({i+1}/{len(registros_faltantes)})")
-        
-        try:
-            # Chama o scrapper
-            dados = buscar_historico_atleta(str(registro), auto_solve=True, max_retries=15)
-            
-            # Criar nova linha no DataFrame
-            nova_linha = {
-                COLUNA_ID: registro,
-                'scrapper_status': 'sucesso',
-                'scrapper_data': json.dumps(dados, ensure_ascii=False),
-                'scrapper_msg': 'OK'
-            }
-            
-            # Adicionar outras colunas como vazias se existirem
-            for col in df.columns:
-                if col not in nova_linha:
-                    nova_linha[col] = None
-            
-            # Adicionar linha ao DataFrame
-            new_df = pd.DataFrame([nova_linha])
-            df = pd.concat([df, new_df], ignore_index=True)
-            
-            sucessos_sessao += 1
-            log(f"✅ Sucesso para registro {registro}")
-            
-        except Exception as e:
-            # Erro - adicionar linha com erro
-            error_msg = str(e)
-            nova_linha = {
-                COLUNA_ID: registro,
-                'scrapper_status': 'erro',
-                'scrapper_data': None,
-                'scrapper_msg': error_msg
-            }
-            
-            # Adicionar outras colunas como vazias se existirem
-            for col in df.columns:
-                if col not in nova_linha:
-                    nova_linha[col] = None
-            
-            # Adicionar linha ao DataFrame
-            new_df = pd.DataFrame([nova_linha])
-            df = pd.concat([df, new_df], ignore_index=True)
-            
-            log(f"❌ Erro para registro {registro}: {error_msg}")
-        
-        processados_sessao += 1
-        
-        # 11. Checkpoint (Salvar periodicamente)
-        if processados_sessao % SAVE_INTERVAL == 0:
-            log(f"💾 Salvando checkpoint em {OUTPUT_CSV}...")
-            df.to_csv(OUTPUT_CSV, index=False)
-        
-        # Delay aleatório
-        sleep_time = random.uniform(2, 5)
-        time.sleep(sleep_time)
+    df, processados_sessao, sucessos_sessao = asyncio.run(
+        processar_registros(df, registros_faltantes)
+    )
 
     # 12. Salvamento Final
     log("💾 Salvando arquivo final...")
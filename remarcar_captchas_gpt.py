@@ -15,10 +15,11 @@ import json
 import requests
 import numpy as np
 from PIL import Image
-import cv2
 from datetime import datetime
 import time
 
+from captcha_ml.preprocessamento import preprocessar
+
 # Configurações da API OpenAI
 OPENAI_API_KEY = input("Digite sua chave da API OpenAI: ").strip()
 OPENAI_API_URL = "https://api.openai.com/v1/chat/completions"
@@ -87,24 +88,12 @@ Exemplo: se você vê "a", "3", "b", "7", responda apenas: a3b7"""
 
 def load_image_as_array(image_path):
     """Carrega imagem e converte para array NumPy no formato esperado pelo modelo"""
-    # Ler imagem em escala de cinza
-    img = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
-    
-    if img is None:
-        print(f"❌ Erro ao carregar imagem: {image_path}")
+    # Mesmo pré-processamento do treino e do solver (binarizada, 50x180, 0-255)
+    try:
+        return preprocessar(image_path)
+    except Exception as e:
+        print(f"❌ Erro ao carregar imagem: {image_path} ({e})")
         return None
-    
-    # Normalizar para 0-255 se necessário
-    if img.max() <= 1.0:
-        img = (img * 255).astype(np.uint8)
-    
-    # Verificar dimensões e ajustar se necessário
-    # O modelo espera (180, 50) - width x height
-    if img.shape != (50, 180):  # OpenCV usa (height, width)
-        # Redimensionar mantendo proporção ou não dependendo da necessidade
-        img = cv2.resize(img, (180, 50))
-    
-    return img
 
 def process_captcha_images():
     """Processa todas as imagens de captcha e cria novo dataset"""
@@ -0,0 +1,121 @@
+"""
+Motor assíncrono (asyncio) para buscas de histórico de atletas no BID da CBF.
+
+Cada busca continua sendo feita por `buscar_historico_atleta` (mesma lógica de
+retry, CSRF e Dataset Ouro), mas várias buscas rodam ao mesmo tempo sobre um
+único event loop, cada uma em uma thread dedicada do executor.
+"""
+
+import asyncio
+import functools
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+from scrapper.scrapper import buscar_historico_atleta, _confianca_minima
+from scrapper.session_pool import BidSessionPool
+
+
+async def buscar_historico_atleta_async(codigo_atleta, captcha_code=None, auto_solve=True,
+                                        max_retries=15, executor=None, pool=None):
+    """
+    Versão assíncrona de `buscar_historico_atleta`.
+
+    Args:
+        codigo_atleta: Código do atleta no BID
+        captcha_code: Código do captcha (opcional)
+        auto_solve: Se True, resolve o captcha automaticamente com ML
+        max_retries: Número máximo de tentativas
+        executor: Executor onde a busca roda (default: executor padrão do loop)
+        pool: BidSessionPool de onde vem a sessão (default: pool do processo)
+
+    Returns:
+        JSON do histórico do atleta
+    """
+    loop = asyncio.get_running_loop()
+    busca = functools.partial(buscar_historico_atleta, codigo_atleta,
+                              captcha_code=captcha_code,
+                              auto_solve=auto_solve,
+                              max_retries=max_retries,
+                              pool=pool)
+    return await loop.run_in_executor(executor, busca)
+
+
+async def iter_historicos(ids, concurrency=8, auto_solve=True, max_retries=15, atraso=None,
+                          pool=None, prefetch=False):
+    """
+    Busca o histórico de vários atletas em paralelo.
+
+    Mantém no máximo `concurrency` buscas em andamento e vai puxando novos IDs
+    de `ids` (pode ser um gerador, ex: range(500000, 600000)) conforme as
+    buscas terminam. Os resultados saem em ordem de conclusão.
+
+    Args:
+        ids: Iterável de códigos de atleta
+        concurrency: Número máximo de buscas simultâneas
+        auto_solve: Se True, resolve o captcha automaticamente com ML
+        max_retries: Número máximo de tentativas por atleta
+        atraso: Tupla (min, max) em segundos de espera antes de cada busca
+            em cada slot (None = sem espera)
+        pool: BidSessionPool compartilhado (default: um pool novo com
+            `concurrency` sessões, uma por slot)
+        prefetch: Se True, liga a pré-busca de captchas resolvidos no pool
+
+    Yields:
+        Tupla (codigo_atleta, dados, erro). Em caso de sucesso `erro` é None;
+        em caso de falha `dados` é None e `erro` é a exceção levantada.
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency deve ser >= 1")
+
+    async def _buscar(codigo):
+        if atraso:
+            await asyncio.sleep(random.uniform(*atraso))
+        return await buscar_historico_atleta_async(codigo, auto_solve=auto_solve,
+                                                   max_retries=max_retries,
+                                                   executor=executor,
+                                                   pool=pool)
+
+    pool_proprio = pool is None
+    if pool_proprio:
+        pool = BidSessionPool(tamanho=concurrency)
+    if prefetch and auto_solve:
+        # Com confiança mínima configurada, o prefetch já traz a probabilidade
+        pool.iniciar_prefetch(com_confianca=bool(_confianca_minima(None)))
+
+    ids_iter = iter(ids)
+    fim = object()
+    pendentes = {}
+
+    def _agendar():
+        codigo = next(ids_iter, fim)
+        if codigo is fim:
+            return False
+        pendentes[asyncio.ensure_future(_buscar(codigo))] = codigo
+        return True
+
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="bid")
+    try:
+        while len(pendentes) < concurrency and _agendar():
+            pass
+
+        while pendentes:
+            concluidas, _ = await asyncio.wait(pendentes, return_when=asyncio.FIRST_COMPLETED)
+            for tarefa in concluidas:
+                codigo = pendentes.pop(tarefa)
+                _agendar()
+                try:
+                    dados = tarefa.result()
+                except Exception as e:
+                    yield codigo, None, e
+                else:
+                    yield codigo, dados, None
+    finally:
+        for tarefa in pendentes:
+            tarefa.cancel()
+        # Cancelar a tarefa não para a thread: buscas já em andamento continuam usando
+        # as sessões do pool. Descarta as que não começaram e espera as demais (fora do
+        # event loop) antes de fechar o pool
+        executor.shutdown(wait=False, cancel_futures=True)
+        await asyncio.get_running_loop().run_in_executor(None, functools.partial(executor.shutdown, wait=True))
+        if pool_proprio:
+            pool.fechar()
@@ -0,0 +1,209 @@
+"""
+Pré-busca de captchas já resolvidos para as sessões do pool.
+
+Uma thread em background busca `/get-captcha-base64` para as sessões
+emprestadas do pool (`BidSessionPool.sessao()`) que estão sem captcha pronto,
+resolve as imagens em lote e deixa o resultado
+numa fila por sessão. Assim a submissão (ou o retry depois de "captcha
+invalido") só precisa pegar o próximo captcha pronto e fazer o POST.
+
+O servidor guarda apenas o último captcha emitido para cada sessão: pedir um
+captcha novo invalida o anterior. Por isso o default é `profundidade=1` e a
+thread nunca busca captcha para uma sessão que está com um captcha em
+submissão (entre `proximo()` e `liberar()`). Sessões paradas no pool ou
+emprestadas com `prefetch=False` também ficam de fora: cada GET extra gasta o
+mesmo orçamento do controlador de taxa que as consultas de verdade.
+"""
+
+import functools
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+class CaptchaPronto:
+    """Captcha baixado e resolvido, aguardando submissão"""
+
+    def __init__(self, base64, codigo, geracao, probabilidade=None):
+        self.base64 = base64
+        self.codigo = codigo
+        self.geracao = geracao
+        # Probabilidade do código no beam search (None se o resolver não informar)
+        self.probabilidade = probabilidade
+        self.obtido_em = time.monotonic()
+
+
+def resolver_lote(imagens, com_confianca=False):
+    """
+    Resolve uma lista de captchas em base64 (None onde falhar).
+    Com `com_confianca`, cada item é o dict de `solve_many_with_confidence`.
+    """
+    from captcha_ml.backends import solve_many_auto, solve_many_with_confidence_auto
+    from scrapper.scrapper import CAPTCHA_SOLVER_AVAILABLE
+
+    if not CAPTCHA_SOLVER_AVAILABLE:
+        return [None] * len(imagens)
+    # Um único forward pass para o lote inteiro
+    if com_confianca:
+        return solve_many_with_confidence_auto(imagens)
+    return solve_many_auto(imagens)
+
+
+class CaptchaPrefetcher:
+    """
+    Mantém uma fila limitada de captchas resolvidos para cada sessão do pool.
+
+    Args:
+        pool: BidSessionPool cujas sessões serão abastecidas
+        resolver: Função lista de base64 -> lista de códigos (ou dicts com 'codigo' e 'probabilidade')
+        profundidade: Tamanho máximo da fila de cada sessão
+        tamanho_lote: Máximo de captchas buscados/resolvidos por rodada
+        max_idade: Idade máxima (s) de um captcha pronto antes de ser descartado
+        tamanho_captcha: Tamanho esperado do código (predições diferentes são descartadas)
+        com_confianca: Resolve com beam search e guarda a probabilidade de cada código
+            (usada pelo `confianca_minima` do scrapper sem resolver o captcha de novo)
+    """
+
+    def __init__(self, pool, resolver=None, profundidade=1, tamanho_lote=8,
+                 max_idade=120, tamanho_captcha=4, com_confianca=False):
+        self.pool = pool
+        self.resolver = resolver or functools.partial(resolver_lote, com_confianca=com_confianca)
+        self.profundidade = profundidade
+        self.tamanho_lote = tamanho_lote
+        self.max_idade = max_idade
+        self.tamanho_captcha = tamanho_captcha
+
+        self._filas = {}
+        self._em_uso = set()
+        self._cond = threading.Condition()
+        self._parar = False
+        self._executor = ThreadPoolExecutor(max_workers=tamanho_lote, thread_name_prefix="captcha-prefetch")
+        self._thread = threading.Thread(target=self._loop, name="captcha-prefetch", daemon=True)
+        self._thread.start()
+
+    def _fila(self, bid):
+        return self._filas.setdefault(id(bid), deque())
+
+    def _valido(self, bid, pronto):
+        return (pronto.geracao == bid.aquecimentos and
+                time.monotonic() - pronto.obtido_em <= self.max_idade)
+
+    def _precisa_abastecer(self, bid):
+        # Só sessões com uma consulta em andamento: no máximo um GET por requisição em voo
+        if not (bid.emprestada and bid.aceita_prefetch):
+            return False
+        if id(bid) in self._em_uso or bid.expirada:
+            return False
+        fila = self._fila(bid)
+        while fila and not self._valido(bid, fila[0]):
+            fila.popleft()
+        return len(fila) < self.profundidade
+
+    def proximo(self, bid, timeout=30):
+        """
+        Retorna o próximo captcha pronto da sessão (ou None em timeout).
+        A sessão fica reservada até `liberar()` ser chamado depois do POST.
+        """
+        limite = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                fila = self._fila(bid)
+                while fila:
+                    pronto = fila.popleft()
+                    if self._valido(bid, pronto):
+                        # Os demais captchas da fila deixam de valer quando este for usado
+                        fila.clear()
+                        self._em_uso.add(id(bid))
+                        return pronto
+
+                restante = limite - time.monotonic()
+                if restante <= 0 or self._parar:
+                    return None
+                self._cond.notify_all()
+                self._cond.wait(timeout=min(restante, 0.5))
+
+    def liberar(self, bid):
+        """Libera a sessão para receber um novo captcha em background"""
+        with self._cond:
+            self._em_uso.discard(id(bid))
+            self._cond.notify_all()
+
+    def _buscar_captcha(self, bid):
+        from scrapper.session_pool import sessao_rejeitada
+
+        with bid.lock:
+            geracao = bid.aquecimentos
+            headers = bid.aplicar_csrf({
+                'Accept': 'application/json, text/javascript, */*; q=0.01',
+                'X-Requested-With': 'XMLHttpRequest',
+                'Origin': bid.base_url,
+                'Referer': bid.url('/')
+            })
+            response = bid.get('/get-captcha-base64', headers=headers, timeout=10)
+
+        if sessao_rejeitada(response):
+            bid.invalidar()
+            return None
+        if response.status_code != 200:
+            return None
+
+        if 'json' in response.headers.get('content-type', '').lower():
+            return response.json().get('image', ''), geracao
+        return response.text.strip(), geracao
+
+    def _rodada(self, candidatos):
+        try:
+            buscas = list(self._executor.map(self._tentar_buscar, candidatos))
+        except RuntimeError:
+            # parar() desligou o executor no meio da rodada
+            if self._parar:
+                return
+            raise
+        obtidos = [(bid, b[0], b[1]) for bid, b in zip(candidatos, buscas) if b and b[0]]
+        if not obtidos:
+            # Servidor não entregou nenhum captcha; evita martelar em loop
+            time.sleep(1)
+            return
+
+        codigos = self.resolver([imagem for _, imagem, _ in obtidos])
+
+        with self._cond:
+            for (bid, imagem, geracao), codigo in zip(obtidos, codigos):
+                probabilidade = None
+                if isinstance(codigo, dict):
+                    codigo, probabilidade = codigo['codigo'], codigo['probabilidade']
+                # Predição de tamanho inválido é descartada; a sessão será reabastecida
+                if not codigo or len(codigo) != self.tamanho_captcha:
+                    continue
+                if id(bid) in self._em_uso:
+                    continue
+                self._fila(bid).append(CaptchaPronto(imagem, codigo, geracao, probabilidade))
+            self._cond.notify_all()
+
+    def _tentar_buscar(self, bid):
+        try:
+            return self._buscar_captcha(bid)
+        except Exception as e:
+            print(f"⚠️ Prefetch de captcha falhou: {e}")
+            return None
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                if self._parar:
+                    return
+                candidatos = [bid for bid in list(self.pool._sessoes)
+                              if self._precisa_abastecer(bid)][:self.tamanho_lote]
+                if not candidatos:
+                    self._cond.wait(timeout=0.5)
+                    continue
+
+            self._rodada(candidatos)
+
+    def parar(self):
+        with self._cond:
+            self._parar = True
+            self._cond.notify_all()
+        self._thread.join(timeout=5)
+        self._executor.shutdown(wait=False)
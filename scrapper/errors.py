@@ -0,0 +1,158 @@
+"""
+Tipos de falha das consultas ao BID da CBF.
+
+Cada exceção diz o que aconteceu (`classe`) e o que o loop de tentativas deve
+fazer a seguir (`politica`):
+
+- RETRY_IMEDIATO: pedir outro captcha e tentar de novo na hora
+- RETRY_BACKOFF: esperar (recuo exponencial) antes de tentar de novo
+- DESISTIR: não adianta tentar de novo; nenhum captcha a mais é gasto
+
+Todas herdam de `BidError` (que herda de Exception), então quem só faz
+`except Exception` continua funcionando; quem precisa decidir pelo tipo
+(ex: production_runner.py) usa `isinstance` ou `erro.classe`.
+"""
+
+import requests
+
+from scrapper.session_pool import sessao_rejeitada
+
+RETRY_IMEDIATO = 'imediato'
+RETRY_BACKOFF = 'backoff'
+DESISTIR = 'desistir'
+
+
+class BidError(Exception):
+    """Falha genérica de uma consulta ao BID"""
+    classe = 'erro'
+    politica = DESISTIR
+
+    def __init__(self, mensagem, status_code=None):
+        super().__init__(mensagem)
+        self.status_code = status_code
+
+
+class CaptchaRejectedError(BidError):
+    """O servidor respondeu 'captcha invalido' (predição errada do modelo)"""
+    classe = 'captcha_rejeitado'
+    politica = RETRY_IMEDIATO
+
+
+class SessionRejectedError(BidError):
+    """Sessão/CSRF expirado (401/419 ou mensagem de CSRF); a sessão é aquecida de novo"""
+    classe = 'sessao_rejeitada'
+    politica = RETRY_IMEDIATO
+
+
+class ServerError(BidError):
+    """Erro 5xx do servidor da CBF"""
+    classe = 'erro_servidor'
+    politica = RETRY_BACKOFF
+
+
+class SuspectedNotFoundError(ServerError):
+    """
+    Texto de erro da API que parece "atleta não encontrado", mas sem 404 nem
+    marcador estruturado. Só o texto não basta para marcar o atleta como
+    inexistente por 30 dias: conta como 5xx do histórico (recuo e, repetido,
+    tombstone de `erro_servidor`)
+    """
+
+
+class RateLimitedError(BidError):
+    """HTTP 429; `retry_after` traz o header Retry-After em segundos, se houver"""
+    classe = 'limite_taxa'
+    politica = RETRY_BACKOFF
+
+    def __init__(self, mensagem, status_code=429, retry_after=None):
+        super().__init__(mensagem, status_code)
+        self.retry_after = retry_after
+
+
+class BlockedError(BidError):
+    """HTTP 403 sem mensagem de CSRF: bloqueio de WAF/IP; recua em vez de reaquecer"""
+    classe = 'bloqueado'
+    politica = RETRY_BACKOFF
+
+
+class MalformedResponseError(BidError):
+    """Resposta 200 que não é o JSON esperado"""
+    classe = 'json_invalido'
+    politica = RETRY_BACKOFF
+
+
+class TransportTimeoutError(BidError):
+    """Timeout ou erro de conexão antes de haver resposta"""
+    classe = 'timeout'
+    politica = RETRY_BACKOFF
+
+
+class AthleteNotFoundError(BidError):
+    """O BID não tem o atleta (404 do histórico ou marcador estruturado de inexistente)"""
+    classe = 'atleta_inexistente'
+    politica = DESISTIR
+
+
+class AthleteSkippedError(BidError):
+    """ID pulado sem consulta porque está marcado em tombstones.py"""
+    classe = 'ignorado'
+    politica = DESISTIR
+
+
+class RetriesExhaustedError(BidError):
+    """Todas as tentativas acabaram; `ultimo_erro` é a última falha vista"""
+    classe = 'tentativas_esgotadas'
+    politica = DESISTIR
+
+    def __init__(self, mensagem, ultimo_erro=None):
+        super().__init__(mensagem, getattr(ultimo_erro, 'status_code', None))
+        self.ultimo_erro = ultimo_erro
+
+
+def _retry_after(response):
+    valor = response.headers.get('Retry-After')
+    try:
+        return float(valor) if valor is not None else None
+    except ValueError:
+        return None
+
+
+def classificar_resposta(response):
+    """
+    Converte uma resposta HTTP de erro em um BidError (ou None se for 200).
+    Além da sessão expirada, não olha o corpo de respostas 200; isso fica com
+    quem sabe o formato de cada endpoint. Um 404 vira BidError genérico: só o
+    histórico sabe que 404 quer dizer atleta inexistente (ver scrapper.py).
+    """
+    status = response.status_code
+    if sessao_rejeitada(response):
+        return SessionRejectedError(f"Sessão/CSRF rejeitado (HTTP {status})", status)
+    if status == 200:
+        return None
+    if status == 429:
+        return RateLimitedError("Servidor CBF limitou a taxa de requisições (HTTP 429)",
+                                retry_after=_retry_after(response))
+    if status == 403:
+        return BlockedError("Acesso bloqueado pelo servidor CBF (HTTP 403)", status)
+    if status >= 500:
+        return ServerError(f"Erro interno do servidor CBF (HTTP {status})", status)
+    return BidError(f"Erro na requisição: {status}", status)
+
+
+def classificar_excecao(erro):
+    """Converte exceções do `requests` em BidError (None se não for de transporte)"""
+    if isinstance(erro, BidError):
+        return erro
+    if isinstance(erro, (requests.Timeout, requests.ConnectionError)):
+        return TransportTimeoutError(f"Falha de conexão com o BID: {erro}")
+    return None
+
+
+def espera_backoff(erro, falhas_seguidas, base=2.0, maximo=60.0):
+    """Segundos de espera antes da próxima tentativa após `erro`"""
+    if erro.politica != RETRY_BACKOFF:
+        return 0.0
+    retry_after = getattr(erro, 'retry_after', None)
+    if retry_after is not None:
+        return min(maximo, retry_after)
+    return min(maximo, base * 2 ** (falhas_seguidas - 1))
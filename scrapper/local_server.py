@@ -0,0 +1,320 @@
+"""
+Servidor local que imita o BID da CBF, para testes de carga e de latência
+sem tocar em produção.
+
+Implementa `/`, `/atleta-competicoes/{id}`, `/get-captcha-base64`,
+`/busca-json` e `/atleta-historico-json` com o mesmo formato de resposta do
+site real. Os captchas vêm de `captcha_ml/data/dataset_ouro` (o nome do
+arquivo é o rótulo: `abcd_1699999999.png`) e a resposta enviada no POST é
+conferida contra esse rótulo, como o servidor real faz. Por isso o índice do
+dataset ouro (ver captcha_ml/indice_ouro.py) fica desligado no scrapper quando
+BID_BASE_URL não é o de produção; senão todo captcha seria respondido pelo hash.
+
+Uso:
+    python -m scrapper.local_server --porta 8765 --latencia 0.05 0.3 --taxa-5xx 0.02
+
+    # e em outro terminal
+    BID_BASE_URL=http://127.0.0.1:8765 python production_runner.py
+
+Ou dentro de um script (com CAPTCHA_INDICE_OURO=0, já que o BID_BASE_URL não muda):
+    with LocalBidServer(taxa_rejeicao_captcha=0.1) as servidor:
+        configurar_pool(base_url=servidor.base_url)
+        ...
+"""
+
+import argparse
+import base64
+import glob
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+import zlib
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATASET_OURO_DIR = os.path.join(ROOT_DIR, 'captcha_ml', 'data', 'dataset_ouro')
+
+NOMES = ['Lucas', 'Gabriel', 'Pedro', 'Matheus', 'Rafael', 'Guilherme', 'Felipe', 'João', 'Caio', 'Vinicius']
+SOBRENOMES = ['Silva', 'Santos', 'Oliveira', 'Souza', 'Lima', 'Pereira', 'Costa', 'Rodrigues', 'Almeida', 'Ferreira']
+CLUBES = ['Flamengo - RJ', 'Palmeiras - SP', 'Grêmio - RS', 'Bahia - BA', 'Ceilandense - DF',
+          'Sport - PE', 'Atlético - MG', 'Fortaleza - CE', 'Coritiba - PR', 'Remo - PA']
+TIPOS_CONTRATO = ['Profissional', 'Reversão', 'Cessão Temporária', 'Não Profissional', 'Rescisão']
+
+
+def carregar_captchas(diretorio=DATASET_OURO_DIR, limite=None):
+    """Lista de (rótulo, bytes) lida do dataset ouro"""
+    arquivos = sorted(glob.glob(os.path.join(diretorio, '*.png')))
+    if limite:
+        arquivos = arquivos[:limite]
+    captchas = []
+    for caminho in arquivos:
+        rotulo = os.path.basename(caminho).split('_')[0].lower()
+        with open(caminho, 'rb') as f:
+            captchas.append((rotulo, f.read()))
+    if not captchas:
+        raise FileNotFoundError(f"Nenhum captcha encontrado em {diretorio}")
+    return captchas
+
+
+def _atleta(codigo_atleta, uf=None, data_publicacao=None):
+    """Registro fictício, mas estável para o mesmo código"""
+    rng = random.Random(int(codigo_atleta))
+    nome = f"{rng.choice(NOMES)} {rng.choice(SOBRENOMES)} {rng.choice(SOBRENOMES)}"
+    clube = rng.choice(CLUBES)
+    nascimento = date(1985, 1, 1) + timedelta(days=rng.randrange(9000))
+    inicio = date(2015, 1, 1) + timedelta(days=rng.randrange(3500))
+    return {
+        'nome': nome,
+        'apelido': nome.split()[0],
+        'clube': clube,
+        'codigo_clube': str(rng.randrange(1000, 99999)),
+        'tipocontrato': rng.choice(TIPOS_CONTRATO),
+        'codigo_atleta': str(codigo_atleta),
+        'contrato_numero': f"{rng.randrange(100000, 999999)}/{inicio.year}",
+        'data_nascimento': nascimento.isoformat(),
+        'datainicio': inicio.strftime('%d/%m/%Y'),
+        'data_publicacao': data_publicacao or inicio.strftime('%d/%m/%Y'),
+        'uf': uf or clube[-2:],
+    }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = 'nginx'
+    sys_version = ''
+
+    def log_message(self, *args):
+        if self.server.bid.verbose:
+            super().log_message(*args)
+
+    def _responder(self, status, corpo, content_type='application/json', cookies=None):
+        if not isinstance(corpo, (bytes, str)):
+            corpo = json.dumps(corpo, ensure_ascii=False)
+        if isinstance(corpo, str):
+            corpo = corpo.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(corpo)))
+        for nome, valor in (cookies or {}).items():
+            self.send_header('Set-Cookie', f"{nome}={valor}; Path=/; HttpOnly")
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def _cookie(self, nome):
+        for parte in self.headers.get('Cookie', '').split(';'):
+            chave, _, valor = parte.strip().partition('=')
+            if chave == nome:
+                return valor
+        return None
+
+    def _form(self):
+        tamanho = int(self.headers.get('Content-Length') or 0)
+        corpo = self.rfile.read(tamanho).decode('utf-8')
+        return {k: v[0] for k, v in parse_qs(corpo).items()}
+
+    def do_GET(self):
+        bid = self.server.bid
+        bid._esperar()
+        caminho = self.path.split('?')[0]
+
+        if caminho == '/' or caminho.startswith('/atleta-competicoes/'):
+            sessao_id, csrf = bid._nova_sessao()
+            html = ('<!DOCTYPE html><html lang="pt-BR"><head>'
+                    f'<meta name="csrf-token" content="{csrf}">'
+                    '<title>BID - Boletim Informativo Diário</title></head>'
+                    '<body><div id="app"></div></body></html>')
+            return self._responder(200, html, 'text/html; charset=UTF-8',
+                                   cookies={'laravel_session': sessao_id, 'XSRF-TOKEN': csrf})
+
+        if caminho == '/get-captcha-base64':
+            sessao = bid._sessao(self._cookie('laravel_session'))
+            if sessao is None:
+                return self._responder(419, {'message': 'CSRF token mismatch.'})
+            rotulo, imagem = bid._sortear_captcha()
+            sessao['captcha'] = rotulo
+            bid._contar('captchas')
+            return self._responder(200, {'image': 'data:image/png;base64,' + base64.b64encode(imagem).decode()})
+
+        return self._responder(404, {'message': 'Not Found'})
+
+    def do_POST(self):
+        bid = self.server.bid
+        bid._esperar()
+        caminho = self.path.split('?')[0]
+        if caminho not in ('/busca-json', '/atleta-historico-json'):
+            return self._responder(404, {'message': 'Not Found'})
+
+        dados = self._form()
+        sessao = bid._sessao(self._cookie('laravel_session'))
+        if sessao is None or self.headers.get('X-CSRF-TOKEN') != sessao['csrf']:
+            bid._contar('rejeicoes_csrf')
+            return self._responder(419, {'message': 'CSRF token mismatch.'})
+
+        if bid.rng.random() < bid.taxa_5xx:
+            bid._contar('erros_5xx')
+            return self._responder(500, '<html><body><h1>500 Internal Server Error</h1></body></html>',
+                                   'text/html')
+
+        # O captcha vale para uma única submissão
+        esperado = sessao.pop('captcha', None)
+        enviado = (dados.get('captcha') or '').strip().lower()
+        if esperado is None or enviado != esperado or bid.rng.random() < bid.taxa_rejeicao_captcha:
+            bid._contar('captchas_rejeitados')
+            return self._responder(200, {'status': False, 'messages': ['Captcha invalido']})
+
+        bid._contar('sucessos')
+        if caminho == '/busca-json':
+            uf = dados.get('uf', '')
+            data_publicacao = dados.get('data', '')
+            semente = zlib.crc32(f"{uf}|{data_publicacao}".encode('utf-8'))
+            rng = random.Random(semente)
+            registros = [_atleta(rng.randrange(100000, 999999), uf, data_publicacao)
+                         for _ in range(rng.randrange(0, bid.max_registros + 1))]
+            return self._responder(200, registros)
+
+        codigo_atleta = dados.get('codigo_atleta', '')
+        if not re.fullmatch(r'\d+', codigo_atleta) or codigo_atleta in bid.atletas_inexistentes:
+            return self._responder(200, {'error': 'Atleta não encontrado'})
+        return self._responder(200, _atleta(codigo_atleta))
+
+
+class LocalBidServer:
+    """
+    Stand-in do BID rodando em uma thread.
+
+    Args:
+        host, porta: Endereço de escuta (porta 0 = porta livre qualquer)
+        latencia: Tupla (min, max) em segundos somada a cada resposta
+        taxa_5xx: Fração dos POSTs que respondem HTTP 500
+        taxa_rejeicao_captcha: Fração dos POSTs com captcha correto que ainda
+            assim são rejeitados
+        validade_csrf: Segundos até a sessão/CSRF expirar (None = não expira)
+        atletas_inexistentes: Códigos para os quais o histórico responde
+            "Atleta não encontrado"
+        max_registros: Máximo de registros por consulta em /busca-json
+        diretorio_captchas: Pasta com os captchas rotulados (default: dataset_ouro)
+        limite_captchas: Quantos captchas carregar (None = todos)
+        semente: Semente dos sorteios (latência, 5xx, rejeições)
+    """
+
+    def __init__(self, host='127.0.0.1', porta=0, latencia=(0.0, 0.0), taxa_5xx=0.0,
+                 taxa_rejeicao_captcha=0.0, validade_csrf=None, atletas_inexistentes=(),
+                 max_registros=20, diretorio_captchas=DATASET_OURO_DIR, limite_captchas=None,
+                 semente=None, verbose=False):
+        self.host = host
+        self.porta = porta
+        self.latencia = latencia
+        self.taxa_5xx = taxa_5xx
+        self.taxa_rejeicao_captcha = taxa_rejeicao_captcha
+        self.validade_csrf = validade_csrf
+        self.atletas_inexistentes = {str(c) for c in atletas_inexistentes}
+        self.max_registros = max_registros
+        self.verbose = verbose
+        self.captchas = carregar_captchas(diretorio_captchas, limite_captchas)
+        self.rng = random.Random(semente)
+        self.stats = {'sessoes': 0, 'captchas': 0, 'sucessos': 0, 'captchas_rejeitados': 0,
+                      'erros_5xx': 0, 'rejeicoes_csrf': 0}
+
+        self._sessoes = {}
+        self._lock = threading.Lock()
+        self._httpd = None
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.porta}"
+
+    def _esperar(self):
+        minimo, maximo = self.latencia
+        if maximo > 0:
+            time.sleep(self.rng.uniform(minimo, maximo))
+
+    def _contar(self, chave):
+        with self._lock:
+            self.stats[chave] += 1
+
+    def _nova_sessao(self):
+        sessao_id, csrf = uuid.uuid4().hex, uuid.uuid4().hex
+        with self._lock:
+            self._sessoes[sessao_id] = {'csrf': csrf, 'criada_em': time.monotonic()}
+            self.stats['sessoes'] += 1
+        return sessao_id, csrf
+
+    def _sessao(self, sessao_id):
+        """Sessão ativa ou None (inexistente ou expirada)"""
+        with self._lock:
+            sessao = self._sessoes.get(sessao_id)
+            if sessao is None:
+                return None
+            if self.validade_csrf is not None and time.monotonic() - sessao['criada_em'] > self.validade_csrf:
+                del self._sessoes[sessao_id]
+                return None
+            return sessao
+
+    def _sortear_captcha(self):
+        return self.rng.choice(self.captchas)
+
+    def iniciar(self):
+        self._httpd = ThreadingHTTPServer((self.host, self.porta), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.bid = self
+        self.porta = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="bid-local", daemon=True)
+        self._thread.start()
+        return self
+
+    def parar(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.parar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local que imita o BID da CBF")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, default=8765)
+    parser.add_argument('--latencia', type=float, nargs=2, default=(0.0, 0.0), metavar=('MIN', 'MAX'),
+                        help="Latência sorteada por resposta, em segundos")
+    parser.add_argument('--taxa-5xx', type=float, default=0.0, help="Fração dos POSTs que respondem 500")
+    parser.add_argument('--taxa-rejeicao-captcha', type=float, default=0.0,
+                        help="Fração dos captchas corretos rejeitados mesmo assim")
+    parser.add_argument('--validade-csrf', type=float, default=None,
+                        help="Segundos até a sessão/CSRF expirar")
+    parser.add_argument('--inexistentes', nargs='*', default=(), help="Códigos de atleta inexistentes")
+    parser.add_argument('--limite-captchas', type=int, default=None)
+    parser.add_argument('--semente', type=int, default=None)
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    servidor = LocalBidServer(host=args.host, porta=args.porta, latencia=tuple(args.latencia),
+                              taxa_5xx=args.taxa_5xx, taxa_rejeicao_captcha=args.taxa_rejeicao_captcha,
+                              validade_csrf=args.validade_csrf, atletas_inexistentes=args.inexistentes,
+                              limite_captchas=args.limite_captchas, semente=args.semente,
+                              verbose=args.verbose)
+    servidor.iniciar()
+    print(f"🧪 BID local em {servidor.base_url} ({len(servidor.captchas)} captchas do dataset ouro)")
+    print(f"   Use: BID_BASE_URL={servidor.base_url}")
+    try:
+        while True:
+            time.sleep(10)
+            print(f"📊 {servidor.stats}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.parar()
+
+
+if __name__ == '__main__':
+    main()
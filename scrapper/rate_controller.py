@@ -0,0 +1,131 @@
+"""
+Controle adaptativo de taxa de requisições ao BID da CBF (AIMD).
+
+Enquanto o servidor responde bem, a taxa sobe aos poucos (aumento aditivo)
+até o teto `max_rps`. Em erro 5xx, 429, 403, timeout/erro de conexão ou pico de
+latência, a taxa cai pela metade (redução multiplicativa). Todas as
+requisições do scrapper passam por aqui, então o controlador substitui os
+sleeps aleatórios fixos que havia antes.
+"""
+
+import os
+import threading
+import time
+
+import requests
+
+
+class AIMDRateController:
+    """
+    Limitador de taxa compartilhado (thread-safe) com ajuste AIMD.
+
+    Args:
+        max_rps: Teto de requisições por segundo
+        min_rps: Piso de requisições por segundo
+        taxa_inicial: Taxa de partida (default: metade do teto)
+        incremento: Quanto a taxa sobe (req/s) a cada resposta saudável
+        fator_reducao: Multiplicador aplicado à taxa em caso de problema
+        fator_pico: Latência acima de `fator_pico` x média móvel conta como pico
+        janela_reducao: Intervalo mínimo (s) entre duas reduções, para que uma
+            rajada de erros das requisições em voo conte como um único evento
+    """
+
+    def __init__(self, max_rps=2.0, min_rps=0.1, taxa_inicial=None, incremento=0.05,
+                 fator_reducao=0.5, fator_pico=3.0, janela_reducao=2.0):
+        if max_rps <= 0 or min_rps <= 0 or min_rps > max_rps:
+            raise ValueError("Precisa 0 < min_rps <= max_rps")
+        self.max_rps = max_rps
+        self.min_rps = min_rps
+        self.incremento = incremento
+        self.fator_reducao = fator_reducao
+        self.fator_pico = fator_pico
+        self.janela_reducao = janela_reducao
+
+        self.taxa = min(max_rps, max(min_rps, taxa_inicial or max_rps / 2))
+        self.latencia_media = None
+        self.reducoes = 0
+
+        self._proximo_slot = time.monotonic()
+        self._ultima_reducao = 0.0
+        self._lock = threading.Lock()
+
+    def aguardar(self):
+        """Bloqueia até o próximo horário livre para uma requisição"""
+        with self._lock:
+            agora = time.monotonic()
+            slot = max(agora, self._proximo_slot)
+            self._proximo_slot = slot + 1.0 / self.taxa
+        espera = slot - agora
+        if espera > 0:
+            time.sleep(espera)
+
+    def _reduzir(self):
+        agora = time.monotonic()
+        if agora - self._ultima_reducao < self.janela_reducao:
+            return
+        self._ultima_reducao = agora
+        self.taxa = max(self.min_rps, self.taxa * self.fator_reducao)
+        self.reducoes += 1
+        # Empurra a próxima requisição para respeitar a nova taxa imediatamente
+        self._proximo_slot = max(self._proximo_slot, agora + 1.0 / self.taxa)
+
+    def registrar(self, status_code=None, latencia=None, erro=False):
+        """
+        Informa o resultado de uma requisição.
+
+        Args:
+            status_code: Status HTTP da resposta (None se não houve resposta)
+            latencia: Tempo de resposta em segundos
+            erro: True para timeout/erro de conexão
+        """
+        with self._lock:
+            # 403 costuma ser bloqueio de WAF/IP: também pede para desacelerar
+            problema = erro or status_code is None or status_code >= 500 or status_code in (403, 429)
+
+            if not problema and latencia is not None:
+                media = self.latencia_media
+                if media is not None and latencia > self.fator_pico * media:
+                    problema = True
+                # A média acompanha mudanças persistentes de latência
+                self.latencia_media = latencia if media is None else 0.8 * media + 0.2 * latencia
+
+            if problema:
+                self._reduzir()
+            else:
+                self.taxa = min(self.max_rps, self.taxa + self.incremento)
+
+    def requisitar(self, session, metodo, url, **kwargs):
+        """Faz `session.request(...)` respeitando e alimentando o controlador"""
+        self.aguardar()
+        inicio = time.monotonic()
+        try:
+            response = session.request(metodo, url, **kwargs)
+        except (requests.Timeout, requests.ConnectionError):
+            self.registrar(erro=True)
+            raise
+        self.registrar(response.status_code, time.monotonic() - inicio)
+        return response
+
+
+_controlador_padrao = None
+_controlador_lock = threading.Lock()
+
+
+def get_rate_controller():
+    """Controlador compartilhado pelo processo (teto via BID_MAX_RPS, default 2 req/s)"""
+    global _controlador_padrao
+    if _controlador_padrao is None:
+        with _controlador_lock:
+            if _controlador_padrao is None:
+                _controlador_padrao = AIMDRateController(
+                    max_rps=float(os.environ.get('BID_MAX_RPS', 2.0))
+                )
+    return _controlador_padrao
+
+
+def configurar_rate_controller(**kwargs):
+    """Substitui o controlador compartilhado (ex: configurar_rate_controller(max_rps=5))"""
+    global _controlador_padrao
+    with _controlador_lock:
+        _controlador_padrao = AIMDRateController(**kwargs)
+    return _controlador_padrao
@@ -0,0 +1,175 @@
+"""
+Cache persistente em disco das respostas do BID (busca-json e
+atleta-historico-json).
+
+Cada resposta é gravada em um arquivo JSON cujo nome é o SHA-256 do endpoint
++ parâmetros da requisição. O cache é consultado antes de qualquer captcha
+ser buscado, então um acerto economiza várias requisições HTTP e uma
+inferência do modelo.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# TTL em segundos por endpoint (None = não expira).
+# Publicações de datas passadas não mudam; o histórico de um atleta muda
+# quando ele é transferido, então expira em uma semana.
+DEFAULT_TTLS = {
+    'busca-json': None,
+    'atleta-historico-json': 7 * 24 * 3600,
+}
+
+
+class ResponseCache:
+    """
+    Cache de respostas endereçado por conteúdo, com TTL por endpoint e
+    remoção LRU quando o tamanho total passa de `max_bytes`.
+
+    Args:
+        diretorio: Pasta onde os arquivos do cache ficam
+        ttls: Dict endpoint -> TTL em segundos (None = não expira)
+        max_bytes: Tamanho máximo do cache em disco
+    """
+
+    def __init__(self, diretorio=None, ttls=None, max_bytes=512 * 1024 * 1024):
+        self.diretorio = diretorio or os.path.join(ROOT_DIR, '.bid_cache')
+        self.ttls = dict(DEFAULT_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        self.max_bytes = max_bytes
+        self.acertos = 0
+        self.falhas = 0
+
+        self._lock = threading.Lock()
+        self._tamanho = None
+        os.makedirs(self.diretorio, exist_ok=True)
+
+    def chave(self, endpoint, params):
+        conteudo = json.dumps({'endpoint': endpoint, 'params': params},
+                              sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(conteudo.encode('utf-8')).hexdigest()
+
+    def _caminho(self, chave):
+        return os.path.join(self.diretorio, chave[:2], f"{chave}.json")
+
+    def get(self, endpoint, params):
+        """Retorna a resposta em cache ou None (ausente/expirada)"""
+        caminho = self._caminho(self.chave(endpoint, params))
+        try:
+            with open(caminho, 'r', encoding='utf-8') as f:
+                entrada = json.load(f)
+        except (OSError, ValueError):
+            self.falhas += 1
+            return None
+
+        ttl = self.ttls.get(endpoint)
+        if ttl is not None and time.time() - entrada['criado_em'] > ttl:
+            self._remover(caminho)
+            self.falhas += 1
+            return None
+
+        # mtime marca o último acesso (ordem da remoção LRU)
+        try:
+            os.utime(caminho)
+        except OSError:
+            pass
+        self.acertos += 1
+        return entrada['dados']
+
+    def set(self, endpoint, params, dados):
+        """Grava a resposta no cache (escrita atômica)"""
+        caminho = self._caminho(self.chave(endpoint, params))
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+
+        conteudo = json.dumps({
+            'endpoint': endpoint,
+            'params': params,
+            'criado_em': time.time(),
+            'dados': dados
+        }, ensure_ascii=False).encode('utf-8')
+
+        temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporario, 'wb') as f:
+            f.write(conteudo)
+
+        with self._lock:
+            # Tamanho medido antes do replace (o os.walk preguiçoso não pode ver o
+            # arquivo novo) e descontando a versão antiga da mesma chave
+            tamanho = self._tamanho_atual()
+            try:
+                antigo = os.path.getsize(caminho)
+            except OSError:
+                antigo = 0
+            os.replace(temporario, caminho)
+            self._tamanho = tamanho + len(conteudo) - antigo
+            if self._tamanho > self.max_bytes:
+                self._remover_lru()
+
+    def _remover(self, caminho):
+        try:
+            tamanho = os.path.getsize(caminho)
+            os.remove(caminho)
+        except OSError:
+            return
+        with self._lock:
+            if self._tamanho is not None:
+                self._tamanho -= tamanho
+
+    def _arquivos(self):
+        for raiz, _, nomes in os.walk(self.diretorio):
+            for nome in nomes:
+                if nome.endswith('.json'):
+                    caminho = os.path.join(raiz, nome)
+                    try:
+                        st = os.stat(caminho)
+                    except OSError:
+                        continue
+                    yield caminho, st.st_size, st.st_mtime
+
+    def _tamanho_atual(self):
+        if self._tamanho is None:
+            self._tamanho = sum(tamanho for _, tamanho, _ in self._arquivos())
+        return self._tamanho
+
+    def _remover_lru(self):
+        # Remove os menos usados até ficar em 90% do limite
+        alvo = self.max_bytes * 0.9
+        arquivos = sorted(self._arquivos(), key=lambda a: a[2])
+        total = sum(tamanho for _, tamanho, _ in arquivos)
+        for caminho, tamanho, _ in arquivos:
+            if total <= alvo:
+                break
+            try:
+                os.remove(caminho)
+                total -= tamanho
+            except OSError:
+                pass
+        self._tamanho = total
+
+    def limpar(self):
+        for caminho, _, _ in list(self._arquivos()):
+            try:
+                os.remove(caminho)
+            except OSError:
+                pass
+        with self._lock:
+            self._tamanho = 0
+
+
+_cache_padrao = None
+_cache_lock = threading.Lock()
+
+
+def get_default_cache():
+    """Cache compartilhado pelo processo (pasta via BID_CACHE_DIR, default .bid_cache/)"""
+    global _cache_padrao
+    if _cache_padrao is None:
+        with _cache_lock:
+            if _cache_padrao is None:
+                _cache_padrao = ResponseCache(os.environ.get('BID_CACHE_DIR'))
+    return _cache_padrao
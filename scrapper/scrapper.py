@@ -1,23 +1,29 @@
-import requests
-from bs4 import BeautifulSoup
 import re
 import os
 import sys
 import time
-import random
 import base64
 from datetime import datetime
 
 # Adicionar diretório raiz para importar captcha_ml
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-try:
-    from captcha_ml.captcha_solver import solve_captcha_auto
-    CAPTCHA_SOLVER_AVAILABLE = True
-except ImportError:
-    CAPTCHA_SOLVER_AVAILABLE = False
+# O solver (e o TensorFlow, se o backend precisar) só é importado no primeiro captcha
+from captcha_ml.backends import backend_disponivel, solve_captcha_auto, solve_with_confidence_auto
+
+CAPTCHA_SOLVER_AVAILABLE = backend_disponivel()
+if not CAPTCHA_SOLVER_AVAILABLE:
     print("⚠️  Solver de captcha ML não disponível. Use captcha_code manual ou treine o modelo primeiro.")
 
+from scrapper.errors import (
+    DESISTIR, RETRY_BACKOFF, AthleteNotFoundError, AthleteSkippedError, BidError, CaptchaRejectedError,
+    MalformedResponseError, RetriesExhaustedError, ServerError, SessionRejectedError, SuspectedNotFoundError,
+    classificar_excecao, classificar_resposta, espera_backoff
+)
+from scrapper.session_pool import BID_URL_PRODUCAO, get_default_pool, sessao_rejeitada
+from scrapper.response_cache import get_default_cache
+from scrapper.tombstones import get_default_tombstones
+
 def salvar_dataset_ouro(base64_string, label):
     """
     Salva o captcha resolvido corretamente para re-treinamento futuro (Data Flywheel).
@@ -37,94 +43,227 @@ def salvar_dataset_ouro(base64_string, label):
         filename = f"{label}_{timestamp}.png"
         filepath = os.path.join(ouro_dir, filename)
 
+        dados = base64.b64decode(base64_string)
         with open(filepath, "wb") as f:
-            f.write(base64.b64decode(base64_string))
+            f.write(dados)
             
         print(f"⭐ Captcha '{label}' salvo em dataset_ouro/ para o futuro!")
+
+        # Se o servidor reemitir este captcha, o solver responde pelo índice sem inferência
+        from captcha_ml.indice_ouro import registrar_confirmado
+        registrar_confirmado(dados, label, filename)
     except Exception as e:
         print(f"⚠️ Erro ao salvar no dataset ouro: {e}")
 
-def buscar_dados_bid(uf, data_publicacao, captcha_code=None, auto_solve=True):
+def _publicacao_passada(data_publicacao):
+    """Publicações de dias anteriores a hoje não mudam mais (podem ir para o cache)"""
+    try:
+        return datetime.strptime(data_publicacao, '%d/%m/%Y').date() < datetime.now().date()
+    except (TypeError, ValueError):
+        return False
+
+def _producao(base_url):
+    """Indica se as respostas vêm do BID real (e não de local_server.py ou outro stand-in)"""
+    return base_url == BID_URL_PRODUCAO
+
+def _params_cache(pool, params):
+    """Respostas de outro servidor (ex: local_server.py) não se misturam com as de produção"""
+    if not _producao(pool.base_url):
+        params = dict(params, base_url=pool.base_url)
+    return params
+
+def _formatar_registros(response_json):
+    registros = []
+    for atleta in response_json:
+        registros.append({
+            'jogador': atleta.get('nome', ''),
+            'operacao': atleta.get('tipocontrato', ''),
+            'publicacao': atleta.get('data_publicacao', ''),
+            'clube': atleta.get('clube', ''),
+            'apelido': atleta.get('apelido', ''),
+            'codigo_atleta': atleta.get('codigo_atleta', ''),
+            'contrato_numero': atleta.get('contrato_numero', ''),
+            'data_inicio': atleta.get('datainicio', ''),
+            'data_nascimento': atleta.get('data_nascimento', ''),
+            'codigo_clube': atleta.get('codigo_clube', ''),
+            'uf': atleta.get('uf', '')
+        })
+    return registros
+
+def _confianca_minima(confianca_minima):
+    """Valor explícito ou CAPTCHA_CONFIANCA_MINIMA; None/0 desliga o filtro"""
+    if confianca_minima is None:
+        confianca_minima = float(os.environ.get('CAPTCHA_CONFIANCA_MINIMA') or 0)
+    return confianca_minima or None
+
+def _resolver_captcha(captcha_base64, confianca_minima=None):
+    """
+    Resolve o captcha e devolve (código, probabilidade).
+    Com `confianca_minima`, usa o beam search restrito (ver captcha_ml/ctc.py) para ter a
+    probabilidade do código; sem, mantém o decodificador padrão e a probabilidade é None.
+    """
+    if not confianca_minima:
+        return solve_captcha_auto(captcha_base64), None
+    resultado = solve_with_confidence_auto(captcha_base64)
+    if resultado is None:
+        return None, None
+    return resultado['codigo'], resultado['probabilidade']
+
+def _codigo_pre_resolvido(pronto, confianca_minima=None):
+    """(código, probabilidade) de um captcha do prefetch"""
+    if confianca_minima and pronto.probabilidade is None:
+        # Prefetch sem com_confianca: resolve de novo para saber a probabilidade
+        return _resolver_captcha(pronto.base64, confianca_minima)
+    return pronto.codigo, pronto.probabilidade
+
+def _confianca_baixa(codigo, probabilidade, confianca_minima):
+    """
+    True se o código deve ser descartado antes do POST: um POST rejeitado custa
+    a ida e volta e um captcha novo, buscar outro captcha custa só o GET.
+    """
+    if not confianca_minima or not codigo or probabilidade is None or probabilidade >= confianca_minima:
+        return False
+    print(f"⚠️ Captcha descartado: '{codigo}' com confiança {probabilidade:.3%} "
+          f"(mínimo {confianca_minima:.3%}). Solicitando novo...")
+    return True
+
+def buscar_dados_bid(uf, data_publicacao, captcha_code=None, auto_solve=True, pool=None,
+                     cache=None, usar_cache=True, confianca_minima=None, max_descartes=10):
     """
     Busca dados do BID da CBF (Lista geral por Estado/Data)
+
+    Args:
+        pool: BidSessionPool de onde vem a sessão (default: pool do processo)
+        cache: ResponseCache consultado antes do captcha (default: cache do processo)
+        usar_cache: False ignora o cache (nem lê, nem grava)
+        confianca_minima: Probabilidade mínima do código resolvido para enviar o POST; abaixo
+            dela o captcha é descartado e outro é buscado (default: CAPTCHA_CONFIANCA_MINIMA)
+        max_descartes: Captchas descartados por baixa confiança; depois disso o próximo é enviado mesmo assim
     """
     
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36',
-        'Accept': 'application/json, text/javascript, */*; q=0.01',
-        'Accept-Language': 'pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7',
-        'X-Requested-With': 'XMLHttpRequest',
-        'Origin': 'https://bid.cbf.com.br',
-        'Referer': 'https://bid.cbf.com.br/'
-    }
-    
-    session = requests.Session()
-    
-    print("Acessando página principal...")
-    response_home = session.get('https://bid.cbf.com.br/', headers=headers, timeout=10)
-    
-    if response_home.status_code != 200:
-        raise Exception(f'Erro ao acessar página principal: {response_home.status_code}')
+    pool = pool or get_default_pool()
+    confianca_minima = _confianca_minima(confianca_minima)
+    cache = (cache or get_default_cache()) if usar_cache else None
+    params_cache = _params_cache(pool, {'uf': uf, 'data': data_publicacao})
     
-    soup = BeautifulSoup(response_home.text, 'html.parser')
-    csrf_meta = soup.find('meta', {'name': 'csrf-token'})
-    if csrf_meta:
-        csrf_token = csrf_meta.get('content')
-        headers['X-CSRF-TOKEN'] = csrf_token
+    if cache is not None:
+        response_json = cache.get('busca-json', params_cache)
+        if response_json is not None:
+            print(f"💾 UF={uf}, Data={data_publicacao} encontrado no cache ({len(response_json)} registros)")
+            return _formatar_registros(response_json)
     
-    # Obter o captcha
-    captcha_base64_recieved = None 
-    
-    if captcha_code is None:
-        print("\nObtendo captcha...")
-        captcha_response = session.get('https://bid.cbf.com.br/get-captcha-base64', headers=headers, timeout=10)
+    # Com captcha digitado à mão, o prefetch não pode pedir outro para a sessão
+    with pool.sessao(prefetch=captcha_code is None) as bid:
+        headers = {
+            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36',
+            'Accept': 'application/json, text/javascript, */*; q=0.01',
+            'Accept-Language': 'pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7',
+            'X-Requested-With': 'XMLHttpRequest',
+            'Origin': bid.base_url,
+            'Referer': bid.url('/')
+        }
+        prefetcher = pool.prefetcher if captcha_code is None and auto_solve and CAPTCHA_SOLVER_AVAILABLE else None
         
-        if captcha_response.status_code == 200:
-            content_type = captcha_response.headers.get('content-type', '').lower()
+        # Volta ao início se o servidor rejeitar a sessão em cache (uma vez) ou se o
+        # captcha resolvido for descartado por baixa confiança
+        sessao_renovada = False
+        descartes = 0
+        while True:
+            if bid.expirada:
+                bid.aquecer()
+            bid.aplicar_csrf(headers)
             
-            if 'json' in content_type:
-                captcha_data = captcha_response.json()
-                captcha_base64 = captcha_data.get('image', '')
-            else:
-                captcha_base64 = captcha_response.text.strip()
+            # Obter o captcha
+            current_captcha = captcha_code
+            captcha_base64_recieved = None 
             
-            captcha_base64_recieved = captcha_base64 
+            if current_captcha is None and prefetcher is not None:
+                pronto = prefetcher.proximo(bid)
+                if pronto is None:
+                    raise BidError('Captcha necessário. Nenhum captcha pré-resolvido ficou pronto a tempo.')
+                captcha_base64_recieved = pronto.base64
+                current_captcha, probabilidade = _codigo_pre_resolvido(pronto, confianca_minima)
+                if descartes < max_descartes and _confianca_baixa(current_captcha, probabilidade, confianca_minima):
+                    prefetcher.liberar(bid)
+                    descartes += 1
+                    continue
+                print(f"✓ Captcha pré-resolvido: '{current_captcha}'")
             
-            if auto_solve and CAPTCHA_SOLVER_AVAILABLE and captcha_base64:
-                print("🤖 Tentando resolver captcha automaticamente com ML...")
-                captcha_code = solve_captcha_auto(captcha_base64)
+            if current_captcha is None:
+                print("\nObtendo captcha...")
+                captcha_response = bid.get('/get-captcha-base64', headers=headers, timeout=10)
                 
-                if captcha_code:
-                    print(f"✓ Captcha resolvido automaticamente: '{captcha_code}'")
+                if sessao_rejeitada(captcha_response) and not sessao_renovada:
+                    print("🔑 Sessão/CSRF expirado. Renovando sessão...")
+                    bid.invalidar()
+                    sessao_renovada = True
+                    continue
+                
+                if captcha_response.status_code == 200:
+                    content_type = captcha_response.headers.get('content-type', '').lower()
+                    
+                    if 'json' in content_type:
+                        captcha_data = captcha_response.json()
+                        captcha_base64 = captcha_data.get('image', '')
+                    else:
+                        captcha_base64 = captcha_response.text.strip()
+                    
+                    captcha_base64_recieved = captcha_base64 
+                    
+                    if auto_solve and CAPTCHA_SOLVER_AVAILABLE and captcha_base64:
+                        print("🤖 Tentando resolver captcha automaticamente com ML...")
+                        current_captcha, probabilidade = _resolver_captcha(captcha_base64, confianca_minima)
+                        
+                        if descartes < max_descartes and _confianca_baixa(current_captcha, probabilidade,
+                                                                          confianca_minima):
+                            descartes += 1
+                            continue
+                        
+                        if current_captcha:
+                            print(f"✓ Captcha resolvido automaticamente: '{current_captcha}'")
+                        else:
+                            print("❌ Falha na resolução automática do captcha")
+                    
+                    if current_captcha is None:
+                        raise BidError('Captcha necessário. Resolução automática falhou.')
                 else:
-                    print("❌ Falha na resolução automática do captcha")
+                    raise classificar_resposta(captcha_response) or BidError(
+                        f'Erro ao obter captcha: {captcha_response.status_code}', captcha_response.status_code)
             
-            if captcha_code is None:
-                raise Exception('Captcha necessário. Resolução automática falhou.')
-        else:
-            raise Exception(f'Erro ao obter captcha: {captcha_response.status_code}')
-    
-    # Preparar os dados para a busca
-    dados = {
-        'data': data_publicacao,
-        'uf': uf,
-        'codigo_clube': '',
-        'captcha': captcha_code
-    }
-    
-    print(f"\nBuscando dados para UF={uf}, Data={data_publicacao}...")
-    response = session.post('https://bid.cbf.com.br/busca-json', 
-                           data=dados, 
-                           headers=headers, 
-                           timeout=10)
+            # Preparar os dados para a busca
+            dados = {
+                'data': data_publicacao,
+                'uf': uf,
+                'codigo_clube': '',
+                'captcha': current_captcha
+            }
+            
+            print(f"\nBuscando dados para UF={uf}, Data={data_publicacao}...")
+            try:
+                response = bid.post('/busca-json', 
+                                       data=dados, 
+                                       headers=headers, 
+                                       timeout=10)
+            finally:
+                if prefetcher is not None:
+                    prefetcher.liberar(bid)
+            
+            if sessao_rejeitada(response) and not sessao_renovada:
+                print("🔑 Sessão/CSRF expirado. Renovando sessão...")
+                bid.invalidar()
+                sessao_renovada = True
+                continue
+            
+            break
     
-    if response.status_code != 200:
-        raise Exception(f'Erro na requisição: {response.status_code}')
+    erro = classificar_resposta(response)
+    if erro is not None:
+        raise erro
     
     try:
         response_json = response.json()
-    except Exception as e:
-        raise Exception('Resposta inválida da API')
+    except ValueError:
+        raise MalformedResponseError('Resposta inválida da API', response.status_code)
     
     # Verificar erros
     if isinstance(response_json, dict):
@@ -134,191 +273,280 @@ def buscar_dados_bid(uf, data_publicacao, captcha_code=None, auto_solve=True):
                 error_msg = '; '.join([f"{k}: {v}" for k, v in messages.items()])
             else:
                 error_msg = str(messages)
-            raise Exception(f'Erro retornado pela API: {error_msg}')
+            if 'captcha' in error_msg.lower():
+                raise CaptchaRejectedError(f'Erro retornado pela API: {error_msg}', response.status_code)
+            raise BidError(f'Erro retornado pela API: {error_msg}', response.status_code)
     
-    # Se chegou aqui, deu certo! Salvar dataset ouro
-    if captcha_base64_recieved and captcha_code:
-        salvar_dataset_ouro(captcha_base64_recieved, captcha_code)
+    # Se chegou aqui, deu certo! Salvar dataset ouro (só captchas do BID real: o servidor
+    # local serve imagens do próprio dataset ouro e duplicaria o conjunto de treino)
+    if captcha_base64_recieved and current_captcha and _producao(pool.base_url):
+        salvar_dataset_ouro(captcha_base64_recieved, current_captcha)
 
     print(f"\n{len(response_json)} registros encontrados")
     
-    registros = []
-    for atleta in response_json:
-        registros.append({
-            'jogador': atleta.get('nome', ''),
-            'operacao': atleta.get('tipocontrato', ''),
-            'publicacao': atleta.get('data_publicacao', ''),
-            'clube': atleta.get('clube', ''),
-            'apelido': atleta.get('apelido', ''),
-            'codigo_atleta': atleta.get('codigo_atleta', ''),
-            'contrato_numero': atleta.get('contrato_numero', ''),
-            'data_inicio': atleta.get('datainicio', ''),
-            'data_nascimento': atleta.get('data_nascimento', ''),
-            'codigo_clube': atleta.get('codigo_clube', ''),
-            'uf': atleta.get('uf', '')
-        })
+    # Só publicações passadas vão para o cache; a de hoje ainda pode mudar
+    if cache is not None and _publicacao_passada(data_publicacao):
+        cache.set('busca-json', params_cache, response_json)
     
-    return registros
+    return _formatar_registros(response_json)
 
 
-def buscar_historico_atleta(codigo_atleta, captcha_code=None, auto_solve=True, max_retries=15):
+def buscar_historico_atleta(codigo_atleta, captcha_code=None, auto_solve=True, max_retries=15, pool=None,
+                            cache=None, usar_cache=True, tombstones=None, usar_tombstones=True,
+                            confianca_minima=None, max_descartes=10):
     """
     Busca histórico de um atleta específico no BID da CBF.
     Inclui lógica de Dataset Ouro e tratamento inteligente de erro 500.
+    A sessão (cookies + CSRF) vem do pool e é reaproveitada entre atletas.
+    Respostas ficam no cache em disco (ver response_cache.py); `usar_cache=False` ignora o cache.
+    IDs que falham repetidamente com erro 5xx ficam marcados (ver tombstones.py) e são
+    pulados até o intervalo de re-verificação; `usar_tombstones=False` ignora a marcação.
+    Com `confianca_minima` (default: CAPTCHA_CONFIANCA_MINIMA), captchas resolvidos com
+    probabilidade menor são descartados sem POST e um novo é buscado na hora, sem gastar
+    uma das `max_retries`; depois de `max_descartes` descartes o captcha é enviado mesmo assim.
     """
     
+    pool = pool or get_default_pool()
+    cache = (cache or get_default_cache()) if usar_cache else None
+    params_cache = _params_cache(pool, {'codigo_atleta': str(codigo_atleta)})
+    
+    if cache is not None:
+        response_json = cache.get('atleta-historico-json', params_cache)
+        if response_json is not None:
+            print(f"💾 Atleta {codigo_atleta} encontrado no cache")
+            return response_json
+    
+    tombstones = (tombstones or get_default_tombstones()) if usar_tombstones else None
+    if tombstones is not None:
+        registro = tombstones.deve_pular(codigo_atleta)
+        if registro is not None:
+            raise AthleteSkippedError(f"Atleta {codigo_atleta} ignorado: {registro['classe']} "
+                                      f"{registro['contagem']}x (última em "
+                                      f"{datetime.fromtimestamp(registro['ultima_falha']):%d/%m/%Y %H:%M})")
+    
+    # Com captcha digitado à mão, o prefetch não pode pedir outro para a sessão
+    with pool.sessao(prefetch=captcha_code is None) as bid:
+        response_json = _buscar_historico_na_sessao(bid, codigo_atleta, captcha_code, auto_solve, max_retries,
+                                                    prefetcher=pool.prefetcher if captcha_code is None else None,
+                                                    tombstones=tombstones,
+                                                    confianca_minima=_confianca_minima(confianca_minima),
+                                                    max_descartes=max_descartes)
+    
+    if tombstones is not None:
+        tombstones.registrar_sucesso(codigo_atleta)
+    
+    if cache is not None:
+        cache.set('atleta-historico-json', params_cache, response_json)
+    
+    return response_json
+
+
+def _marcador_inexistente(response_json):
+    """Código 404 num campo estruturado da resposta (não depende do texto da mensagem)"""
+    return any(str(response_json.get(campo)) == '404' for campo in ('code', 'codigo', 'status'))
+
+def _resposta_historico(response):
+    """Converte a resposta do POST em JSON do histórico ou levanta o BidError correspondente"""
+    if response.status_code == 404:
+        raise AthleteNotFoundError("Atleta não encontrado no BID (HTTP 404)", response.status_code)
+    erro = classificar_resposta(response)
+    if erro is not None:
+        raise erro
+
+    try:
+        response_json = response.json()
+    except ValueError as e:
+        raise MalformedResponseError(f"Resposta não é JSON: {e}", response.status_code)
+
+    # Verificar erro de captcha
+    if (isinstance(response_json, dict) and 
+        response_json.get('status') == False and 
+        'messages' in response_json and
+        any('captcha' in msg.lower() and 'invalido' in msg.lower() for msg in response_json['messages'])):
+        raise CaptchaRejectedError("Captcha incorreto.", response.status_code)
+    
+    # Verificar erro de API
+    if isinstance(response_json, dict) and 'error' in response_json:
+        mensagem = str(response_json['error'])
+        if _marcador_inexistente(response_json):
+            raise AthleteNotFoundError(f"Atleta não encontrado: {mensagem}", response.status_code)
+        if re.search(r'n[ãa]o (encontrad|exist)|inexistente|not found', mensagem, re.IGNORECASE):
+            raise SuspectedNotFoundError(f"Possível atleta inexistente: {mensagem}", response.status_code)
+        raise ServerError(f"Erro da API: {mensagem}", response.status_code)
+    
+    return response_json
+
+
+def _buscar_historico_na_sessao(bid, codigo_atleta, captcha_code, auto_solve, max_retries, prefetcher=None,
+                                tombstones=None, confianca_minima=None, max_descartes=10):
     headers = {
-        'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/142.0.0.0 Safari/537.36',
         'Accept': '*/*',
-        'Accept-Language': 'pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7',
-        'Accept-Encoding': 'gzip, deflate, br, zstd',
         'Connection': 'keep-alive',
-        'Sec-Ch-Ua': '"Chromium";v="142", "Google Chrome";v="142", "Not_A Brand";v="99"',
-        'Sec-Ch-Ua-Mobile': '?0',
-        'Sec-Ch-Ua-Platform': '"macOS"',
         'Sec-Fetch-Dest': 'empty',
         'Sec-Fetch-Mode': 'cors',
         'Sec-Fetch-Site': 'same-origin',
         'X-Requested-With': 'XMLHttpRequest',
-        'Origin': 'https://bid.cbf.com.br',
-        'Referer': f'https://bid.cbf.com.br/atleta-competicoes/{codigo_atleta}',
+        'Origin': bid.base_url,
+        'Referer': bid.url(f'/atleta-competicoes/{codigo_atleta}'),
         'Content-Type': 'application/x-www-form-urlencoded; charset=UTF-8'
     }
-    
-    session = requests.Session()
-    session.headers.update({
-        'User-Agent': headers['User-Agent'],
-        'Accept-Language': headers['Accept-Language'],
-        'Accept-Encoding': headers['Accept-Encoding'],
-        'Sec-Ch-Ua': headers['Sec-Ch-Ua'],
-        'Sec-Ch-Ua-Mobile': headers['Sec-Ch-Ua-Mobile'],
-        'Sec-Ch-Ua-Platform': headers['Sec-Ch-Ua-Platform']
-    })
-
-    print(f"Acessando página do atleta {codigo_atleta}...")
-    time.sleep(random.uniform(1, 2))
-    response_atleta = session.get(f'https://bid.cbf.com.br/atleta-competicoes/{codigo_atleta}', 
-                                  headers=headers, timeout=10)
-
-    if response_atleta.status_code != 200:
-        if response_atleta.status_code >= 500:
-            raise Exception(f'Erro de Servidor (CBF fora do ar ou atleta sem dados): {response_atleta.status_code}')
-        raise Exception(f'Erro ao acessar página do atleta: {response_atleta.status_code}')
-
-    soup = BeautifulSoup(response_atleta.text, 'html.parser')
-    csrf_meta = soup.find('meta', {'name': 'csrf-token'})
-    if csrf_meta:
-        headers['X-CSRF-TOKEN'] = csrf_meta.get('content')
-    else:
-        print("AVISO: CSRF token não encontrado")
-
-    # Contador de erros 500 consecutivos para este atleta
+    usar_prefetch = prefetcher is not None and auto_solve and CAPTCHA_SOLVER_AVAILABLE
+
+    print(f"Buscando atleta {codigo_atleta}...")
+
+    # Contador de erros 500 consecutivos do POST do histórico para este atleta
+    # (5xx do captcha ou erro genérico da API com HTTP 200 não dizem nada sobre o
+    # atleta; "atleta não encontrado" só no texto conta, ver SuspectedNotFoundError)
     consecutive_500_errors = 0
+    # Falhas seguidas que pedem recuo (5xx, 429, timeout, JSON inválido)
+    falhas_backoff = 0
+    ultimo_erro = None
+    # Captchas descartados por baixa confiança não gastam tentativa (até max_descartes)
+    descartes = 0
 
     # Loop de tentativas
-    for tentativa in range(max_retries):
+    tentativa = 0
+    while tentativa < max_retries:
+        tentativa += 1
         print(f"\n{'='*60}")
-        if tentativa == 0:
-            print(f"🔍 Tentativa {tentativa + 1}: Buscando dados do atleta...")
+        if tentativa == 1:
+            print(f"🔍 Tentativa {tentativa}: Buscando dados do atleta...")
         else:
-            print(f"🔄 Tentativa {tentativa + 1}/{max_retries}: Tentando novamente...")
+            print(f"🔄 Tentativa {tentativa}/{max_retries}: Tentando novamente...")
         print(f"{'='*60}")
         
         current_captcha = captcha_code
         current_captcha_base64 = None 
+        etapa = 'captcha'
         
-        if current_captcha is None or tentativa > 0:  
-            print("\nObtendo captcha...")
-            
-            # Delay progressivo se estiver dando erro
-            wait_time = random.uniform(1.5, 3.0) + (consecutive_500_errors * 2)
-            if tentativa > 0: time.sleep(wait_time)
+        try:
+            # Aquece aqui dentro: timeout ou 5xx da página principal recuam como os demais
+            if bid.expirada:
+                bid.aquecer()
+            bid.aplicar_csrf(headers)
+
+            if current_captcha is None or tentativa > 1:  
+                print("\nObtendo captcha...")
                 
-            captcha_response = session.get('https://bid.cbf.com.br/get-captcha-base64', 
-                                         headers=headers, timeout=10)
-            
-            if captcha_response.status_code == 200:
-                content_type = captcha_response.headers.get('content-type', '').lower()
-                if 'json' in content_type:
-                    current_captcha_base64 = captcha_response.json().get('image', '')
+                # O ritmo entre tentativas fica a cargo do controlador de taxa
+                # compartilhado (ver rate_controller.py); o recuo por tipo de
+                # falha é feito abaixo (ver errors.py)
+                if usar_prefetch:
+                    # Captcha já baixado e resolvido em background
+                    pronto = prefetcher.proximo(bid)
+                    if pronto is None:
+                        print("❌ Nenhum captcha pronto a tempo.")
+                        continue
+                    current_captcha_base64 = pronto.base64
+                    current_captcha, probabilidade = _codigo_pre_resolvido(pronto, confianca_minima)
+                    if descartes < max_descartes and _confianca_baixa(current_captcha, probabilidade,
+                                                                      confianca_minima):
+                        prefetcher.liberar(bid)
+                        descartes += 1
+                        tentativa -= 1
+                        continue
+                    print(f"✓ Captcha pré-resolvido: '{current_captcha}'")
                 else:
-                    current_captcha_base64 = captcha_response.text.strip()
+                    captcha_response = bid.get('/get-captcha-base64', 
+                                             headers=headers, timeout=10)
+                    erro = classificar_resposta(captcha_response)
+                    if erro is not None:
+                        raise erro
+                
+                    content_type = captcha_response.headers.get('content-type', '').lower()
+                    if 'json' in content_type:
+                        current_captcha_base64 = captcha_response.json().get('image', '')
+                    else:
+                        current_captcha_base64 = captcha_response.text.strip()
 
-                if auto_solve and CAPTCHA_SOLVER_AVAILABLE and current_captcha_base64:
-                    print("🤖 Resolvendo captcha...")
-                    current_captcha = solve_captcha_auto(current_captcha_base64)
+                    if auto_solve and CAPTCHA_SOLVER_AVAILABLE and current_captcha_base64:
+                        print("🤖 Resolvendo captcha...")
+                        current_captcha, probabilidade = _resolver_captcha(current_captcha_base64,
+                                                                           confianca_minima)
                     
-                    # Filtro de qualidade
-                    if not current_captcha or len(current_captcha) != 4:
-                        print(f"⚠️ Predição descartada: '{current_captcha}' (tamanho inválido). Solicitando novo...")
-                        continue 
+                        # Filtro de qualidade: não gasta o POST com predição impossível
+                        if not current_captcha or len(current_captcha) != 4:
+                            print(f"⚠️ Predição descartada: '{current_captcha}' (tamanho inválido). Solicitando novo...")
+                            continue 
+                        if descartes < max_descartes and _confianca_baixa(current_captcha, probabilidade,
+                                                                          confianca_minima):
+                            descartes += 1
+                            tentativa -= 1
+                            continue
                     
-                    if current_captcha:
                         print(f"✓ Captcha resolvido: '{current_captcha}'")
-                    else:
-                        print("❌ Falha na resolução automática")
 
-                if current_captcha is None:
-                    print("❌ Não foi possível resolver o captcha.")
-                    continue
-            else:
-                print(f"Erro ao obter captcha (HTTP {captcha_response.status_code})")
-                continue
+                    if current_captcha is None:
+                        print("❌ Não foi possível resolver o captcha.")
+                        continue
 
-        dados = {
-            'codigo_atleta': str(codigo_atleta),
-            'captcha': current_captcha
-        }
+            dados = {
+                'codigo_atleta': str(codigo_atleta),
+                'captcha': current_captcha
+            }
 
-        print(f"\nEnviando requisição (Captcha: {current_captcha})...")
-        response = session.post('https://bid.cbf.com.br/atleta-historico-json', 
-                               data=dados, headers=headers, timeout=10)
+            print(f"\nEnviando requisição (Captcha: {current_captcha})...")
+            etapa = 'historico'
+            try:
+                response = bid.post('/atleta-historico-json', 
+                                   data=dados, headers=headers, timeout=10)
+            finally:
+                if usar_prefetch:
+                    prefetcher.liberar(bid)
 
-        # TRATAMENTO DE ERROS HTTP
-        if response.status_code != 200:
-            print(f"Erro na requisição: {response.status_code}")
+            response_json = _resposta_historico(response)
+        except Exception as e:
+            erro = classificar_excecao(e)
+            if erro is None:
+                raise
+        else:
+            # === SUCESSO! ===
+            print(f"\n✅ Dados do atleta obtidos com sucesso!")
             
-            # Lógica especial para Erro 500 (Internal Server Error)
-            if response.status_code >= 500:
-                consecutive_500_errors += 1
-                print(f"⚠️ Erro interno do servidor CBF ({consecutive_500_errors}x seguidas).")
-                
-                # Se der erro 500 por 3 vezes seguidas, assumimos que o atleta está quebrado no banco deles
-                if consecutive_500_errors >= 3:
-                    raise Exception(f"FALHA CRÍTICA: Servidor CBF retornou erro {response.status_code} repetidamente para este atleta.")
+            if current_captcha_base64 and current_captcha and _producao(bid.base_url):
+                salvar_dataset_ouro(current_captcha_base64, current_captcha)
             
-            continue
+            return response_json
 
-        # Se a resposta for 200, reseta o contador de erros 500
-        consecutive_500_errors = 0
+        ultimo_erro = erro
+        print(f"❌ {erro}")
 
-        try:
-            response_json = response.json()
-        except Exception as e:
-            print(f"Erro ao parsear JSON: {e}")
+        if isinstance(erro, SessionRejectedError):
+            print("🔑 Sessão/CSRF expirado. Renovando sessão na próxima tentativa...")
+            bid.invalidar()
             continue
 
-        # Verificar erro de captcha
-        if (isinstance(response_json, dict) and 
-            response_json.get('status') == False and 
-            'messages' in response_json and
-            any('captcha' in msg.lower() and 'invalido' in msg.lower() for msg in response_json['messages'])):
+        # Falhas antes do POST (ex: 5xx do captcha) só recuam; não contam nem zeram
+        if etapa == 'historico' and isinstance(erro, ServerError) and (
+                (erro.status_code or 0) >= 500 or isinstance(erro, SuspectedNotFoundError)):
+            consecutive_500_errors += 1
+            print(f"⚠️ Erro interno do servidor CBF ({consecutive_500_errors}x seguidas).")
             
-            print(f"❌ Captcha incorreto.")
-            continue
-        
-        # Verificar erro de API
-        if isinstance(response_json, dict) and 'error' in response_json:
-            print(f"Erro da API: {response_json['error']}")
-            continue
-        
-        # === SUCESSO! ===
-        print(f"\n✅ Dados do atleta obtidos com sucesso!")
-        
-        if current_captcha_base64 and current_captcha:
-            salvar_dataset_ouro(current_captcha_base64, current_captcha)
-        
-        return response_json
+            # Se der erro 500 por 3 vezes seguidas, assumimos que o atleta está quebrado no banco deles
+            if consecutive_500_errors >= 3:
+                if isinstance(erro, SuspectedNotFoundError):
+                    mensagem = f"FALHA CRÍTICA: API respondeu repetidamente '{erro}' para este atleta."
+                else:
+                    mensagem = f"FALHA CRÍTICA: Servidor CBF retornou erro {erro.status_code} repetidamente para este atleta."
+                if tombstones is not None:
+                    tombstones.registrar_falha(codigo_atleta, erro.classe, mensagem)
+                raise ServerError(mensagem, erro.status_code)
+        elif etapa == 'historico':
+            consecutive_500_errors = 0
+
+        if erro.politica == DESISTIR:
+            # Nenhum captcha a mais resolve (ex: atleta inexistente)
+            if tombstones is not None and isinstance(erro, AthleteNotFoundError):
+                tombstones.registrar_falha(codigo_atleta, erro.classe, str(erro))
+            raise erro
+
+        if erro.politica == RETRY_BACKOFF:
+            falhas_backoff += 1
+            espera = espera_backoff(erro, falhas_backoff)
+            print(f"⏳ Aguardando {espera:.0f}s antes de tentar de novo ({erro.classe})...")
+            time.sleep(espera)
+        else:
+            falhas_backoff = 0
     
     print(f"\n❌ Falha após {max_retries} tentativas.")
-    raise Exception(f'Não foi possível obter dados após {max_retries} tentativas')
\ No newline at end of file
+    raise RetriesExhaustedError(f'Não foi possível obter dados após {max_retries} tentativas', ultimo_erro)
@@ -7,11 +7,11 @@ import sys
 # Adicionar diretório raiz para importar captcha_ml
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-try:
-    from captcha_ml.captcha_solver import solve_captcha_auto
-    CAPTCHA_SOLVER_AVAILABLE = True
-except ImportError:
-    CAPTCHA_SOLVER_AVAILABLE = False
+# O solver (e o TensorFlow, se o backend precisar) só é importado no primeiro captcha
+from captcha_ml.backends import backend_disponivel, solve_captcha_auto
+
+CAPTCHA_SOLVER_AVAILABLE = backend_disponivel()
+if not CAPTCHA_SOLVER_AVAILABLE:
     print("⚠️  Solver de captcha ML não disponível. Use captcha_code manual ou treine o modelo primeiro.")
 
 def buscar_dados_bid(uf, data_publicacao, captcha_code=None, auto_solve=True):
@@ -0,0 +1,235 @@
+"""
+Pool de sessões HTTP aquecidas para o BID da CBF.
+
+Cada sessão guarda os cookies e o token CSRF obtidos na página principal e é
+reaproveitada entre atletas e consultas UF/data. A página só é baixada (e o
+HTML parseado) de novo quando a sessão é criada, quando fica velha demais ou
+quando o servidor rejeita o token/sessão.
+"""
+
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+from bs4 import BeautifulSoup
+
+from scrapper.rate_controller import get_rate_controller
+
+BID_URL_PRODUCAO = 'https://bid.cbf.com.br'
+# Aponte BID_BASE_URL para o servidor local (ver local_server.py) em testes de carga
+BID_BASE_URL = os.environ.get('BID_BASE_URL', BID_URL_PRODUCAO).rstrip('/')
+
+HEADERS_NAVEGADOR = {
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/142.0.0.0 Safari/537.36',
+    'Accept-Language': 'pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7',
+    'Accept-Encoding': 'gzip, deflate, br, zstd',
+    'Sec-Ch-Ua': '"Chromium";v="142", "Google Chrome";v="142", "Not_A Brand";v="99"',
+    'Sec-Ch-Ua-Mobile': '?0',
+    'Sec-Ch-Ua-Platform': '"macOS"'
+}
+
+# Status usados pelo Laravel quando o token CSRF/sessão não vale mais
+# (419 = "Page Expired" / "CSRF token mismatch"). Um 403 sem mensagem de CSRF
+# é bloqueio (WAF/IP), não sessão: reaquecer só insistiria contra o bloqueio
+STATUS_SESSAO_REJEITADA = (401, 419)
+
+
+def sessao_rejeitada(response):
+    """Indica se a resposta mostra que o token CSRF ou a sessão expiraram"""
+    if response.status_code in STATUS_SESSAO_REJEITADA:
+        return True
+
+    content_type = response.headers.get('content-type', '').lower()
+    if 'json' not in content_type:
+        return False
+    try:
+        response_json = response.json()
+    except ValueError:
+        return False
+    if isinstance(response_json, dict):
+        mensagem = str(response_json.get('message', '')).lower()
+        return 'csrf' in mensagem or 'page expired' in mensagem
+    return False
+
+
+class BidSession:
+    """
+    Sessão aquecida do BID (cookies + token CSRF).
+    """
+
+    def __init__(self, base_url=BID_BASE_URL, max_idade=30 * 60, controlador=None):
+        self.base_url = base_url
+        self.max_idade = max_idade
+        self.controlador = controlador or get_rate_controller()
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS_NAVEGADOR)
+        self.csrf_token = None
+        self.aquecida_em = None
+        self.aquecimentos = 0
+        # Emprestada por `BidSessionPool.sessao()` e aceitando captchas do prefetch;
+        # sessões paradas no pool ou com captcha digitado à mão não são abastecidas
+        self.emprestada = False
+        self.aceita_prefetch = False
+        # Serializa o uso da sessão entre o dono e a thread de prefetch de captcha
+        self.lock = threading.RLock()
+
+    @property
+    def expirada(self):
+        if self.aquecida_em is None:
+            return True
+        return time.monotonic() - self.aquecida_em > self.max_idade
+
+    def url(self, caminho):
+        return f"{self.base_url}{caminho}"
+
+    def get(self, caminho, **kwargs):
+        """GET no BID passando pelo controlador de taxa"""
+        return self.controlador.requisitar(self.session, 'GET', self.url(caminho), **kwargs)
+
+    def post(self, caminho, **kwargs):
+        """POST no BID passando pelo controlador de taxa"""
+        return self.controlador.requisitar(self.session, 'POST', self.url(caminho), **kwargs)
+
+    def aquecer(self):
+        """Baixa a página principal para obter cookies e o token CSRF"""
+        print("Aquecendo sessão do BID (cookies + CSRF)...")
+        with self.lock:
+            self.session.cookies.clear()
+            response_home = self.get('/', timeout=10)
+
+            if response_home.status_code != 200:
+                # Import local: errors.py importa sessao_rejeitada deste módulo
+                from scrapper.errors import BidError, classificar_resposta
+
+                raise classificar_resposta(response_home) or BidError(
+                    f'Erro ao acessar página principal: {response_home.status_code}', response_home.status_code)
+
+            soup = BeautifulSoup(response_home.text, 'html.parser')
+            csrf_meta = soup.find('meta', {'name': 'csrf-token'})
+            if csrf_meta:
+                self.csrf_token = csrf_meta.get('content')
+            else:
+                self.csrf_token = None
+                print("AVISO: CSRF token não encontrado")
+
+            self.aquecida_em = time.monotonic()
+            self.aquecimentos += 1
+
+    def invalidar(self):
+        """Marca a sessão para ser reaquecida no próximo uso"""
+        self.aquecida_em = None
+
+    def aplicar_csrf(self, headers):
+        """Atualiza o dict de headers com o token CSRF atual"""
+        if self.csrf_token:
+            headers['X-CSRF-TOKEN'] = self.csrf_token
+        else:
+            headers.pop('X-CSRF-TOKEN', None)
+        return headers
+
+
+class BidSessionPool:
+    """
+    Pool thread-safe de sessões aquecidas do BID.
+
+    Uso:
+        pool = BidSessionPool(tamanho=4)
+        with pool.sessao() as bid:
+            if bid.expirada:
+                bid.aquecer()
+            bid.get('/get-captcha-base64', headers=bid.aplicar_csrf({}))
+    """
+
+    def __init__(self, tamanho=4, max_idade=30 * 60, base_url=BID_BASE_URL, controlador=None):
+        if tamanho < 1:
+            raise ValueError("tamanho deve ser >= 1")
+        self.tamanho = tamanho
+        self.max_idade = max_idade
+        self.base_url = base_url
+        # None = controlador de taxa compartilhado pelo processo
+        self.controlador = controlador
+        self._livres = queue.LifoQueue()
+        self._sessoes = []
+        self._lock = threading.Lock()
+        self.prefetcher = None
+
+    def iniciar_prefetch(self, **kwargs):
+        """Liga a pré-busca de captchas resolvidos (ver CaptchaPrefetcher)"""
+        from scrapper.captcha_prefetch import CaptchaPrefetcher
+
+        if self.prefetcher is None:
+            self.prefetcher = CaptchaPrefetcher(self, **kwargs)
+        return self.prefetcher
+
+    def _adquirir(self, timeout=None):
+        try:
+            return self._livres.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if len(self._sessoes) < self.tamanho:
+                bid = BidSession(base_url=self.base_url, max_idade=self.max_idade,
+                                 controlador=self.controlador)
+                self._sessoes.append(bid)
+                return bid
+
+        try:
+            return self._livres.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError('Nenhuma sessão do BID livre no pool')
+
+    @contextmanager
+    def sessao(self, timeout=None, prefetch=True):
+        """
+        Empresta uma sessão com uso exclusivo enquanto durar o bloco. Não aquece:
+        quem usa chama `aquecer()` se `expirada`, dentro do seu loop de tentativas,
+        para que timeout ou 5xx da página principal passem pelo mesmo recuo.
+        Com `prefetch=False` (ex: captcha digitado à mão) o prefetcher não busca
+        captchas para ela, o que invalidaria o código em uso.
+        """
+        bid = self._adquirir(timeout)
+        bid.aceita_prefetch = prefetch
+        bid.emprestada = True
+        try:
+            yield bid
+        finally:
+            bid.emprestada = False
+            bid.aceita_prefetch = False
+            self._livres.put(bid)
+
+    def fechar(self):
+        if self.prefetcher is not None:
+            self.prefetcher.parar()
+            self.prefetcher = None
+        with self._lock:
+            for bid in self._sessoes:
+                bid.session.close()
+                bid.invalidar()
+
+
+_pool_padrao = None
+_pool_padrao_lock = threading.Lock()
+
+
+def get_default_pool():
+    """Pool compartilhado pelo processo (criado no primeiro uso)"""
+    global _pool_padrao
+    if _pool_padrao is None:
+        with _pool_padrao_lock:
+            if _pool_padrao is None:
+                _pool_padrao = BidSessionPool()
+    return _pool_padrao
+
+
+def configurar_pool(**kwargs):
+    """Substitui o pool compartilhado (ex: configurar_pool(base_url='http://127.0.0.1:8765'))"""
+    global _pool_padrao
+    with _pool_padrao_lock:
+        antigo, _pool_padrao = _pool_padrao, BidSessionPool(**kwargs)
+    if antigo is not None:
+        antigo.fechar()
+    return _pool_padrao
@@ -0,0 +1,139 @@
+"""
+Varredura concorrente do BID por UF x data de publicação.
+
+Distribui as consultas `buscar_dados_bid(uf, data)` de todas as UFs e de um
+intervalo de datas entre várias threads que compartilham o mesmo pool de
+sessões. Os registros são deduplicados por (codigo_atleta, contrato_numero)
+e entregues ao `sink` assim que cada par UF/data termina.
+"""
+
+import csv
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+
+from scrapper.scrapper import buscar_dados_bid, _confianca_minima
+from scrapper.session_pool import BidSessionPool
+
+UFS = [
+    'AC', 'AL', 'AM', 'AP', 'BA', 'CE', 'DF', 'ES', 'GO', 'MA', 'MG', 'MS', 'MT', 'PA',
+    'PB', 'PE', 'PI', 'PR', 'RJ', 'RN', 'RO', 'RR', 'RS', 'SC', 'SE', 'SP', 'TO'
+]
+
+
+def _para_data(valor):
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    return datetime.strptime(valor, '%d/%m/%Y').date()
+
+
+def gerar_datas(inicio, fim):
+    """
+    Lista de datas 'dd/mm/yyyy' de `inicio` até `fim` (inclusive).
+    Aceita date/datetime ou strings 'dd/mm/yyyy'.
+    """
+    inicio, fim = _para_data(inicio), _para_data(fim)
+    total = (fim - inicio).days + 1
+    return [(inicio + timedelta(days=i)).strftime('%d/%m/%Y') for i in range(total)]
+
+
+class CsvSink:
+    """
+    Sink que vai anexando os registros em um CSV (cabeçalho escrito uma vez).
+    """
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._lock = threading.Lock()
+
+    def __call__(self, uf, data_publicacao, registros):
+        if not registros:
+            return
+        with self._lock:
+            novo = not os.path.exists(self.caminho)
+            with open(self.caminho, 'a', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=list(registros[0].keys()))
+                if novo:
+                    writer.writeheader()
+                writer.writerows(registros)
+
+
+def sweep_bid(ufs=None, date_range=None, concurrency=4, sink=None, pool=None, auto_solve=True,
+              prefetch=False):
+    """
+    Busca o BID para todas as combinações UF x data.
+
+    Args:
+        ufs: Lista de UFs (default: as 27 UFs)
+        date_range: Tupla (inicio, fim) ou lista de datas 'dd/mm/yyyy'
+        concurrency: Número de consultas simultâneas
+        sink: Callable(uf, data, registros_novos) chamado a cada par concluído
+        pool: BidSessionPool compartilhado (default: um pool com `concurrency` sessões)
+        auto_solve: Se True, resolve o captcha automaticamente com ML
+        prefetch: Se True, liga a pré-busca de captchas resolvidos no pool
+
+    Returns:
+        Dict com estatísticas: pares, registros, duplicados e erros
+        (lista de (uf, data, mensagem)).
+    """
+    ufs = ufs or UFS
+    if date_range is None:
+        raise ValueError("date_range é obrigatório")
+    if isinstance(date_range, tuple) and len(date_range) == 2:
+        datas = gerar_datas(*date_range)
+    else:
+        datas = list(date_range)
+
+    pool_proprio = pool is None
+    if pool_proprio:
+        pool = BidSessionPool(tamanho=concurrency)
+    if prefetch and auto_solve:
+        # Com confiança mínima configurada, o prefetch já traz a probabilidade
+        pool.iniciar_prefetch(com_confianca=bool(_confianca_minima(None)))
+
+    vistos = set()
+    stats = {'pares': 0, 'registros': 0, 'duplicados': 0, 'erros': []}
+
+    def _consultar(uf, data_publicacao):
+        return buscar_dados_bid(uf, data_publicacao, auto_solve=auto_solve, pool=pool)
+
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="sweep") as executor:
+            futuros = {
+                executor.submit(_consultar, uf, data_publicacao): (uf, data_publicacao)
+                for data_publicacao in datas
+                for uf in ufs
+            }
+
+            for futuro in as_completed(futuros):
+                uf, data_publicacao = futuros[futuro]
+                stats['pares'] += 1
+                try:
+                    registros = futuro.result()
+                except Exception as e:
+                    print(f"❌ {uf} {data_publicacao}: {e}")
+                    stats['erros'].append((uf, data_publicacao, str(e)))
+                    continue
+
+                novos = []
+                for registro in registros:
+                    chave = (registro.get('codigo_atleta'), registro.get('contrato_numero'))
+                    if chave in vistos:
+                        stats['duplicados'] += 1
+                        continue
+                    vistos.add(chave)
+                    novos.append(registro)
+
+                stats['registros'] += len(novos)
+                print(f"✅ {uf} {data_publicacao}: {len(novos)} registros novos "
+                      f"({stats['pares']}/{len(futuros)})")
+                if sink is not None:
+                    sink(uf, data_publicacao, novos)
+    finally:
+        if pool_proprio:
+            pool.fechar()
+
+    return stats
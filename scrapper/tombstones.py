@@ -0,0 +1,128 @@
+"""
+Registro persistente (SQLite) de atletas que falham repetidamente.
+
+Quando o servidor da CBF responde erro 5xx seguidas vezes para um atleta (ou
+diz que o atleta não existe com HTTP 404 ou marcador estruturado; só o texto
+da mensagem conta como erro 5xx), o ID é marcado aqui com a classe da falha
+(`BidError.classe`, ver errors.py), a contagem e o horário. As buscas
+seguintes pulam o ID sem gastar nenhum captcha até o intervalo de
+re-verificação passar; cada nova falha dobra esse intervalo. O arquivo é
+compartilhado por todos os runners da máquina.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Intervalo base (s) até testar de novo um ID, por classe de falha
+DEFAULT_INTERVALOS = {
+    'erro_servidor': 7 * 24 * 3600,
+    'atleta_inexistente': 30 * 24 * 3600,
+}
+INTERVALO_PADRAO = 24 * 3600
+
+
+class TombstoneStore:
+    """
+    Args:
+        caminho: Arquivo SQLite
+        intervalos: Dict classe -> intervalo base de re-verificação em segundos
+        fator_backoff: Multiplicador do intervalo a cada falha repetida
+        intervalo_maximo: Teto do intervalo de re-verificação
+    """
+
+    def __init__(self, caminho=None, intervalos=None, fator_backoff=2.0,
+                 intervalo_maximo=180 * 24 * 3600):
+        self.caminho = caminho or os.path.join(ROOT_DIR, 'bid_tombstones.sqlite3')
+        self.intervalos = dict(DEFAULT_INTERVALOS)
+        if intervalos:
+            self.intervalos.update(intervalos)
+        self.fator_backoff = fator_backoff
+        self.intervalo_maximo = intervalo_maximo
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.caminho, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS tombstones (
+                    codigo_atleta TEXT PRIMARY KEY,
+                    classe TEXT NOT NULL,
+                    contagem INTEGER NOT NULL,
+                    primeira_falha REAL NOT NULL,
+                    ultima_falha REAL NOT NULL,
+                    mensagem TEXT
+                )
+            """)
+
+    def registrar_falha(self, codigo_atleta, classe, mensagem=None):
+        agora = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("""
+                INSERT INTO tombstones (codigo_atleta, classe, contagem, primeira_falha, ultima_falha, mensagem)
+                VALUES (?, ?, 1, ?, ?, ?)
+                ON CONFLICT(codigo_atleta) DO UPDATE SET
+                    classe = excluded.classe,
+                    contagem = contagem + 1,
+                    ultima_falha = excluded.ultima_falha,
+                    mensagem = excluded.mensagem
+            """, (str(codigo_atleta), classe, agora, agora, mensagem))
+
+    def registrar_sucesso(self, codigo_atleta):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM tombstones WHERE codigo_atleta = ?", (str(codigo_atleta),))
+
+    def consultar(self, codigo_atleta):
+        """Retorna o registro do ID (dict) ou None"""
+        with self._lock:
+            linha = self._conn.execute("""
+                SELECT classe, contagem, primeira_falha, ultima_falha, mensagem
+                FROM tombstones WHERE codigo_atleta = ?
+            """, (str(codigo_atleta),)).fetchone()
+        if linha is None:
+            return None
+        classe, contagem, primeira_falha, ultima_falha, mensagem = linha
+        return {
+            'codigo_atleta': str(codigo_atleta),
+            'classe': classe,
+            'contagem': contagem,
+            'primeira_falha': primeira_falha,
+            'ultima_falha': ultima_falha,
+            'mensagem': mensagem,
+        }
+
+    def intervalo(self, registro):
+        base = self.intervalos.get(registro['classe'], INTERVALO_PADRAO)
+        return min(self.intervalo_maximo, base * self.fator_backoff ** (registro['contagem'] - 1))
+
+    def deve_pular(self, codigo_atleta):
+        """
+        Retorna o registro se o ID ainda está dentro do intervalo de
+        re-verificação (deve ser pulado), ou None se pode ser buscado.
+        """
+        registro = self.consultar(codigo_atleta)
+        if registro is None:
+            return None
+        if time.time() - registro['ultima_falha'] < self.intervalo(registro):
+            return registro
+        return None
+
+    def fechar(self):
+        with self._lock:
+            self._conn.close()
+
+
+_store_padrao = None
+_store_lock = threading.Lock()
+
+
+def get_default_tombstones():
+    """Store compartilhado pelo processo (arquivo via BID_TOMBSTONES)"""
+    global _store_padrao
+    if _store_padrao is None:
+        with _store_lock:
+            if _store_padrao is None:
+                _store_padrao = TombstoneStore(os.environ.get('BID_TOMBSTONES'))
+    return _store_padrao
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Teste de paridade do backend NumPy contra o Keras
+
+Resolve as mesmas imagens do dataset_ouro com os dois solvers e confere que as
+probabilidades batem e que os códigos são iguais. Roda sozinho
+(python3 test_numpy_solver.py) ou pelo pytest.
+"""
+
+import numpy as np
+
+LIMITE = 50
+TOLERANCIA = 1e-3
+
+
+def test_paridade_numpy_keras(limite=LIMITE):
+    """Mesmos códigos e |Δp| <= TOLERANCIA nas primeiras `limite` imagens do dataset_ouro"""
+    from captcha_ml.avaliacao import imagens_ouro
+    from captcha_ml.captcha_solver import CaptchaSolver
+    from captcha_ml.numpy_solver import NumpyCaptchaSolver
+
+    print(f"🧪 Comparando NumPy x Keras em {limite} imagens do dataset_ouro...")
+    arquivos = imagens_ouro(limite=limite)
+    assert arquivos, "Nenhuma imagem no dataset_ouro"
+
+    keras_solver = CaptchaSolver()
+    numpy_solver = NumpyCaptchaSolver()
+    assert keras_solver.is_loaded and numpy_solver.is_loaded, "Modelo não carregado"
+
+    lote = np.concatenate([keras_solver._preprocess_image(keras_solver._abrir_imagem(f)) for f in arquivos])
+    p_keras = keras_solver._inferir(lote)
+    p_numpy = numpy_solver._inferir(lote)
+    maior_diferenca = float(np.abs(p_keras - p_numpy).max())
+
+    codigos_keras = keras_solver._decode_batch_predictions(p_keras)
+    codigos_numpy = numpy_solver._decode_batch_predictions(p_numpy)
+    divergentes = [(arquivo, a, b) for arquivo, a, b in zip(arquivos, codigos_keras, codigos_numpy) if a != b]
+
+    print(f"   maior |Δp| = {maior_diferenca:.2e}, códigos diferentes = {len(divergentes)}")
+    for arquivo, a, b in divergentes:
+        print(f"   ❌ {arquivo}: keras '{a}' x numpy '{b}'")
+
+    assert not divergentes, f"{len(divergentes)} códigos diferentes entre NumPy e Keras"
+    assert maior_diferenca <= TOLERANCIA, f"|Δp| = {maior_diferenca:.2e} acima de {TOLERANCIA}"
+
+
+def main():
+    try:
+        test_paridade_numpy_keras()
+    except AssertionError as e:
+        print(f"❌ NumPy diverge do Keras: {e}")
+        return 1
+    print("✅ NumPy e Keras iguais!")
+    return 0
+
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(main())